@@ -15,14 +15,27 @@ from asgiref.sync import sync_to_async
 
 
 
+def get_context_user(update, context):
+    """
+    返回当前 update 对应的 TelegramUser。
+    同一个 update 的所有 handler 共用一个 context，只 upsert 一次。
+    """
+    tg_user = update.effective_user
+    if not tg_user:
+        return None
+
+    user = getattr(context, "tuser", None)
+    if user is None or user.user_id != tg_user.id:
+        user = update_or_create_user(tg_user)
+        context.tuser = user
+    return user
+
+
 def pre_process_user(func):
     @functools.wraps(func)
     def wrapper(update, context, *args, **kwargs):
 
-        tg_user = update.effective_user
-        if tg_user:
-            user = update_or_create_user(tg_user)
-            context.tuser = user
+        get_context_user(update, context)
 
         return func(update, context, *args, **kwargs)
 
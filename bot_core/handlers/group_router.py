@@ -0,0 +1,151 @@
+# bot_core/handlers/group_router.py
+
+# 群消息统一路由：每条群消息只过滤、解析、upsert 一次，
+# 分类后按调度表执行对应动作，并记录每条路由的耗时。
+
+import logging
+import re
+import threading
+import time
+
+from telegram.ext import MessageHandler, Filters
+
+from botconfig.services import get_config_snapshot
+from collect.handlers.query_staff import handle_group_query
+from reports.handlers.report_query import report_query_handler
+from .common import get_context_user
+from .user_activity import sign_in_handler, user_message_handler, discussion_forward_handler
+
+logger = logging.getLogger(__name__)
+
+
+ROUTE_DISCUSSION_FORWARD = "discussion_forward"
+ROUTE_REPORT_QUERY = "report_query"
+ROUTE_STAFF_QUERY = "staff_query"
+ROUTE_QUERY = "query"
+ROUTE_SIGN_IN = "sign_in"
+ROUTE_SCORING = "scoring"
+ROUTE_IGNORE = "ignore"
+
+# 与原 MessageHandler 的 Filters.regex 保持一致
+REPORT_QUERY_PATTERN = re.compile(r"^#?\s*报告\s*#\s*\S+")
+STAFF_QUERY_PATTERN = re.compile(r"^#(?!报告)\s*\S+")
+
+# dispatcher 按 group 从小到大处理，每个 group 内只执行第一个匹配的 handler。
+# 命令 / 回调 / 会话等 handler 都在默认的 group 0，路由单独放在 group 1：
+# group 0 中的 handler 是否处理了这条消息都不影响路由（与原来积分统计单独一组的行为一致）。
+GROUP_ROUTER_HANDLER_GROUP = 1
+
+
+def classify_group_message(message, config) -> str:
+    """对一条群消息做一次分类"""
+    forward_chat = message.forward_from_chat
+    if forward_chat:
+        # 自动同步的频道帖子一定有 forward_from_chat
+        if forward_chat.type == "channel":
+            return ROUTE_DISCUSSION_FORWARD
+        return ROUTE_IGNORE
+
+    text = message.text
+    if not text or text.startswith("/"):
+        return ROUTE_IGNORE
+
+    if REPORT_QUERY_PATTERN.search(text):
+        return ROUTE_REPORT_QUERY
+    if STAFF_QUERY_PATTERN.search(text):
+        return ROUTE_STAFF_QUERY
+    if config.is_sign_in_keyword(text.strip()):
+        return ROUTE_SIGN_IN
+
+    # 排除查询语句
+    if text.startswith("查") or "#" in text:
+        return ROUTE_QUERY
+
+    user = message.from_user
+    if user is None or user.is_bot:
+        return ROUTE_IGNORE
+
+    return ROUTE_SCORING
+
+
+# 路由 -> 动作
+ROUTE_TABLE = {
+    ROUTE_DISCUSSION_FORWARD: discussion_forward_handler,
+    ROUTE_REPORT_QUERY: report_query_handler,
+    ROUTE_STAFF_QUERY: handle_group_query,
+    ROUTE_SIGN_IN: sign_in_handler,
+    ROUTE_SCORING: user_message_handler,
+    ROUTE_QUERY: None,
+    ROUTE_IGNORE: None,
+}
+
+
+# ============================
+# 路由耗时统计
+# ============================
+
+_stats_lock = threading.Lock()
+_route_stats = {route: {"count": 0, "total_ms": 0.0, "max_ms": 0.0} for route in ROUTE_TABLE}
+
+
+def _record_timing(route, elapsed_ms):
+    with _stats_lock:
+        stats = _route_stats[route]
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        if elapsed_ms > stats["max_ms"]:
+            stats["max_ms"] = elapsed_ms
+
+
+def get_route_stats():
+    """返回各路由的 次数 / 平均耗时 / 最大耗时（毫秒）"""
+    with _stats_lock:
+        return {
+            route: {
+                "count": s["count"],
+                "avg_ms": round(s["total_ms"] / s["count"], 3) if s["count"] else 0.0,
+                "max_ms": round(s["max_ms"], 3),
+            }
+            for route, s in _route_stats.items()
+        }
+
+
+def reset_route_stats():
+    with _stats_lock:
+        for s in _route_stats.values():
+            s.update(count=0, total_ms=0.0, max_ms=0.0)
+
+
+# ============================
+# 路由入口
+# ============================
+
+def group_message_router(update, context):
+    message = update.message
+    if not message:
+        return
+
+    started = time.perf_counter()
+
+    route = classify_group_message(message, get_config_snapshot())
+
+    # 原 group_message_preprocessor：所有群消息都同步一次用户资料
+    tg_user = update.effective_user
+    if tg_user and not tg_user.is_bot:
+        get_context_user(update, context)
+
+    action = ROUTE_TABLE[route]
+    try:
+        if action is not None:
+            action(update, context)
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _record_timing(route, elapsed_ms)
+        logger.debug(f"[group-router] route={route} {elapsed_ms:.2f}ms")
+
+
+def register_group_router(dp):
+    dp.add_handler(
+        MessageHandler(Filters.chat_type.groups, group_message_router),
+        group=GROUP_ROUTER_HANDLER_GROUP
+    )
@@ -15,8 +15,6 @@ from collect.handlers.query_staff import register_query_staff_handlers
 from interactions.handlers import register_interaction_handlers
 from mall.handlers import register_all_mall_handers
 from lottery.handlers import register_all_lottery_handlers
-from telegram.ext import MessageHandler, Filters
-from .group_message import group_message_preprocessor
 
 def register_handlers(dp):
     # 全局用户更新（最优先）
@@ -82,10 +80,5 @@ def register_handlers(dp):
     #开始菜单
     register_start_handlers(dp)
 
-    #注册用户群聊发言处理
+    #注册用户群聊发言处理（签到/查询/积分/讨论组同步统一路由，放在最后面）
     register_user_activity(dp)
-    # 用户发言监听 放在最后面
-
-    dp.add_handler(
-        MessageHandler(Filters.group, group_message_preprocessor),
-    )
@@ -3,6 +3,7 @@ from django.conf import settings
 import logging
 
 from bot_core.bot import create_bot, leave_unallowed_groups_on_startup
+from tgusers.services import shutdown_point_ledger
 
 
 logger = logging.getLogger(__name__)
@@ -29,3 +30,7 @@ class Command(BaseCommand):
         except Exception as e:
             logger.exception("Bot crashed with exception")
             self.stderr.write(self.style.ERROR(f"Bot crashed: {e}"))
+
+        finally:
+            # 退出前把尚未落库的发言积分刷回数据库
+            shutdown_point_ledger()
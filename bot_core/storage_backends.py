@@ -1,5 +1,23 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+
+logger = logging.getLogger(__name__)
+
+# 远程存储的本地磁盘缓存
+MEDIA_CACHE_DIR = getattr(settings, "MEDIA_CACHE_DIR", os.path.join(settings.BASE_DIR, "media_cache"))
+MEDIA_CACHE_MAX_BYTES = getattr(settings, "MEDIA_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+MEDIA_CACHE_LOW_WATER = 0.9     # 超出上限后淘汰到上限的 90%
+MEDIA_PREFETCH_WORKERS = 4
+
 
 # 1) 本地存储
 class LocalMediaStorage(FileSystemStorage):
@@ -8,6 +26,9 @@ class LocalMediaStorage(FileSystemStorage):
         kwargs["base_url"] = settings.MEDIA_URL
         super().__init__(*args, **kwargs)
 
+    def prefetch(self, names):
+        """本地文件无需预取（与 CachedStorage 接口一致）"""
+
 
 # 2) 阿里云 OSS
 try:
@@ -23,6 +44,252 @@ except Exception:
     S3Boto3Storage = None
 
 
+# 4) 远程存储 + 本地磁盘 LRU 缓存
+class CachedStorage(Storage):
+    """
+    包装远程存储（OSS / COS / S3）：
+    - 读：先查本地缓存，未命中时从远程下载到缓存目录再打开；
+      同一文件的并发读取和预取共用一次下载（_inflight），打开前恰好被淘汰时重新下载
+    - 写：写远程后同时写入本地缓存（write-through）
+    - 缓存按存储路径为键，总大小超过 max_bytes 时按最近访问时间淘汰
+    - prefetch() 在后台线程预先下载即将查看的文件
+    - path() 返回本地缓存路径，依赖 FieldFile.path 的代码在远程模式下也能用
+    其余操作（url / listdir / 可用文件名等）直接交给远程存储。
+    """
+
+    def __init__(self, backend, location=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES):
+        self.backend = backend
+        self.location = location
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._inflight = {}     # name → Future（正在下载：前台读取和预取都登记在这里）
+        self._total = None      # 缓存总字节数，第一次写入时扫描目录得到
+        self._executor = None
+
+    # ---------- 本地缓存 ----------
+
+    def _cache_path(self, name):
+        # 存储路径哈希后做文件名：避免路径穿越，目录层级固定
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        ext = os.path.splitext(name)[1][:10]
+        return os.path.join(self.location, digest[:2], digest + ext)
+
+    def _is_cached(self, name):
+        return os.path.exists(self._cache_path(name))
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write_cache(self, name, src):
+        """把文件对象写入缓存（先写临时文件再改名，读者不会看到半个文件）"""
+        path = self._cache_path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            size = os.path.getsize(tmp)
+            try:
+                size -= os.path.getsize(path)   # 覆盖已缓存的文件时只计差值
+            except OSError:
+                pass
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        self._account(size)
+        return path
+
+    def _fetch(self, name):
+        with self.backend.open(name, "rb") as src:
+            return self._write_cache(name, src)
+
+    def _ensure_cached(self, name):
+        """返回本地缓存路径，未命中时下载（并发读取 / 预取共用一次下载）"""
+        path = self._cache_path(name)
+        if os.path.exists(path):
+            self._touch(path)
+            return path
+
+        with self._lock:
+            future = self._inflight.get(name)
+            owner = future is None
+            if owner:
+                future = self._inflight[name] = Future()
+
+        if not owner:
+            try:
+                return future.result()
+            except Exception:
+                return self._fetch(name)  # 别人的下载失败，自己再下载一次
+
+        try:
+            path = self._fetch(name)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+        future.set_result(path)
+        return path
+
+    def _drop_cache(self, name):
+        path = self._cache_path(name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        self._account(-size)
+
+    def _account(self, delta):
+        with self._lock:
+            if self._total is None:
+                self._total = self._scan_size()
+            else:
+                self._total += delta
+            over = self._total > self.max_bytes
+        if over:
+            self._evict()
+
+    def _iter_cache_files(self):
+        if not os.path.isdir(self.location):
+            return
+        for root, _, files in os.walk(self.location):
+            for filename in files:
+                if not filename.endswith(".part"):
+                    yield os.path.join(root, filename)
+
+    def _scan_size(self):
+        total = 0
+        for path in self._iter_cache_files():
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def _evict(self):
+        """按最近访问（mtime，命中时 touch）从旧到新删除，直到低于上限的 90%"""
+        entries = []
+        for path in self._iter_cache_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * MEDIA_CACHE_LOW_WATER
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._total = total
+        if removed:
+            logger.info(f"[media_cache] 淘汰 {removed} 个文件，当前 {total // 1024 // 1024} MB")
+
+    # ---------- 预取 ----------
+
+    def prefetch(self, names):
+        """后台下载即将查看的文件；已缓存或正在下载的跳过"""
+        for name in names:
+            if not name or self._is_cached(name):
+                continue
+            with self._lock:
+                if name in self._inflight:
+                    continue
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=MEDIA_PREFETCH_WORKERS, thread_name_prefix="media-prefetch"
+                    )
+                future = self._executor.submit(self._fetch, name)
+                self._inflight[name] = future
+            future.add_done_callback(lambda f, name=name: self._prefetch_done(name, f))
+
+    def _prefetch_done(self, name, future):
+        with self._lock:
+            self._inflight.pop(name, None)
+        if future.exception() is not None:
+            logger.warning(f"[media_cache] 预取失败 {name}: {future.exception()}")
+
+    # ---------- Storage 接口 ----------
+
+    def _open(self, name, mode="rb"):
+        if "w" in mode or "a" in mode or "+" in mode:
+            self._drop_cache(name)
+            return self.backend.open(name, mode)
+        try:
+            return File(open(self._ensure_cached(name), mode), name=name)
+        except FileNotFoundError:
+            # 拿到路径后、打开前被淘汰：重新下载（打开之后再被删除不影响已打开的句柄）
+            return File(open(self._ensure_cached(name), mode), name=name)
+
+    def _save(self, name, content):
+        name = self.backend.save(name, content)
+        try:
+            content.seek(0)
+            self._write_cache(name, content)
+        except Exception as e:
+            # 缓存写失败不影响保存，下次读取时再从远程下载
+            logger.warning(f"[media_cache] 写入缓存失败 {name}: {e}")
+        return name
+
+    def delete(self, name):
+        self.backend.delete(name)
+        self._drop_cache(name)
+
+    def exists(self, name):
+        return self._is_cached(name) or self.backend.exists(name)
+
+    def path(self, name):
+        return self._ensure_cached(name)
+
+    def url(self, name):
+        return self.backend.url(name)
+
+    def size(self, name):
+        path = self._cache_path(name)
+        if os.path.exists(path):
+            return os.path.getsize(path)
+        return self.backend.size(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
 def get_default_storage():
     mode = getattr(settings, "STORAGE_MODE", "local")
 
@@ -30,13 +297,22 @@ def get_default_storage():
         return LocalMediaStorage()
 
     if mode == "oss" and OSSStorage:
-        return OSSStorage()
+        return CachedStorage(OSSStorage())
 
     if mode == "cos" and S3Boto3Storage:
-        return S3Boto3Storage()
+        return CachedStorage(S3Boto3Storage())
 
     if mode == "s3" and S3Boto3Storage:
-        return S3Boto3Storage()
+        return CachedStorage(S3Boto3Storage())
 
     # fallback
     return LocalMediaStorage()
+
+
+def prefetch_media(names):
+    """预取即将查看的文件（远程存储写入本地缓存，本地存储无操作）"""
+    from django.core.files.storage import default_storage
+
+    prefetch = getattr(default_storage, "prefetch", None)
+    if prefetch is not None:
+        prefetch([name for name in names if name])
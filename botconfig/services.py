@@ -1,9 +1,17 @@
+from dataclasses import dataclass
+
 from django.core.cache import cache
 from botconfig.models import BotConfig
+from common.versioning import ProcessLocalIndex
 
 CACHE_KEY = "bot_config_cache"
 CACHE_TIMEOUT = 60 * 60  # 1 hour
 
+# 配置版本号（共享缓存）：任意进程保存配置后更新，其他进程据此重建本地快照；
+# 快照最长使用 SNAPSHOT_MAX_AGE 秒，版本号没有送达时也会重新读取配置
+VERSION_CACHE_KEY = "bot_config_version"
+SNAPSHOT_MAX_AGE = 60.0  # 秒
+
 
 def get_bot_config():
     """从缓存获取配置，没有则加载数据库并写入缓存"""
@@ -18,3 +26,56 @@ def refresh_bot_config_cache():
     """更新缓存"""
     config = BotConfig.get_solo()
     cache.set(CACHE_KEY, config, CACHE_TIMEOUT)
+    _snapshot.invalidate()
+
+
+# ==========================================================
+# 进程内配置快照（热路径使用）
+# ==========================================================
+
+@dataclass(frozen=True)
+class BotConfigSnapshot:
+    """BotConfig 的只读快照，签到关键词已预先切分成 frozenset"""
+
+    version: int
+    sign_in_keywords: frozenset
+    sign_in_points: int
+    message_min_length: int
+    message_base_points: int
+    message_daily_limit: int
+    crit_rate: float
+    crit_multiplier: int
+
+    @classmethod
+    def from_config(cls, config: BotConfig, version: int):
+        keywords = frozenset(
+            kw.strip() for kw in (config.sign_in_keywords or "").split(",") if kw.strip()
+        )
+        return cls(
+            version=version,
+            sign_in_keywords=keywords,
+            sign_in_points=config.sign_in_points,
+            message_min_length=config.message_min_length,
+            message_base_points=config.message_base_points,
+            message_daily_limit=config.message_daily_limit,
+            crit_rate=config.crit_rate,
+            crit_multiplier=config.crit_multiplier,
+        )
+
+    def is_sign_in_keyword(self, text: str) -> bool:
+        return text in self.sign_in_keywords
+
+
+_snapshot = ProcessLocalIndex(
+    VERSION_CACHE_KEY,
+    lambda version: BotConfigSnapshot.from_config(get_bot_config(), version),
+    max_age=SNAPSHOT_MAX_AGE,
+)
+
+
+def get_config_snapshot() -> BotConfigSnapshot:
+    """
+    返回当前配置快照。
+    每秒最多读一次版本号，版本变化或快照超过 SNAPSHOT_MAX_AGE 秒才重新构建。
+    """
+    return _snapshot.get()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CollectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'collect'
+
+    def ready(self):
+        import collect.signals
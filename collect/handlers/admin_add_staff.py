@@ -12,8 +12,8 @@ from telegram.ext import (
 from places.models import Place, Staff
 from collect.models import Submission, SubmissionPhoto
 from tgusers.services import update_or_create_user
+from common.file_refs import accept_telegram_file
 from common.keyboards import append_back_button
-from django.core.files.base import ContentFile
 
 
 # ============================
@@ -220,13 +220,11 @@ def admin_add_staff_confirm(update: Update, context: CallbackContext):
     )
 
     # 保存照片（自动审核通过）
-    for file_id in photos:
-        tg_file = context.bot.get_file(file_id)
-        file_bytes = tg_file.download_as_bytearray()
-
+    # 只登记 file_id，图片由后台任务下载写入存储
+    for i, file_id in enumerate(photos, start=1):
         SubmissionPhoto.objects.create(
             submission=submission,
-            image=ContentFile(file_bytes, name=f"{tg_file.file_id}.jpg"),
+            image=accept_telegram_file(f"submission_photos/{submission.id}_{i}.jpg", file_id),
             status="approved",
         )
 
@@ -14,10 +14,11 @@ from telegram.ext import (
 )
 
 from places.models import Place, Marketing
+from places.services import find_place_by_name, get_place, search_places
 from collect.models import ExchangeRecord
 from tgusers.models import TelegramUser
-from common.callbacks import make_cb
-from common.keyboards import append_back_button
+from common.callbacks import make_cb, parse_cb
+from common.keyboards import append_back_button, place_suggestion_keyboard
 from common.utils import mask_phone, mask_wechat  # 请确保实现了这两个函数
 from collect.keyboards import exchange_start_button_row, exchange_history_button_row, confirm_cancel_row
 from .status_code import EXCHANGE_WAITING_FOR_PLACE, EXCHANGE_WAITING_CONFIRM
@@ -59,20 +60,15 @@ def exchange_start(update: Update, context: CallbackContext):
     context.user_data['exchange_candidate_ids'] = list(places.values_list("id", flat=True))
     return EXCHANGE_WAITING_FOR_PLACE
 
-def exchange_input_place(update: Update, context: CallbackContext):
-    """用户输入场所名，展示前 3 个打码的营销信息并提供确认按钮"""
-    user_text = update.message.text.strip()
-    qs = Place.objects.filter(exchange_points__gt=0, name__icontains=user_text)
-    if not qs.exists():
-        update.message.reply_text("未找到匹配的可兑换场所，请检查名称后重试，或输入更短的关键字。"
-                                  "\n输入 /cancel 取消兑换")
-        return EXCHANGE_WAITING_FOR_PLACE
+def is_exchangeable(place) -> bool:
+    return place.exchange_points > 0
+
 
-    place = qs.first()
+def build_exchange_place_view(place, context: CallbackContext):
+    """展示前 3 个打码的营销信息，返回 (text, keyboard, 下一个状态)"""
     marketings = list(place.marketings.all())
     if not marketings:
-        update.message.reply_text("该场所暂无营销信息，无法兑换。")
-        return ConversationHandler.END
+        return "该场所暂无营销信息，无法兑换。", None, ConversationHandler.END
 
     # 展示前 3 个营销信息（若不足则全部展示）
     show_count = min(3, len(marketings))
@@ -104,8 +100,49 @@ def exchange_input_place(update: Update, context: CallbackContext):
     context.user_data['exchange_shown_marketing_ids'] = shown_marketing_ids
 
     keyboard = InlineKeyboardMarkup([confirm_cancel_row(place.id)])
+    return text, keyboard, EXCHANGE_WAITING_CONFIRM
+
+
+def exchange_input_place(update: Update, context: CallbackContext):
+    """用户输入场所名，精确命中直接展示；否则模糊匹配，唯一候选直接展示，多个候选让用户点选"""
+    user_text = update.message.text.strip()
+
+    place = find_place_by_name(user_text)
+    if place is None or not is_exchangeable(place):
+        candidates = search_places(user_text, place_filter=is_exchangeable)
+        if not candidates:
+            update.message.reply_text("未找到匹配的可兑换场所，请检查名称后重试，或输入更短的关键字。"
+                                      "\n输入 /cancel 取消兑换")
+            return EXCHANGE_WAITING_FOR_PLACE
+
+        if len(candidates) > 1:
+            update.message.reply_text(
+                "找到多个相近的可兑换场所，你是不是要找：\n输入 /cancel 取消兑换",
+                reply_markup=place_suggestion_keyboard(candidates, PREFIX, "pick")
+            )
+            return EXCHANGE_WAITING_FOR_PLACE
+
+        place = candidates[0][0]
+
+    text, keyboard, state = build_exchange_place_view(place, context)
     update.message.reply_text(text, reply_markup=keyboard)
-    return EXCHANGE_WAITING_CONFIRM
+    return state
+
+
+def exchange_pick_place(update: Update, context: CallbackContext):
+    """点选模糊匹配出的场所"""
+    query = update.callback_query
+    query.answer()
+
+    _, _, args = parse_cb(query.data)
+    place = get_place(int(args[0]))
+    if not place or not is_exchangeable(place):
+        query.edit_message_text("该场所不可兑换或不存在。\n输入 /cancel 取消兑换")
+        return EXCHANGE_WAITING_FOR_PLACE
+
+    text, keyboard, state = build_exchange_place_view(place, context)
+    query.edit_message_text(text, reply_markup=keyboard)
+    return state
 
 
 
@@ -233,6 +270,7 @@ def get_exchange_conversation_handler() -> ConversationHandler:
             EXCHANGE_WAITING_FOR_PLACE: [
                 # 关键：避免 /cancel 被当成普通文本
                 MessageHandler(Filters.text & ~Filters.regex(r"^/cancel"), exchange_input_place),
+                CallbackQueryHandler(exchange_pick_place, pattern=rf"^{PREFIX}:pick:\d+$"),
             ],
             EXCHANGE_WAITING_CONFIRM: [
                 CallbackQueryHandler(exchange_confirm, pattern=rf"^{PREFIX}:confirm:\d+$"),
@@ -2,14 +2,20 @@
 
 import re
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import CallbackContext, MessageHandler, Filters, CallbackQueryHandler
-from collect.models import Submission, SubmissionPhoto
-from places.models import Staff
+from telegram.ext import CallbackContext, CallbackQueryHandler
+from collect.models import SubmissionPhoto
+from collect.services import (
+    find_staff_in_place, get_active_staff, get_staff_photo_ids, get_staff_submissions, get_submission_by_page
+)
 from interactions.keyboards import build_submission_keyboard
-from interactions.utils import render_submission, get_submission_page
+from interactions.utils import render_submission
+from common.callbacks import make_cb, parse_cb
+from common.file_refs import prefetch_photos, send_field_photo
+from common.keyboards import place_suggestion_keyboard
 
 
 QUERY_PATTERN = re.compile(r"^#(?P<place1>\S+)\s*#(?P<nick1>\S+)$")
+SUGGEST_PREFIX = "staffq"
 
 # ============================================================
 # safe_edit：统一处理文本消息 / 照片消息
@@ -32,7 +38,7 @@ def safe_edit(query, text, keyboard=None):
 # ============================================================
 # 构建技师投稿视图键盘
 # ============================================================
-def build_staff_submission_keyboard(submission, staff, page, total_submissions, user_id=None):
+def build_staff_submission_keyboard(submission, staff, page, total_submissions, user_id=None, photo_count=None):
     base = build_submission_keyboard(submission, staff, user_id=user_id)
     rows = base.inline_keyboard
 
@@ -45,8 +51,10 @@ def build_staff_submission_keyboard(submission, staff, page, total_submissions,
     if nav:
         rows.append(nav)
 
-    # 查看所有照片
-    if SubmissionPhoto.objects.filter(submission__staff=staff).exists():
+    # 查看所有照片（照片数来自投稿列表缓存）
+    if photo_count is None:
+        photo_count = get_staff_submissions(staff.id)["photo_count"]
+    if photo_count:
         rows.append([
             InlineKeyboardButton(
                 "查看该技师所有照片",
@@ -60,7 +68,39 @@ def build_staff_submission_keyboard(submission, staff, page, total_submissions,
 # ============================================================
 # 群聊查询入口
 # ============================================================
+def build_staff_view(staff, page=1, user_id=None):
+    """技师投稿视图：第 page 条有效投稿，返回 (text, keyboard)"""
+    data = get_staff_submissions(staff.id)
+    submission, page, total = get_submission_by_page(staff.id, page)
+    if submission is None:
+        return "该技师暂无有效投稿", None
+
+    text = render_submission(submission)
+    keyboard = build_staff_submission_keyboard(
+        submission, staff, page, total, user_id=user_id, photo_count=data["photo_count"]
+    )
+    return text, keyboard
+
+
+def build_place_staff_view(place, nickname=None):
+    """场所 + 昵称 → 技师投稿视图，返回 (text, keyboard)"""
+    staff = find_staff_in_place(place, nickname)
+    if not staff:
+        if nickname:
+            return f"未找到 {place.name} 的在职技师 {nickname}", None
+        return "未找到在职技师", None
+    return build_staff_view(staff)
+
+
+def suggestion_args(nickname):
+    """按钮 callback_data 最长 64 字节，昵称放不下时只带场所"""
+    cb = make_cb(SUGGEST_PREFIX, "pick", 0, nickname)
+    return (nickname,) if len(cb.encode()) + 10 <= 64 else ()
+
+
 def handle_group_query(update: Update, context: CallbackContext):
+    from places.services import find_place_by_name, search_places
+
     if update.effective_chat.type not in ("group", "supergroup"):
         return
 
@@ -69,28 +109,48 @@ def handle_group_query(update: Update, context: CallbackContext):
         return
 
     m = QUERY_PATTERN.search(text)
-    place = m.group("place1")
+    if not m:
+        return
+    place_name = m.group("place1")
     nickname = m.group("nick1")
 
-    if not place:
+    if not place_name:
         return
 
-    staff = Staff.objects.filter(place__name__icontains=place, is_active=True).first()
-    if not staff:
-        update.message.reply_text("未找到在职技师")
+    place = find_place_by_name(place_name)
+    if not place:
+        # 名称可能打错了：给出模糊匹配的场所让用户点选
+        suggestions = search_places(place_name)
+        if suggestions:
+            update.message.reply_text(
+                f"未找到场所 {place_name}，你是不是要找：",
+                reply_markup=place_suggestion_keyboard(
+                    suggestions, SUGGEST_PREFIX, "pick", *suggestion_args(nickname)
+                )
+            )
+        else:
+            update.message.reply_text("未找到在职技师")
         return
 
-    submissions = Submission.objects.filter(staff=staff, is_valid=True).order_by("-created_at")
-    if not submissions.exists():
-        update.message.reply_text("该技师暂无有效投稿")
-        return
+    text, keyboard = build_place_staff_view(place, nickname)
+    update.message.reply_text(text, reply_markup=keyboard)
 
-    page = 1
-    submission = get_submission_page(submissions, page)
-    text = render_submission(submission)
-    keyboard = build_staff_submission_keyboard(submission, staff, page, submissions.count())
 
-    update.message.reply_text(text, reply_markup=keyboard)
+def staff_place_suggestion_callback(update: Update, context: CallbackContext):
+    from places.services import get_place
+
+    query = update.callback_query
+    query.answer()
+
+    _, _, args = parse_cb(query.data)
+    place = get_place(int(args[0]))
+    if not place:
+        safe_edit(query, "该场所已不存在。")
+        return
+
+    nickname = args[1] if len(args) > 1 else None
+    text, keyboard = build_place_staff_view(place, nickname)
+    safe_edit(query, text, keyboard)
 
 
 # ============================================================
@@ -106,23 +166,22 @@ def staff_photos_view(update: Update, context: CallbackContext):
     staff_id = int(staff_id_str)
     page = int(page_str)
 
-    staff = Staff.objects.filter(id=staff_id, is_active=True).first()
+    staff = get_active_staff(staff_id)
     if not staff:
         safe_edit(query, "该技师已不存在或已离职。")
         return
 
-    photos = SubmissionPhoto.objects.filter(
-        submission__staff=staff,
-        submission__is_valid=True
-    ).select_related("submission").order_by("-submission__created_at", "id")
-
-    total = photos.count()
+    photo_ids = get_staff_photo_ids(staff.id)
+    total = len(photo_ids)
     if total == 0:
         safe_edit(query, "该技师暂无照片。")
         return
 
     page = max(1, min(page, total))
-    photo = photos[page - 1]
+    photo = SubmissionPhoto.objects.select_related("submission").filter(pk=photo_ids[page - 1]).first()
+    if photo is None:
+        safe_edit(query, "该照片已被删除。")
+        return
 
     place = staff.place
     caption = (
@@ -151,21 +210,21 @@ def staff_photos_view(update: Update, context: CallbackContext):
 
     # ⭐ 判断当前消息是否是照片
     if query.message.photo:
-        # 当前是照片 → 用 edit_message_media 替换照片
-        query.edit_message_media(
-            media=InputMediaPhoto(
-                media=photo.image,
-                caption=caption
-            ),
-            reply_markup=keyboard
-        )
+        # 当前是照片 → 用 edit_message_media 替换照片（优先复用 file_id）
+        def edit_media(photo, caption, reply_markup):
+            return query.edit_message_media(
+                media=InputMediaPhoto(media=photo, caption=caption),
+                reply_markup=reply_markup
+            )
+
+        send_field_photo(edit_media, photo.image, caption=caption, reply_markup=keyboard)
     else:
         # 当前是文字 → 第一次进入照片视图 → reply_photo
-        query.message.reply_photo(
-            photo=photo.image,
-            caption=caption,
-            reply_markup=keyboard
-        )
+        send_field_photo(query.message.reply_photo, photo.image, caption=caption, reply_markup=keyboard)
+
+    # 下一张大概率会被查看，提前拉到本地缓存
+    if page < total:
+        prefetch_photos(SubmissionPhoto.objects.filter(pk=photo_ids[page]).values_list("image", flat=True))
 
 
 # ============================================================
@@ -179,20 +238,12 @@ def staff_submissions_view(update: Update, context: CallbackContext):
     staff_id = int(staff_id_str)
     page = int(page_str)
 
-    staff = Staff.objects.filter(id=staff_id, is_active=True).first()
+    staff = get_active_staff(staff_id)
     if not staff:
         safe_edit(query, "该技师已不存在或已离职。")
         return
 
-    submissions = Submission.objects.filter(staff=staff, is_valid=True).order_by("-created_at")
-    if not submissions.exists():
-        safe_edit(query, "该技师暂无有效投稿。")
-        return
-
-    submission = get_submission_page(submissions, page)
-    text = render_submission(submission)
-    keyboard = build_staff_submission_keyboard(submission, staff, page, submissions.count())
-
+    text, keyboard = build_staff_view(staff, page)
     safe_edit(query, text, keyboard)
 
 
@@ -207,16 +258,12 @@ def staff_submission_page(update: Update, context: CallbackContext):
     staff_id = int(staff_id_str)
     page = int(page_str)
 
-    staff = Staff.objects.filter(id=staff_id, is_active=True).first()
+    staff = get_active_staff(staff_id)
     if not staff:
         safe_edit(query, "该技师已不存在或已离职。")
         return
 
-    submissions = Submission.objects.filter(staff=staff, is_valid=True).order_by("-created_at")
-    submission = get_submission_page(submissions, page)
-    text = render_submission(submission)
-    keyboard = build_staff_submission_keyboard(submission, staff, page, submissions.count())
-
+    text, keyboard = build_staff_view(staff, page)
     safe_edit(query, text, keyboard)
 
 
@@ -224,11 +271,8 @@ def staff_submission_page(update: Update, context: CallbackContext):
 # 注册 handlers
 # ============================================================
 def register_query_staff_handlers(dp):
-    # 查询：匹配 #dc#999 / #dc #999，但排除 #报告
-    dp.add_handler(MessageHandler(
-        Filters.regex(r"^#(?!报告)\s*\S+") & Filters.chat_type.groups,
-        handle_group_query
-    ))
+    # 群内查询（#dc#999 / #dc #999）由 bot_core.handlers.group_router 统一分发到 handle_group_query
     dp.add_handler(CallbackQueryHandler(staff_photos_view, pattern=r"^staff_photos:\d+:\d+$"))
     dp.add_handler(CallbackQueryHandler(staff_submissions_view, pattern=r"^staff_submissions:\d+:\d+$"))
     dp.add_handler(CallbackQueryHandler(staff_submission_page, pattern=r"^sub:page:\d+:\d+$"))
+    dp.add_handler(CallbackQueryHandler(staff_place_suggestion_callback, pattern=rf"^{SUGGEST_PREFIX}:pick:\d+$"))
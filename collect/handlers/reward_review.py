@@ -21,6 +21,7 @@ from telegram.ext import (
 from collect.models import Submission, SubmissionPhoto
 from places.models import Staff
 from common.callbacks import make_cb
+from common.file_refs import prefetch_photos, send_field_photo
 from common.keyboards import append_back_button
 
 logger = logging.getLogger(__name__)
@@ -168,13 +169,17 @@ def _show_photo(update: Update, context: CallbackContext):
         ]
     ])
 
-    # 使用 reply_photo，不使用 edit_message_media
-    query.message.reply_photo(
+    # 使用 reply_photo，不使用 edit_message_media；优先复用 Telegram file_id
+    send_field_photo(
+        query.message.reply_photo,
         photo.image,
         caption=f"照片 {index+1}/{len(photos)}",
         reply_markup=keyboard
     )
 
+    # 提前把下一张拉到本地缓存
+    prefetch_photos([p.image.name for p in photos[index + 1:index + 2]])
+
     return REVIEWING_PHOTO
 
 
@@ -15,10 +15,10 @@ from telegram.ext import (
 )
 
 from common.callbacks import parse_cb
+from common.file_refs import accept_telegram_file
 from common.keyboards import append_back_button
 from tgusers.services import update_or_create_user
 from collect.models import Campaign, Submission, SubmissionPhoto
-from django.core.files.base import ContentFile
 import html
 
 
@@ -335,12 +335,11 @@ def reward_submit_confirm(update: Update, context: CallbackContext):
         status="pending",
     )
 
-    for file_id in draft["photo_file_ids"]:
-        tg_file = context.bot.get_file(file_id)
-        file_bytes = tg_file.download_as_bytearray()
+    # 只登记 file_id，图片由后台任务下载写入存储，用户不用等待
+    for i, file_id in enumerate(draft["photo_file_ids"], start=1):
         SubmissionPhoto.objects.create(
             submission=submission,
-            image=ContentFile(file_bytes, name=f"{tg_file.file_id}.jpg")
+            image=accept_telegram_file(f"submission_photos/{submission.id}_{i}.jpg", file_id)
         )
 
     context.user_data.pop("reward_draft", None)
@@ -0,0 +1,153 @@
+# collect/services.py
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from collect.models import Submission, SubmissionPhoto
+from common.versioning import ProcessLocalIndex, bump_version, current_version
+from places.models import Place, Staff
+from places.services import find_place_by_name, normalize_name
+
+# ============================
+# 1. 技师索引（进程内）
+# ============================
+# (place_id, 归一化昵称) → staff_id，只包含在职技师。
+# 与场所名称索引相同：Staff 保存 / 删除时 signals 更新共享缓存里的版本号，
+# 各进程每秒最多检查一次，最长 60 秒强制重建（见 common.versioning）。
+
+STAFF_INDEX_VERSION_KEY = "collect:staff_index_version"
+
+
+@dataclass(frozen=True)
+class StaffIndex:
+    version: int
+    staffs: Dict[int, Staff] = field(default_factory=dict)
+    by_nickname: Dict[Tuple[int, str], int] = field(default_factory=dict)
+    by_place: Dict[int, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, version: int) -> "StaffIndex":
+        staffs = {s.id: s for s in Staff.objects.filter(is_active=True).select_related("place").order_by("id")}
+
+        by_nickname = {}
+        by_place = defaultdict(list)
+        for s in staffs.values():
+            by_nickname.setdefault((s.place_id, normalize_name(s.nickname)), s.id)
+            by_place[s.place_id].append(s.id)
+
+        return cls(version=version, staffs=staffs, by_nickname=by_nickname, by_place=dict(by_place))
+
+
+_staff_index = ProcessLocalIndex(STAFF_INDEX_VERSION_KEY, StaffIndex.build)
+
+
+def get_staff_index() -> StaffIndex:
+    return _staff_index.get()
+
+
+def invalidate_staff_index():
+    """技师变更后调用（signals 自动调用）"""
+    _staff_index.invalidate()
+
+
+def get_active_staff(staff_id: int) -> Optional[Staff]:
+    return get_staff_index().staffs.get(staff_id)
+
+
+def find_staff_in_place(place: Place, nickname: Optional[str] = None) -> Optional[Staff]:
+    """
+    在场所内按昵称查找在职技师：
+    精确匹配（忽略大小写 / 全半角）优先，其次是唯一的包含匹配；
+    不传昵称时返回该场所第一个在职技师。
+    """
+    index = get_staff_index()
+    staff_ids = index.by_place.get(place.id, [])
+    if not staff_ids:
+        return None
+
+    if not nickname:
+        return index.staffs[staff_ids[0]]
+
+    key = normalize_name(nickname)
+    staff_id = index.by_nickname.get((place.id, key))
+    if staff_id is not None:
+        return index.staffs[staff_id]
+
+    partial = [sid for sid in staff_ids if key in normalize_name(index.staffs[sid].nickname)]
+    if len(partial) == 1:
+        return index.staffs[partial[0]]
+    return None
+
+
+def find_staff(place_name: str, nickname: str) -> Tuple[Optional[Place], Optional[Staff]]:
+    """#场所 #昵称 → (place, staff)；场所可以是任意别名 / 曾用名"""
+    place = find_place_by_name(place_name)
+    if place is None:
+        return None, None
+    return place, find_staff_in_place(place, nickname)
+
+
+# ============================
+# 2. 技师投稿 / 照片列表缓存
+# ============================
+# 有效投稿的有序 id 列表 + 照片数一次查询得到并缓存，翻页按主键取一条。
+# Submission / SubmissionPhoto 任何变更都会更新版本号（共享缓存），所有技师的缓存一起失效；
+# 列表最长缓存 BROWSE_TTL，绕过 signals 的改动（queryset.update 等）也会在这之后可见。
+
+BROWSE_VERSION_KEY = "collect:staff_browse_version"
+BROWSE_CACHE_KEY = "collect:staff_browse:{}:{}"
+PHOTO_IDS_CACHE_KEY = "collect:staff_photos:{}:{}"
+BROWSE_TTL = 5 * 60  # 秒
+
+
+def get_staff_submissions(staff_id: int) -> dict:
+    """返回 {"ids": [有效投稿 id，按提交时间倒序], "photo_count": 有效投稿的照片总数}"""
+    version = current_version(BROWSE_VERSION_KEY)
+    key = BROWSE_CACHE_KEY.format(version, staff_id)
+    data = cache.get(key)
+    if data is None:
+        rows = list(
+            Submission.objects.filter(staff_id=staff_id, is_valid=True)
+            .annotate(photo_count=Count("photos"))
+            .order_by("-created_at", "-id")
+            .values_list("id", "photo_count")
+        )
+        data = {
+            "ids": [sid for sid, _ in rows],
+            "photo_count": sum(n for _, n in rows),
+        }
+        cache.set(key, data, BROWSE_TTL)
+    return data
+
+
+def get_staff_photo_ids(staff_id: int) -> List[int]:
+    """有效投稿的照片 id，按投稿时间倒序"""
+    version = current_version(BROWSE_VERSION_KEY)
+    key = PHOTO_IDS_CACHE_KEY.format(version, staff_id)
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(
+            SubmissionPhoto.objects.filter(submission__staff_id=staff_id, submission__is_valid=True)
+            .order_by("-submission__created_at", "id")
+            .values_list("id", flat=True)
+        )
+        cache.set(key, ids, BROWSE_TTL)
+    return ids
+
+
+def get_submission_by_page(staff_id: int, page: int):
+    """返回 (submission, page, total)；page 超出范围时自动收敛"""
+    ids = get_staff_submissions(staff_id)["ids"]
+    if not ids:
+        return None, 0, 0
+    page = max(1, min(page, len(ids)))
+    submission = Submission.objects.select_related("staff__place").filter(pk=ids[page - 1]).first()
+    return submission, page, len(ids)
+
+
+def invalidate_staff_browse():
+    bump_version(BROWSE_VERSION_KEY)
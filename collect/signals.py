@@ -0,0 +1,23 @@
+# collect/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from collect.models import Submission, SubmissionPhoto
+from collect.services import invalidate_staff_browse, invalidate_staff_index
+from places.models import Staff
+
+
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_staff_index_on_change(sender, instance, **kwargs):
+    """技师新增 / 改名 / 离职后重建技师索引"""
+    invalidate_staff_index()
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+@receiver(post_save, sender=SubmissionPhoto)
+@receiver(post_delete, sender=SubmissionPhoto)
+def invalidate_staff_browse_on_change(sender, instance, **kwargs):
+    """投稿或照片变化后，技师的投稿列表 / 照片数缓存失效"""
+    invalidate_staff_browse()
@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Broadcast
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    """广播任务（只读查看进度）"""
+    list_display = (
+        "id", "status", "cursor", "total", "success_count", "failure_count",
+        "blocked_count", "skipped_count", "sends_per_second", "created_at", "finished_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("text",)
+    exclude = ("recipients",)
+    readonly_fields = (
+        "cursor", "total", "success_count", "failure_count", "blocked_count", "skipped_count",
+        "elapsed_seconds", "sends_per_second", "started_at", "finished_at", "created_at", "updated_at",
+    )
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'common'
+
+    def ready(self):
+        from common.message_utils.engine import send_engine
+        from common.broadcast import mark_blocked_recipients
+
+        if mark_blocked_recipients not in send_engine.batch_callbacks:
+            send_engine.batch_callbacks.append(mark_blocked_recipients)
+
+        # 图片处理要先于 file_id 失效检查连接（pre_save 按连接顺序执行）
+        from common.images import register_image_processing
+        from common.file_refs import register_file_ref_invalidation
+        register_image_processing()
+        register_file_ref_invalidation()
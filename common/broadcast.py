@@ -1,16 +1,78 @@
 #common/broadcast.py
 # 导入模型
 import logging
+import time
+from datetime import timedelta
 from typing import List, Tuple, Union
 from typing import Optional
-from telegram import Update
 
-from common.message_utils import queue_message  # 你的异步发送函数
+from django.db import models
+from django.utils import timezone
+
+from common.message_utils.engine import send_engine, build_payload
 
 logger = logging.getLogger(__name__)
 
+BROADCAST_CHUNK_SIZE = 100      # 每次从 cursor 取出的接收人数
+BROADCAST_TIME_BUDGET = 200     # 秒，单次任务运行上限，超出后从 cursor 续跑
+BROADCAST_LOCK_RETRY = 5        # 秒，发送锁被占用时的重试间隔
+BROADCAST_STALE_AFTER = 5 * 60  # 秒，心跳（updated_at）超过该时间未更新才视为 worker 已中断
+
 
 # ---------------------- 广播函数 ----------------------
+def create_broadcast(
+        user_ids: List[Union[int, str]],
+        text: str,
+        buttons: Optional[list] = None,
+        disable_web_page_preview: bool = False,
+        pin_message: bool = False,
+        parse_mode: str = 'HTML'
+):
+    """创建广播任务（去重 + 排除已屏蔽机器人的用户）并提交执行"""
+    from common.models import Broadcast
+    from common.tasks import run_broadcast
+    from tgusers.models import TelegramUser
+
+    valid_user_ids = []
+    seen = set()
+    for uid in user_ids:
+        if uid and (isinstance(uid, int) or (isinstance(uid, str) and uid.strip())):
+            try:
+                uid_int = int(str(uid).strip())
+            except ValueError:
+                continue
+            if uid_int not in seen:
+                seen.add(uid_int)
+                valid_user_ids.append(uid_int)
+
+    blocked = set(
+        TelegramUser.objects.filter(user_id__in=valid_user_ids, is_blocked=True)
+        .values_list("user_id", flat=True)
+    )
+    recipients = [uid for uid in valid_user_ids if uid not in blocked]
+
+    broadcast = Broadcast(
+        text=text,
+        buttons=buttons,
+        parse_mode=parse_mode,
+        disable_web_page_preview=disable_web_page_preview,
+        pin_message=pin_message,
+        skipped_count=len(blocked),
+    )
+    broadcast.set_recipients(recipients)
+    broadcast.save()
+
+    if broadcast.total:
+        run_broadcast.delay(broadcast.id)
+    else:
+        broadcast.status = "done"
+        broadcast.finished_at = timezone.now()
+        broadcast.save(update_fields=["status", "finished_at"])
+
+    logger.info(f"广播任务 #{broadcast.id} 已创建：{broadcast.total} 人，跳过已屏蔽 {len(blocked)} 人")
+    return broadcast
+
+
 def send_broadcast_to_users(
         user_ids: List[Union[int, str]],
         text: str,
@@ -23,34 +85,149 @@ def send_broadcast_to_users(
         logger.warning("用户ID列表为空或格式错误，无需发送")
         return (0, 0, [])
 
-    valid_user_ids = []
-    seen = set()
-    for uid in user_ids:
-        if uid and (isinstance(uid, int) or (isinstance(uid, str) and uid.strip())):
-            uid_str = str(uid).strip()
-            if uid_str not in seen:
-                seen.add(uid_str)
-                valid_user_ids.append(uid_str)
+    try:
+        broadcast = create_broadcast(
+            user_ids,
+            text,
+            buttons=buttons,
+            disable_web_page_preview=disable_web_page_preview,
+            pin_message=pin_message,
+            parse_mode=parse_mode,
+        )
+    except Exception as e:
+        logger.error(f"❌ 创建广播任务失败：共 {len(user_ids)} 人 错误：{e}", exc_info=True)
+        return (0, len(user_ids), [])
 
-    total_users = len(valid_user_ids)
-    task_ids = []
-    successfully_submitted = 0
+    return (broadcast.total, broadcast.total + broadcast.skipped_count, [str(broadcast.id)])
 
-    for user_id in valid_user_ids:
-        try:
-            task_id = queue_message(
-                chat_id=user_id,
-                text=text,
-                buttons=buttons,
-                disable_web_page_preview=disable_web_page_preview,
-                pin_message=pin_message,
-                parse_mode=parse_mode
+
+# ---------------------- 广播执行 ----------------------
+def run_broadcast_job(broadcast_id: int, time_budget: float = BROADCAST_TIME_BUDGET):
+    """
+    从 cursor 开始按块发送，每块发送完成后在一条 UPDATE 里推进 cursor 和计数。
+    执行期间持有发送锁，并在每块之间先消费普通消息队列，避免交互消息被广播饿死。
+
+    返回：
+      - "retry"：发送锁被占用，需要稍后重试
+      - "continue"：超出时间预算，需要续跑
+      - "done" / "skip"
+    """
+    from common.models import Broadcast
+
+    if not Broadcast.objects.filter(id=broadcast_id).exclude(status__in=("done", "cancelled")).exists():
+        return "skip"
+
+    token = send_engine.acquire_lock()
+    if token is None:
+        # 等锁期间也要更新心跳，否则兜底任务会把它当成中断的任务重复提交
+        Broadcast.objects.filter(id=broadcast_id).update(updated_at=timezone.now())
+        return "retry"
+
+    started = time.monotonic()
+    deadline = started + time_budget
+    try:
+        # 拿到锁之后再读取，保证 cursor 是最新的
+        broadcast = Broadcast.objects.filter(id=broadcast_id).first()
+        if not broadcast or broadcast.status in ("done", "cancelled"):
+            return "skip"
+
+        if broadcast.status != "running":
+            Broadcast.objects.filter(id=broadcast.id).update(
+                status="running", started_at=broadcast.started_at or timezone.now(), updated_at=timezone.now()
+            )
+
+        base = {
+            "text": broadcast.text,
+            "buttons": broadcast.buttons,
+            "parse_mode": broadcast.parse_mode,
+            "disable_web_page_preview": broadcast.disable_web_page_preview,
+            "pin_message": broadcast.pin_message,
+        }
+        cursor = broadcast.cursor
+
+        while cursor < broadcast.total and time.monotonic() < deadline:
+            # 先处理普通队列里的一批消息
+            queued = send_engine.pop_batch()
+            if queued:
+                _, leftover = send_engine.send_batch(queued, deadline=deadline)
+                send_engine.ack(leftover)
+
+            chunk = broadcast.get_recipients(cursor, cursor + BROADCAST_CHUNK_SIZE)
+            chunk_started = time.monotonic()
+            stats, _ = send_engine.send_batch(
+                [build_payload(chat_id=uid, broadcast_id=broadcast.id, **base) for uid in chunk]
+            )
+            cursor += len(chunk)
+
+            Broadcast.objects.filter(id=broadcast.id).update(
+                cursor=cursor,
+                success_count=models.F("success_count") + stats["ok"],
+                failure_count=models.F("failure_count") + stats["failed"],
+                blocked_count=models.F("blocked_count") + stats["blocked"],
+                elapsed_seconds=models.F("elapsed_seconds") + (time.monotonic() - chunk_started),
+                updated_at=timezone.now(),  # 心跳（update() 不会触发 auto_now）
             )
-            task_ids.append(task_id)
-            successfully_submitted += 1
-            logger.info(f"✅ 已提交发送任务：user_id={user_id} task_id={task_id}")
-        except Exception as e:
-            logger.error(f"❌ 提交发送任务失败：user_id={user_id} 错误：{e}", exc_info=True)
-
-    logger.info(f"消息广播任务提交完成。成功提交：{successfully_submitted}/{total_users}")
-    return (successfully_submitted, total_users, task_ids)
\ No newline at end of file
+            send_engine.refresh_lock(token)
+    finally:
+        send_engine.release_lock(token)
+
+    if cursor < broadcast.total:
+        return "continue"
+
+    broadcast.refresh_from_db()
+    broadcast.status = "done"
+    broadcast.finished_at = timezone.now()
+    if broadcast.elapsed_seconds > 0:
+        broadcast.sends_per_second = round(broadcast.success_count / broadcast.elapsed_seconds, 2)
+    broadcast.save(update_fields=["status", "finished_at", "sends_per_second", "updated_at"])
+
+    logger.info(
+        f"广播任务 #{broadcast.id} 完成：成功 {broadcast.success_count} 失败 {broadcast.failure_count} "
+        f"屏蔽 {broadcast.blocked_count}，{broadcast.sends_per_second} 条/秒"
+    )
+    return "done"
+
+
+def resume_unfinished_broadcasts():
+    """
+    重新提交中断的广播任务（worker 崩溃后由定时任务调用）。
+    只处理心跳超过 BROADCAST_STALE_AFTER 秒未更新的任务：正在发送 / 等锁 / 续跑中的任务会持续更新心跳，
+    不会被重复提交。提交前用条件 UPDATE 刷新心跳占住任务，并发的兜底扫描不会重复提交同一个。
+    """
+    from common.models import Broadcast
+    from common.tasks import run_broadcast
+
+    stale_before = timezone.now() - timedelta(seconds=BROADCAST_STALE_AFTER)
+    candidates = list(
+        Broadcast.objects.filter(status__in=("pending", "running"), updated_at__lt=stale_before)
+        .values_list("id", flat=True)
+    )
+
+    ids = []
+    for broadcast_id in candidates:
+        claimed = Broadcast.objects.filter(id=broadcast_id, updated_at__lt=stale_before).update(
+            updated_at=timezone.now()
+        )
+        if claimed:
+            run_broadcast.delay(broadcast_id)
+            ids.append(broadcast_id)
+    return ids
+
+
+def mark_blocked_recipients(results):
+    """发送引擎批次回调：403 的私聊用户标记为已屏蔽"""
+    from tgusers.services import mark_users_blocked
+
+    user_ids = []
+    for message, status, response in results:
+        if status != "blocked":
+            continue
+        try:
+            chat_id = int(message["chat_id"])
+        except (TypeError, ValueError):
+            continue
+        if chat_id > 0:  # 只有私聊用户，群/频道 id 为负数
+            user_ids.append(chat_id)
+
+    if user_ids:
+        mark_users_blocked(user_ids)
@@ -0,0 +1,291 @@
+# common/file_refs.py
+
+"""
+Telegram file_id 缓存
+
+- 图片第一次上传后，从 Telegram 返回的消息里取 file_id 记到 TelegramFileRef
+- 用户发来的图片在接收时只登记 file_id，由后台任务下载写入存储（见 accept_telegram_file）
+- 之后发送同一张图直接用 file_id，0 字节传输
+- file_id 失效（例如换了 bot token）时自动删除记录并重新上传
+- 图片字段换了文件或记录被删除时清掉对应记录（见 FILE_REF_FIELDS）
+"""
+
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+from telegram.error import BadRequest
+
+from common.message_utils.sender import TELEGRAM_API_BASE, call_telegram_api, get_http_session
+from common.models import TelegramFileRef
+
+logger = logging.getLogger(__name__)
+
+FILE_REF_CACHE_KEY = "tgfile:{}"
+FILE_REF_CACHE_TTL = 24 * 60 * 60
+MISSING = "-"  # 缓存「没有记录」，避免重复查库
+
+# 需要缓存 file_id 的图片字段：(app_label.Model, 字段名)
+FILE_REF_FIELDS = [
+    ("reports.Report", "image"),
+    ("collect.SubmissionPhoto", "image"),
+    ("places.Marketing", "qr_or_screenshot"),
+]
+
+MEDIA_MAX_ATTEMPTS = 5      # 超过次数不再自动重试，留在后台排查（last_error）
+MEDIA_RETRY_DELAY = 30      # 秒，按尝试次数指数退避
+MEDIA_SWEEP_GRACE = 2 * 60  # 秒，兜底扫描只处理登记超过该时间仍未写入存储的记录
+
+PLACEHOLDER_NAME = "static/no_image.png"    # 图片缺失 / 还没写入存储时发送的占位图
+
+
+def get_file_id(name):
+    """存储路径 → file_id，没有记录返回 None"""
+    if not name:
+        return None
+
+    key = FILE_REF_CACHE_KEY.format(name)
+    file_id = cache.get(key)
+    if file_id is None:
+        file_id = TelegramFileRef.objects.filter(name=name).values_list("file_id", flat=True).first() or MISSING
+        cache.set(key, file_id, FILE_REF_CACHE_TTL)
+    return None if file_id == MISSING else file_id
+
+
+def remember_file_id(name, file_id, file_unique_id=""):
+    if not name or not file_id:
+        return
+    TelegramFileRef.objects.update_or_create(
+        name=name, defaults={"file_id": file_id, "file_unique_id": file_unique_id or ""}
+    )
+    cache.set(FILE_REF_CACHE_KEY.format(name), file_id, FILE_REF_CACHE_TTL)
+
+
+def forget_file_id(*names, keep_pending=False):
+    """
+    keep_pending=True 时保留还没写入存储的记录：那是这张图唯一的来源，
+    即使 file_id 暂时不可用也不能删，交给后台下载任务处理。
+    """
+    names = [n for n in names if n]
+    if not names:
+        return
+    refs = TelegramFileRef.objects.filter(name__in=names)
+    if keep_pending:
+        refs = refs.filter(stored=True)
+    refs.delete()
+    cache.delete_many([FILE_REF_CACHE_KEY.format(n) for n in names])
+
+
+def remember_from_message(name, message):
+    """从发送结果（Message）里取最大尺寸图片的 file_id"""
+    photos = getattr(message, "photo", None)
+    if not photos:
+        return
+    largest = photos[-1]
+    remember_file_id(name, largest.file_id, largest.file_unique_id)
+
+
+def send_photo_cached(send, name, opener, **kwargs):
+    """
+    send: 发送函数，例如 bot.send_photo（已绑定 chat_id）或 message.reply_photo，以 photo= 传图
+    name: 存储路径（缓存键）
+    opener: 没有 file_id 时打开文件的函数，返回文件对象
+    """
+    file_id = get_file_id(name)
+    if file_id:
+        try:
+            return send(photo=file_id, **kwargs)
+        except BadRequest as e:
+            logger.warning(f"[file_ref] file_id 失效，重新上传 {name}: {e}")
+            forget_file_id(name, keep_pending=True)
+            if TelegramFileRef.objects.filter(name=name, stored=False).exists():
+                # 还没写入存储，没有文件可上传：先发占位图，等后台下载任务处理
+                return send_placeholder_photo(send, **kwargs)
+
+    with opener() as f:
+        message = send(photo=f, **kwargs)
+    remember_from_message(name, message)
+    return message
+
+
+def send_placeholder_photo(send, **kwargs):
+    path = os.path.join(settings.BASE_DIR, PLACEHOLDER_NAME)
+    return send_photo_cached(send, PLACEHOLDER_NAME, lambda: open(path, "rb"), **kwargs)
+
+
+def send_field_photo(send, field_file, **kwargs):
+    """发送 ImageField 中的图片（优先 file_id，没有时上传预览图而不是原图）"""
+    from common.images import open_preview
+
+    return send_photo_cached(send, field_file.name, lambda: open_preview(field_file), **kwargs)
+
+
+def prefetch_photos(names):
+    """
+    预取接下来可能要发送的图片（例如下一页），names 为图片字段的存储路径。
+    已有 file_id 的不需要读存储，其余预取预览图；只对带本地缓存的远程存储生效。
+    """
+    from bot_core.storage_backends import prefetch_media
+    from common.images import preview_name
+
+    prefetch_media([preview_name(name) for name in names if name and not get_file_id(name)])
+
+
+def move_file_ref(old_name, new_name):
+    """
+    图片换了存储路径（处理后改为内容寻址路径）：
+    把所有指向旧路径的图片字段改到新路径，file_id 记录跟着迁移（内容相同，file_id 仍然可用）。
+    """
+    from django.apps import apps
+
+    if old_name == new_name:
+        return
+
+    for label, field in FILE_REF_FIELDS:
+        apps.get_model(label).objects.filter(**{field: old_name}).update(**{field: new_name})
+
+    ref = TelegramFileRef.objects.filter(name=old_name).first()
+    if ref is not None:
+        if TelegramFileRef.objects.filter(name=new_name).exists():
+            ref.delete()
+        else:
+            TelegramFileRef.objects.filter(pk=ref.pk).update(name=new_name, stored=True, last_error="")
+    cache.delete_many([FILE_REF_CACHE_KEY.format(old_name), FILE_REF_CACHE_KEY.format(new_name)])
+
+
+# ========================
+# 延迟下载：先登记 file_id，后台再写入存储
+# ========================
+
+def accept_telegram_file(name, file_id, file_unique_id=""):
+    """
+    接收用户发来的图片：只登记 file_id，立刻可以用于展示（send_field_photo 走 file_id），
+    事务提交后交给后台任务下载并写入存储。
+    name 为图片字段要使用的存储路径，调用方直接把它赋给字段（不会触发上传）。
+    """
+    TelegramFileRef.objects.update_or_create(
+        name=name,
+        defaults={
+            "file_id": file_id,
+            "file_unique_id": file_unique_id or "",
+            "stored": False,
+            "attempts": 0,
+            "last_error": "",
+        },
+    )
+    cache.set(FILE_REF_CACHE_KEY.format(name), file_id, FILE_REF_CACHE_TTL)
+    transaction.on_commit(lambda: enqueue_store_file(name))
+    return name
+
+
+def enqueue_store_file(name, countdown=0):
+    from common.tasks import store_telegram_file
+
+    try:
+        store_telegram_file.apply_async((name,), countdown=countdown)
+    except Exception as e:
+        # broker 不可用时不影响用户流程，由 store_pending_files 兜底
+        logger.warning(f"[file_ref] 下载任务入队失败 {name}: {e}")
+
+
+def download_telegram_file(file_id) -> bytes:
+    """通过 Bot API 下载文件内容（getFile + 文件地址）"""
+    res = call_telegram_api("getFile", {"file_id": file_id})
+    if not res.get("ok"):
+        raise RuntimeError(res.get("description") or "getFile 失败")
+
+    url = f"{TELEGRAM_API_BASE}/file/bot{settings.TELEGRAM_BOT_TOKEN}/{res['result']['file_path']}"
+    resp = get_http_session().get(url, timeout=60)
+    resp.raise_for_status()
+    return resp.content
+
+
+def store_pending_file(name) -> bool:
+    """
+    下载一张待存储的图片，处理（缩略图 / 去 EXIF / 内容寻址）后写入默认存储，
+    图片字段改为指向处理后的路径。
+    没有待处理记录（已存储 / 记录已删除）返回 False；失败时记录错误并抛出，由任务重试。
+    """
+    from common.images import IMAGE_ERRORS, process_image
+
+    ref = TelegramFileRef.objects.filter(name=name, stored=False).first()
+    if ref is None:
+        return False
+
+    try:
+        data = download_telegram_file(ref.file_id)
+        try:
+            asset = process_image(data)
+        except IMAGE_ERRORS as e:
+            # 无法识别 / 解码的图片：原样保存到登记的路径
+            logger.warning(f"[file_ref] 图片处理失败，按原文件保存 {name}: {e}")
+            asset = None
+            if not default_storage.exists(name):
+                saved = default_storage.save(name, ContentFile(data))
+                if saved != name:
+                    # 另一个任务已经写入了同一路径，内容相同，删掉多出来的副本
+                    default_storage.delete(saved)
+    except Exception as e:
+        TelegramFileRef.objects.filter(pk=ref.pk).update(attempts=F("attempts") + 1, last_error=str(e)[:1000])
+        raise
+
+    if asset is not None:
+        move_file_ref(name, asset.name)
+    else:
+        TelegramFileRef.objects.filter(pk=ref.pk).update(stored=True, last_error="")
+    logger.info(f"[file_ref] 已写入存储 {name}")
+    return True
+
+
+def pending_file_names(limit=200):
+    """登记超过 MEDIA_SWEEP_GRACE 秒仍未写入存储、且还没超过重试上限的图片"""
+    since = timezone.now() - timedelta(seconds=MEDIA_SWEEP_GRACE)
+    return list(
+        TelegramFileRef.objects.filter(stored=False, attempts__lt=MEDIA_MAX_ATTEMPTS, created_at__lt=since)
+        .order_by("created_at")
+        .values_list("name", flat=True)[:limit]
+    )
+
+
+# ========================
+# 失效：图片字段换文件 / 记录删除
+# ========================
+
+def connect_file_ref_invalidation(model, field):
+    """
+    存储开启覆盖写（例如 S3 默认 file_overwrite）时新文件可能沿用旧路径，
+    因此字段被赋了新文件（未提交的 FieldFile）时，保存后删除该路径的 file_id。
+    """
+    uid = f"file_ref:{model._meta.label}.{field}"
+
+    def mark_changed(sender, instance, **kwargs):
+        f = getattr(instance, field)
+        instance._file_ref_changed = bool(f) and not getattr(f, "_committed", True)
+
+    def forget_after_save(sender, instance, **kwargs):
+        if getattr(instance, "_file_ref_changed", False):
+            forget_file_id(getattr(instance, field).name)
+
+    def forget_after_delete(sender, instance, **kwargs):
+        f = getattr(instance, field)
+        if f:
+            forget_file_id(f.name)
+
+    pre_save.connect(mark_changed, sender=model, weak=False, dispatch_uid=f"{uid}:pre_save")
+    post_save.connect(forget_after_save, sender=model, weak=False, dispatch_uid=f"{uid}:post_save")
+    post_delete.connect(forget_after_delete, sender=model, weak=False, dispatch_uid=f"{uid}:post_delete")
+
+
+def register_file_ref_invalidation():
+    from django.apps import apps
+
+    for label, field in FILE_REF_FIELDS:
+        connect_file_ref_invalidation(apps.get_model(label), field)
@@ -0,0 +1,217 @@
+# common/images.py
+
+"""
+图片处理：统一原图、生成缩略图、计算内容哈希
+
+- 原图：按 EXIF 方向旋转后丢弃 EXIF（含拍摄位置等隐私信息），长边不超过 ORIGINAL_MAX_SIZE，统一存为 JPEG
+- 缩略图：THUMBNAIL_SIZES 中的固定尺寸；后台列表用 WebP，发到 Telegram 的预览图用 JPEG
+- 内容寻址：按处理后内容的 sha256 命名，内容完全相同的图只存一份
+- dHash 只用于发现疑似重复（记录日志供人工核对），不作为复用依据：
+  9x8 的差值哈希太粗，同一 App 的两张二维码截图很容易撞上
+- 图片字段保存时（后台上传）和后台下载任务（见 file_refs.store_pending_file）都会走这里
+"""
+
+import hashlib
+import io
+import logging
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models.signals import pre_save
+from PIL import Image, ImageOps, features
+
+from common.models import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+ORIGINAL_MAX_SIZE = 2560    # 原图长边上限（像素）
+ORIGINAL_QUALITY = 85
+
+WEBP = "WEBP" if features.check("webp") else "JPEG"
+
+# 名称 → (长边像素, 格式)
+THUMBNAIL_SIZES = {
+    "thumb": (240, WEBP),        # 后台列表
+    "preview": (1280, "JPEG"),   # 第一次发到 Telegram 时上传（Telegram 本身也会压到 1280）
+}
+THUMBNAIL_QUALITY = 80
+
+ASSET_CACHE_KEY = "media_asset:{}"
+ASSET_CACHE_TTL = 24 * 60 * 60
+MISSING = "-"
+
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+
+# Pillow 识别 / 解码失败时可能抛出的异常：遇到这些按原文件保存，不算处理失败
+IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+
+# ========================
+# 纯图片处理
+# ========================
+
+def normalize_image(data: bytes):
+    """返回 (JPEG 字节, RGB Image)；不是有效图片时抛 OSError"""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # 透明背景（二维码截图常见）铺白底
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    image.thumbnail((ORIGINAL_MAX_SIZE, ORIGINAL_MAX_SIZE), Image.LANCZOS)
+    return encode_image(image, "JPEG", ORIGINAL_QUALITY), image
+
+
+def encode_image(image, fmt, quality) -> bytes:
+    # 不传 exif=，输出不带任何元数据
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buf, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buf, fmt, quality=quality, method=4)
+    return buf.getvalue()
+
+
+def make_thumbnail(image, size, fmt) -> bytes:
+    thumb = image.copy()
+    thumb.thumbnail((size, size), Image.LANCZOS)
+    return encode_image(thumb, fmt, THUMBNAIL_QUALITY)
+
+
+def dhash(image) -> int:
+    """64 位差值哈希：缩到 9x8 灰度，比较相邻像素"""
+    pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = value << 1 | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def to_signed(value: int) -> int:
+    """BigIntegerField 是有符号 64 位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+# ========================
+# MediaAsset
+# ========================
+
+def _save_once(name, content):
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def process_image(data: bytes) -> MediaAsset:
+    """处理一张图片，返回（可能是已有的）MediaAsset"""
+    content, image = normalize_image(data)
+    sha = hashlib.sha256(content).hexdigest()
+    phash = to_signed(dhash(image))
+    width, height = image.size
+
+    asset = MediaAsset.objects.filter(sha256=sha).first()
+    if asset is not None:
+        return asset
+
+    similar = MediaAsset.objects.filter(phash=phash, width=width, height=height).order_by("id").first()
+    if similar is not None:
+        logger.info(f"[images] 疑似重复图片 sha256={sha}，与 {similar.name} 感知哈希相同，仍单独保存")
+
+    prefix = f"images/{sha[:2]}/{sha}"
+    thumbnails = {}
+    for label, (size, fmt) in THUMBNAIL_SIZES.items():
+        thumbnails[label] = _save_once(f"{prefix}_{label}.{EXTENSIONS[fmt]}", make_thumbnail(image, size, fmt))
+
+    asset, _ = MediaAsset.objects.get_or_create(
+        sha256=sha,
+        defaults={
+            "name": _save_once(f"{prefix}.jpg", content),
+            "phash": phash,
+            "width": width,
+            "height": height,
+            "size": len(content),
+            "thumbnails": thumbnails,
+        },
+    )
+    return asset
+
+
+def get_asset(name):
+    """存储路径 → MediaAsset（不是处理过的图片返回 None）"""
+    if not name:
+        return None
+
+    key = ASSET_CACHE_KEY.format(name)
+    asset = cache.get(key)
+    if asset is None:
+        asset = MediaAsset.objects.filter(name=name).first() or MISSING
+        cache.set(key, asset, ASSET_CACHE_TTL)
+    return None if asset == MISSING else asset
+
+
+def thumbnail_url(field_file, label="thumb"):
+    """缩略图地址；还没处理过的图片返回原图地址"""
+    asset = get_asset(field_file.name)
+    if asset and label in asset.thumbnails:
+        return default_storage.url(asset.thumbnails[label])
+    return field_file.url
+
+
+def preview_name(name):
+    """发到 Telegram 时实际读取的存储路径：有预览图用预览图，否则用原图"""
+    asset = get_asset(name)
+    if asset and "preview" in asset.thumbnails:
+        return asset.thumbnails["preview"]
+    return name
+
+
+def open_preview(field_file):
+    name = preview_name(field_file.name)
+    if name != field_file.name:
+        return default_storage.open(name, "rb")
+    return field_file.open("rb")
+
+
+# ========================
+# 上传时处理（后台 / 表单）
+# ========================
+
+def connect_image_processing(model, field):
+    """图片字段被赋了新上传的文件时，保存前替换为处理后的 MediaAsset（原文件不再上传）"""
+
+    def process_upload(sender, instance, raw=False, **kwargs):
+        f = getattr(instance, field)
+        if raw or not f or getattr(f, "_committed", True):
+            return
+
+        try:
+            f.file.seek(0)
+            asset = process_image(f.file.read())
+        except IMAGE_ERRORS as e:
+            # 不是可识别的图片：保持原样上传
+            logger.warning(f"[images] {sender._meta.label}.{field} 图片处理失败，按原文件保存: {e}")
+            return
+
+        setattr(instance, field, asset.name)
+
+    pre_save.connect(
+        process_upload, sender=model, weak=False,
+        dispatch_uid=f"images:{model._meta.label}.{field}:pre_save",
+    )
+
+
+def register_image_processing():
+    from django.apps import apps
+
+    from common.file_refs import FILE_REF_FIELDS
+
+    for label, field in FILE_REF_FIELDS:
+        connect_image_processing(apps.get_model(label), field)
@@ -27,3 +27,15 @@ def append_back_button(keyboard=None, text="🔙 返回主菜单", callback_data
     new_keyboard = list(keyboard)
     new_keyboard.append([InlineKeyboardButton(text, callback_data=callback_data)])
     return InlineKeyboardMarkup(new_keyboard)
+
+
+def place_suggestion_keyboard(candidates, prefix: str, action: str, *args) -> InlineKeyboardMarkup:
+    """
+    「你是不是要找」按钮：candidates = [(place, score), ...]（places.services.search_places 的结果）
+    每个场所一行，callback_data = prefix:action:place_id[:args...]
+    """
+    rows = [
+        [single_button(f"🔍 {place.name}", prefix, action, place.id, *args)]
+        for place, _ in candidates
+    ]
+    return InlineKeyboardMarkup(rows)
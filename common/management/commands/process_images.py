@@ -0,0 +1,73 @@
+# common/management/commands/process_images.py
+"""
+把已有图片补做处理：统一原图 / 缩略图 / 感知哈希，重复图片共用一份存储。
+
+## 运行命令
+python manage.py process_images
+python manage.py process_images --model reports.Report --limit 500
+python manage.py process_images --delete-originals   # 处理成功后删除旧文件
+"""
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from common.file_refs import FILE_REF_FIELDS, move_file_ref
+from common.images import get_asset, process_image
+from common.models import TelegramFileRef
+
+
+class Command(BaseCommand):
+    help = "为已有图片生成缩略图、去除 EXIF 并按内容去重"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", help="只处理某个模型，例如 reports.Report")
+        parser.add_argument("--limit", type=int, default=0, help="每个字段最多处理多少条（0 为不限）")
+        parser.add_argument("--delete-originals", action="store_true", help="处理成功后删除旧路径的文件")
+
+    def handle(self, *args, **options):
+        fields = FILE_REF_FIELDS
+        if options["model"]:
+            fields = [(label, field) for label, field in fields if label == options["model"]]
+            if not fields:
+                raise CommandError(f"不支持的模型：{options['model']}，可选 {[label for label, _ in FILE_REF_FIELDS]}")
+
+        for label, field in fields:
+            self.process_field(apps.get_model(label), field, options["limit"], options["delete_originals"])
+
+    def process_field(self, model, field, limit, delete_originals):
+        label = f"{model._meta.label}.{field}"
+        names = (
+            model.objects.exclude(**{f"{field}__isnull": True}).exclude(**{field: ""})
+            .exclude(**{f"{field}__startswith": "images/"})
+            .values_list(field, flat=True).distinct().order_by(field)
+        )
+        if limit:
+            names = names[:limit]
+
+        # 还在等后台下载的图片由下载任务处理
+        pending = set(TelegramFileRef.objects.filter(stored=False).values_list("name", flat=True))
+
+        processed = failed = saved = 0
+        for name in list(names):
+            if name in pending or get_asset(name):
+                continue
+            try:
+                with default_storage.open(name, "rb") as f:
+                    data = f.read()
+                asset = process_image(data)
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"[{label}] {name} 处理失败：{e}"))
+                continue
+
+            # 所有指向旧路径的记录都改到处理后的路径，旧文件不再被引用
+            move_file_ref(name, asset.name)
+            processed += 1
+            saved += max(len(data) - asset.size, 0)
+
+            if delete_originals and asset.name != name:
+                default_storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"[{label}] 已处理 {processed} 张，失败 {failed} 张，原图共减少 {saved // 1024} KB"
+        ))
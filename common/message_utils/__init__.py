@@ -1,2 +1,2 @@
-from .tasks import queue_message
-from .sender import send_telegram_message_sync,delete_telegram_message_sync
\ No newline at end of file
+from .tasks import queue_message, queue_messages
+from .sender import send_telegram_message_sync,delete_telegram_message_sync
@@ -0,0 +1,413 @@
+# common/message_utils/engine.py
+
+"""
+出站消息发送引擎
+
+- 消息先写入 Redis 队列（queue_messages 一次 pipeline 批量入队）；
+  交互类消息（审核结果、中奖通知等）走单独的优先队列，取消息时先取优先队列，不会排在大批量消息后面
+- 单个 drain 任务按批取出，按 机器人全局 / 单个聊天 两级令牌桶限速发送
+- 复用 sender 中的 HTTP 连接池
+- 遇到 429 按 retry_after 暂停后重新发送，网络错误有限次重试
+- 取出的一批消息先移到 in-flight 列表，发送完成后再确认（ack）；发送者中途退出时，
+  下一个拿到发送锁的发送者会把 in-flight 中的消息放回队列头部（至少发送一次）
+"""
+
+import json
+import logging
+import time
+import uuid
+from collections import deque
+
+import redis
+import requests
+from django.conf import settings
+
+from .sender import build_reply_markup, call_telegram_api
+
+logger = logging.getLogger(__name__)
+
+
+QUEUE_KEY = "tg:outbound:queue"                          # 批量消息
+INTERACTIVE_QUEUE_KEY = "tg:outbound:queue:interactive"  # 交互类消息，优先发送
+INFLIGHT_KEY = "tg:outbound:inflight"
+DRAIN_LOCK_KEY = "tg:outbound:drain_lock"
+
+GLOBAL_RATE = 30        # Telegram 全局约 30 msg/s
+PER_CHAT_RATE = 1       # 单个聊天约 1 msg/s
+BATCH_SIZE = 100        # 每次从队列取出的消息数
+MAX_ATTEMPTS = 3        # 网络错误最多尝试次数
+DRAIN_TIME_BUDGET = 200  # 秒，单次 drain 任务的最长运行时间（小于 Celery soft limit）
+DRAIN_LOCK_TIMEOUT = DRAIN_TIME_BUDGET + 60
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+
+
+_redis_client = None
+
+# 取出最多 ARGV[1] 条（先取优先队列 KEYS[1]，不足再取批量队列 KEYS[2]），原子地追加到 in-flight 列表 KEYS[3]
+POP_TO_INFLIGHT = """
+local n = tonumber(ARGV[1])
+local items = redis.call('LRANGE', KEYS[1], 0, n - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+end
+if #items < n then
+    local more = redis.call('LRANGE', KEYS[2], 0, n - #items - 1)
+    if #more > 0 then
+        redis.call('LTRIM', KEYS[2], #more, -1)
+        for _, item in ipairs(more) do
+            table.insert(items, item)
+        end
+    end
+end
+if #items > 0 then
+    redis.call('RPUSH', KEYS[3], unpack(items))
+end
+return items
+"""
+
+# 把 in-flight 列表按优先级放回各自队列头部（保持原顺序）
+RESTORE_INFLIGHT = """
+local items = redis.call('LRANGE', KEYS[3], 0, -1)
+for i = #items, 1, -1 do
+    local ok, message = pcall(cjson.decode, items[i])
+    if ok and message.priority == ARGV[1] then
+        redis.call('LPUSH', KEYS[1], items[i])
+    else
+        redis.call('LPUSH', KEYS[2], items[i])
+    end
+end
+redis.call('DEL', KEYS[3])
+return #items
+"""
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        url = getattr(settings, "TELEGRAM_SEND_QUEUE_URL", None) or settings.CELERY_BROKER_URL
+        _redis_client = redis.Redis.from_url(url)
+    return _redis_client
+
+
+# ========================
+# 令牌桶
+# ========================
+
+class TokenBucket:
+    """简单令牌桶：rate 个/秒，容量 capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self) -> float:
+        """距离可以取到一个令牌还需等待的秒数（0 表示现在就可以）"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds):
+        """429 时整体暂停"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+# ========================
+# 发送引擎
+# ========================
+
+def build_payload(
+    chat_id,
+    text,
+    buttons=None,
+    parse_mode="HTML",
+    disable_web_page_preview=True,
+    pin_message=False,
+    priority=PRIORITY_INTERACTIVE,
+    **extra,
+):
+    """构造一条入队消息；大批量发送传 priority=PRIORITY_BULK，不挤占交互类消息"""
+    message = {
+        "id": uuid.uuid4().hex,
+        "chat_id": chat_id,
+        "text": text,
+        "buttons": buttons,
+        "parse_mode": parse_mode,
+        "disable_web_page_preview": disable_web_page_preview,
+        "pin_message": pin_message,
+        "priority": priority,
+        "attempts": 0,
+    }
+    message.update(extra)
+    return message
+
+
+def _split_by_queue(messages):
+    """按优先级分到各自的队列，保持原顺序"""
+    queues = {}
+    for message in messages:
+        key = INTERACTIVE_QUEUE_KEY if message.get("priority") == PRIORITY_INTERACTIVE else QUEUE_KEY
+        queues.setdefault(key, []).append(message)
+    return queues
+
+
+class SendEngine:
+
+    def __init__(self, global_rate=GLOBAL_RATE, per_chat_rate=PER_CHAT_RATE, batch_size=BATCH_SIZE):
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_buckets = {}
+        self.batch_size = batch_size
+        # 每批发送完成后的回调：callback(results)，results 为 [(message, status, response), ...]
+        self.batch_callbacks = []
+
+    # ---------- 入队 ----------
+
+    def enqueue(self, messages):
+        """批量入队，返回消息 id 列表"""
+        if not messages:
+            return []
+
+        client = get_redis()
+        pipe = client.pipeline(transaction=False)
+        ids = []
+        for start in range(0, len(messages), 1000):
+            chunk = messages[start:start + 1000]
+            for key, items in _split_by_queue(chunk).items():
+                pipe.rpush(key, *[json.dumps(m, ensure_ascii=False) for m in items])
+            ids.extend(m["id"] for m in chunk)
+        pipe.execute()
+        return ids
+
+    def pop_batch(self):
+        """
+        取出一批消息并移到 in-flight 列表；发送完成后必须调用 ack()。
+        同一时间只有持有发送锁的发送者在取消息，in-flight 中最多只有一批。
+        """
+        raw = get_redis().eval(
+            POP_TO_INFLIGHT, 3, INTERACTIVE_QUEUE_KEY, QUEUE_KEY, INFLIGHT_KEY, self.batch_size
+        )
+        return [json.loads(item) for item in raw]
+
+    def ack(self, leftover=None):
+        """确认当前批次：未发送完的消息放回队列头部，清空 in-flight 列表"""
+        pipe = get_redis().pipeline(transaction=True)
+        for key, items in _split_by_queue(leftover or []).items():
+            pipe.lpush(key, *[json.dumps(m, ensure_ascii=False) for m in reversed(items)])
+        pipe.delete(INFLIGHT_KEY)
+        pipe.execute()
+
+    def recover_inflight(self):
+        """
+        把上一个发送者没有确认的消息放回队列（拿到发送锁后调用）。
+        发送锁由持有者续期，能拿到锁说明上一个持有者已经退出，in-flight 中的消息都已无人处理。
+        """
+        restored = get_redis().eval(
+            RESTORE_INFLIGHT, 3, INTERACTIVE_QUEUE_KEY, QUEUE_KEY, INFLIGHT_KEY, PRIORITY_INTERACTIVE
+        )
+        if restored:
+            logger.warning(f"[SendEngine] 恢复 {restored} 条未确认的消息到队列")
+        return restored
+
+    # ---------- 限速 ----------
+
+    def _chat_bucket(self, chat_id):
+        key = str(chat_id)
+        bucket = self.chat_buckets.get(key)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                # 广播会涉及大量一次性聊天，清理已回满的桶
+                for k in [k for k, b in self.chat_buckets.items() if b.wait_time() == 0]:
+                    del self.chat_buckets[k]
+            bucket = self.chat_buckets[key] = TokenBucket(self.per_chat_rate)
+        return bucket
+
+    # ---------- 发送 ----------
+
+    def _send_one(self, message):
+        """
+        发送单条消息，返回 (status, response)
+        status: ok / retry_after / retry / failed / blocked
+        """
+        payload = {
+            "chat_id": message["chat_id"],
+            "text": message["text"],
+            "parse_mode": message.get("parse_mode"),
+            "disable_web_page_preview": message.get("disable_web_page_preview", True),
+        }
+        reply_markup = build_reply_markup(message.get("buttons"))
+        if reply_markup:
+            payload["reply_markup"] = reply_markup
+
+        try:
+            res = call_telegram_api("sendMessage", payload)
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"[SendEngine] 网络错误 chat_id={message['chat_id']}: {e}")
+            return "retry", None
+
+        if res.get("ok"):
+            if message.get("pin_message"):
+                try:
+                    call_telegram_api("pinChatMessage", {
+                        "chat_id": message["chat_id"],
+                        "message_id": res["result"]["message_id"],
+                    }, timeout=5)
+                except requests.RequestException as e:
+                    logger.warning(f"[SendEngine] 置顶失败 chat_id={message['chat_id']}: {e}")
+            return "ok", res
+
+        code = res.get("error_code")
+        if code == 429:
+            return "retry_after", res
+        if code == 403:
+            return "blocked", res
+        logger.warning(f"[SendEngine] 发送失败 chat_id={message['chat_id']}: {res.get('description')}")
+        return "failed", res
+
+    def _notify(self, results):
+        if not results:
+            return
+        for callback in self.batch_callbacks:
+            try:
+                callback(results)
+            except Exception:
+                logger.exception("[SendEngine] 结果回调异常")
+
+    def send_batch(self, messages, deadline=None):
+        """
+        按令牌桶限速发送一批消息，返回 (统计, 未发送完需要放回队列的消息)
+        单个聊天受限时先发其他聊天的消息，不阻塞整批。
+        """
+        stats = {"ok": 0, "failed": 0, "blocked": 0, "retried": 0}
+        results = []
+        pending = deque(messages)
+
+        while pending:
+            if deadline and time.monotonic() > deadline:
+                break
+
+            min_wait = None
+            for _ in range(len(pending)):
+                message = pending.popleft()
+                chat_bucket = self._chat_bucket(message["chat_id"])
+
+                chat_wait = chat_bucket.wait_time()
+                if chat_wait > 0:
+                    pending.append(message)
+                    min_wait = chat_wait if min_wait is None else min(min_wait, chat_wait)
+                    continue
+
+                global_wait = self.global_bucket.wait_time()
+                if global_wait > 0:
+                    time.sleep(global_wait)
+
+                self.global_bucket.consume()
+                chat_bucket.consume()
+                status, response = self._send_one(message)
+
+                if status == "retry_after":
+                    retry_after = (response.get("parameters") or {}).get("retry_after", 1)
+                    logger.warning(f"[SendEngine] 触发 429，暂停 {retry_after}s")
+                    self.global_bucket.block(retry_after)
+                    stats["retried"] += 1
+                    pending.appendleft(message)
+                    continue
+
+                if status == "retry":
+                    message["attempts"] = message.get("attempts", 0) + 1
+                    if message["attempts"] < MAX_ATTEMPTS:
+                        stats["retried"] += 1
+                        pending.append(message)
+                        continue
+                    status = "failed"
+
+                stats[status] += 1
+                results.append((message, status, response))
+
+            if pending and min_wait:
+                time.sleep(min_wait)
+
+        self._notify(results)
+        return stats, list(pending)
+
+    def drain(self, time_budget=DRAIN_TIME_BUDGET):
+        """
+        持续消费队列直到为空或超出时间预算。
+        通过 Redis 锁保证同一时间只有一个 drainer，全局限速才有意义。
+        返回 统计 dict；未获得锁时返回 None。
+        """
+        token = self.acquire_lock()
+        if token is None:
+            return None
+
+        client = get_redis()
+        started = time.monotonic()
+        deadline = started + time_budget
+        totals = {"ok": 0, "failed": 0, "blocked": 0, "retried": 0}
+        try:
+            while time.monotonic() < deadline:
+                batch = self.pop_batch()
+                if not batch:
+                    break
+                stats, leftover = self.send_batch(batch, deadline=deadline)
+                self.ack(leftover)
+                for key, value in stats.items():
+                    totals[key] += value
+                if leftover:
+                    break
+                self.refresh_lock(token)
+        finally:
+            self.release_lock(token)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        totals["elapsed"] = round(elapsed, 3)
+        totals["rate"] = round(totals["ok"] / elapsed, 2)
+        totals["remaining"] = client.llen(INTERACTIVE_QUEUE_KEY) + client.llen(QUEUE_KEY)
+        logger.info(f"[SendEngine] drain 完成: {totals}")
+        return totals
+
+    def acquire_lock(self):
+        """
+        获取发送锁（全局限速只在单个发送者内生效），成功返回 token，否则 None。
+        拿到锁后先恢复上一个发送者遗留的 in-flight 消息。
+        """
+        token = uuid.uuid4().hex
+        if get_redis().set(DRAIN_LOCK_KEY, token, nx=True, ex=DRAIN_LOCK_TIMEOUT):
+            self.recover_inflight()
+            return token
+        return None
+
+    def refresh_lock(self, token):
+        client = get_redis()
+        if client.get(DRAIN_LOCK_KEY) == token.encode():
+            client.expire(DRAIN_LOCK_KEY, DRAIN_LOCK_TIMEOUT)
+
+    def release_lock(self, token):
+        client = get_redis()
+        if client.get(DRAIN_LOCK_KEY) == token.encode():
+            client.delete(DRAIN_LOCK_KEY)
+
+    def is_draining(self) -> bool:
+        return bool(get_redis().exists(DRAIN_LOCK_KEY))
+
+
+send_engine = SendEngine()
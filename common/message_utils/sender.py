@@ -1,8 +1,48 @@
 import requests
 import logging
+import threading
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 logger = logging.getLogger(__name__)
 
+TELEGRAM_API_BASE = "https://api.telegram.org"
+
+# ========================
+# 复用 HTTP 连接池（每个线程一个 Session）
+# ========================
+_local = threading.local()
+
+
+def get_http_session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _local.session = session
+    return session
+
+
+def build_reply_markup(buttons):
+    """按钮兼容处理：dict / 二维列表"""
+    if not buttons:
+        return None
+    if isinstance(buttons, dict):
+        keyboard = [[{"text": k, "callback_data": v} for k, v in buttons.items()]]
+        return {"inline_keyboard": keyboard}
+    if isinstance(buttons, list):
+        return {"inline_keyboard": buttons}
+    return None
+
+
+def call_telegram_api(method: str, payload: dict, timeout=15, token=None) -> dict:
+    """调用 Bot API，返回解析后的 JSON（不吞异常，由调用方处理）"""
+    token = token or settings.TELEGRAM_BOT_TOKEN
+    url = f"{TELEGRAM_API_BASE}/bot{token}/{method}"
+    return get_http_session().post(url, json=payload, timeout=timeout).json()
+
+
 # ========================
 # 同步版本：直接发送，不进 celery
 # ========================
@@ -18,9 +58,6 @@ def send_telegram_message_sync(
     同步发送 Telegram 消息
     兼容按钮格式：dict / 二维列表
     """
-    token = settings.TELEGRAM_BOT_TOKEN
-    api_url = f"https://api.telegram.org/bot{token}/sendMessage"
-
     payload = {
         "chat_id": chat_id,
         "text": text,
@@ -28,22 +65,17 @@ def send_telegram_message_sync(
         "disable_web_page_preview": disable_web_page_preview,
     }
 
-    # 按钮兼容处理
-    if buttons:
-        if isinstance(buttons, dict):
-            keyboard = [[{"text": k, "callback_data": v} for k, v in buttons.items()]]
-            payload["reply_markup"] = {"inline_keyboard": keyboard}
-        elif isinstance(buttons, list):
-            payload["reply_markup"] = {"inline_keyboard": buttons}
+    reply_markup = build_reply_markup(buttons)
+    if reply_markup:
+        payload["reply_markup"] = reply_markup
 
     try:
-        res = requests.post(api_url, json=payload, timeout=15).json()
+        res = call_telegram_api("sendMessage", payload)
 
         # 置顶消息
         if pin_message and res.get("ok"):
             msg_id = res["result"]["message_id"]
-            pin_url = f"https://api.telegram.org/bot{token}/pinChatMessage"
-            requests.post(pin_url, json={
+            call_telegram_api("pinChatMessage", {
                 "chat_id": chat_id,
                 "message_id": msg_id
             }, timeout=5)
@@ -58,9 +90,7 @@ def send_telegram_message_sync(
 def delete_telegram_message_sync(chat_id: int | str, message_id: int):
     """同步删除 Telegram 消息"""
     try:
-        token = settings.TELEGRAM_BOT_TOKEN
-        url = f"https://api.telegram.org/bot{token}/deleteMessage"
-        requests.post(url, json={
+        call_telegram_api("deleteMessage", {
             "chat_id": chat_id,
             "message_id": message_id
         }, timeout=5)
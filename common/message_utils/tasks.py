@@ -1,9 +1,29 @@
 from celery import shared_task
-import requests
-from django.conf import settings
-from .sender import send_telegram_message
+from .engine import send_engine, build_payload, PRIORITY_INTERACTIVE
 
 
+@shared_task
+def drain_outbound_queue():
+    """消费出站消息队列；超出时间预算仍有剩余时再排一次"""
+    stats = send_engine.drain()
+    if stats and stats["remaining"] > 0:
+        drain_outbound_queue.delay()
+    return stats
+
+
+def queue_messages(messages):
+    """
+    批量入队消息，只触发一次 drain 任务
+    messages: list[dict]，每项字段同 queue_message 的参数（至少包含 chat_id、text）；
+    默认进交互优先队列，大批量发送的消息带上 priority=PRIORITY_BULK
+    返回消息 id 列表
+    """
+    payloads = [build_payload(**m) for m in messages]
+    ids = send_engine.enqueue(payloads)
+    if ids and not send_engine.is_draining():
+        drain_outbound_queue.delay()
+    return ids
+
 
 def queue_message(
     chat_id,
@@ -12,14 +32,15 @@ def queue_message(
     disable_web_page_preview=True,
     pin_message=False,
     parse_mode="HTML",
+    priority=PRIORITY_INTERACTIVE,
 ):
-    # 直接调用 Celery delay
-    send_telegram_message.delay(
-        chat_id,
-        text,
-        buttons,
-        parse_mode,
-        disable_web_page_preview,
-        pin_message,
-    )
-    return ""
+    ids = queue_messages([{
+        "chat_id": chat_id,
+        "text": text,
+        "buttons": buttons,
+        "parse_mode": parse_mode,
+        "disable_web_page_preview": disable_web_page_preview,
+        "pin_message": pin_message,
+        "priority": priority,
+    }])
+    return ids[0] if ids else ""
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Broadcast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='消息内容')),
+                ('buttons', models.JSONField(blank=True, null=True, verbose_name='按钮')),
+                ('parse_mode', models.CharField(default='HTML', max_length=20, verbose_name='解析模式')),
+                ('disable_web_page_preview', models.BooleanField(default=False, verbose_name='禁用网页预览')),
+                ('pin_message', models.BooleanField(default=False, verbose_name='置顶消息')),
+                ('recipients', models.BinaryField(verbose_name='接收人')),
+                ('total', models.IntegerField(default=0, verbose_name='接收人数')),
+                ('cursor', models.IntegerField(default=0, verbose_name='发送进度')),
+                ('success_count', models.IntegerField(default=0, verbose_name='成功数')),
+                ('failure_count', models.IntegerField(default=0, verbose_name='失败数')),
+                ('blocked_count', models.IntegerField(default=0, verbose_name='屏蔽数')),
+                ('skipped_count', models.IntegerField(default=0, verbose_name='跳过数')),
+                ('status', models.CharField(choices=[('pending', '等待发送'), ('running', '发送中'), ('done', '已完成'), ('cancelled', '已取消')], default='pending', max_length=20, verbose_name='状态')),
+                ('elapsed_seconds', models.FloatField(default=0, verbose_name='累计发送耗时（秒）')),
+                ('sends_per_second', models.FloatField(default=0, verbose_name='发送速率（条/秒）')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '广播任务',
+                'verbose_name_plural': '广播任务',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
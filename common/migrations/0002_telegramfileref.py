@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-17 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramFileRef',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='存储路径')),
+                ('file_id', models.CharField(max_length=255, verbose_name='Telegram file_id')),
+                ('file_unique_id', models.CharField(blank=True, max_length=64, verbose_name='Telegram file_unique_id')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': 'Telegram 文件缓存',
+                'verbose_name_plural': 'Telegram 文件缓存',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-17 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_telegramfileref'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramfileref',
+            name='stored',
+            field=models.BooleanField(db_index=True, default=True, verbose_name='已写入存储'),
+        ),
+        migrations.AddField(
+            model_name='telegramfileref',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='下载尝试次数'),
+        ),
+        migrations.AddField(
+            model_name='telegramfileref',
+            name='last_error',
+            field=models.TextField(blank=True, verbose_name='最近一次下载错误'),
+        ),
+    ]
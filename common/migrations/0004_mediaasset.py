@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0003_telegramfileref_stored'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='原图存储路径')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='内容哈希')),
+                ('phash', models.BigIntegerField(verbose_name='感知哈希（dHash）')),
+                ('width', models.PositiveIntegerField(verbose_name='宽')),
+                ('height', models.PositiveIntegerField(verbose_name='高')),
+                ('size', models.PositiveIntegerField(verbose_name='原图字节数')),
+                ('thumbnails', models.JSONField(blank=True, default=dict, verbose_name='缩略图存储路径')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'verbose_name': '图片资源',
+                'verbose_name_plural': '图片资源',
+                'indexes': [models.Index(fields=['phash', 'width', 'height'], name='media_asset_phash_idx')],
+            },
+        ),
+    ]
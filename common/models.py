@@ -1,3 +1,109 @@
+from array import array
+
 from django.db import models
 
-# Create your models here.
+
+class Broadcast(models.Model):
+    """广播任务：记录接收人、发送进度和吞吐，崩溃后从 cursor 继续"""
+
+    STATUS_CHOICES = [
+        ("pending", "等待发送"),
+        ("running", "发送中"),
+        ("done", "已完成"),
+        ("cancelled", "已取消"),
+    ]
+
+    text = models.TextField(verbose_name="消息内容")
+    buttons = models.JSONField(null=True, blank=True, verbose_name="按钮")
+    parse_mode = models.CharField(max_length=20, default="HTML", verbose_name="解析模式")
+    disable_web_page_preview = models.BooleanField(default=False, verbose_name="禁用网页预览")
+    pin_message = models.BooleanField(default=False, verbose_name="置顶消息")
+
+    # 接收人 Telegram id，按 int64 紧凑存储
+    recipients = models.BinaryField(verbose_name="接收人")
+    total = models.IntegerField(default=0, verbose_name="接收人数")
+    cursor = models.IntegerField(default=0, verbose_name="发送进度")
+
+    success_count = models.IntegerField(default=0, verbose_name="成功数")
+    failure_count = models.IntegerField(default=0, verbose_name="失败数")
+    blocked_count = models.IntegerField(default=0, verbose_name="屏蔽数")
+    skipped_count = models.IntegerField(default=0, verbose_name="跳过数")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending", verbose_name="状态")
+    elapsed_seconds = models.FloatField(default=0, verbose_name="累计发送耗时（秒）")
+    sends_per_second = models.FloatField(default=0, verbose_name="发送速率（条/秒）")
+
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "广播任务"
+        verbose_name_plural = "广播任务"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Broadcast #{self.id} ({self.cursor}/{self.total})"
+
+    def set_recipients(self, user_ids):
+        packed = array("q", (int(uid) for uid in user_ids))
+        self.recipients = packed.tobytes()
+        self.total = len(packed)
+
+    def get_recipients(self, start=0, end=None):
+        packed = array("q")
+        packed.frombytes(bytes(self.recipients or b""))
+        return packed[start:end].tolist()
+
+
+class TelegramFileRef(models.Model):
+    """
+    已存储图片 → Telegram file_id 的映射。
+    第一次上传（或从用户消息接收）时记下 file_id，之后发送同一张图直接用 file_id，不再传输文件。
+    以存储路径为键：图片字段换了新文件，路径随之改变，旧记录自然失效。
+
+    用户发来的图片先只记 file_id（stored=False），由后台任务下载并写入存储后置为 True。
+    """
+
+    name = models.CharField(max_length=255, unique=True, verbose_name="存储路径")
+    file_id = models.CharField(max_length=255, verbose_name="Telegram file_id")
+    file_unique_id = models.CharField(max_length=64, blank=True, verbose_name="Telegram file_unique_id")
+    stored = models.BooleanField(default=True, db_index=True, verbose_name="已写入存储")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="下载尝试次数")
+    last_error = models.TextField(blank=True, verbose_name="最近一次下载错误")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "Telegram 文件缓存"
+        verbose_name_plural = "Telegram 文件缓存"
+
+    def __str__(self):
+        return self.name
+
+
+class MediaAsset(models.Model):
+    """
+    处理后的图片（内容寻址）：统一编码的原图 + 固定尺寸缩略图 + 感知哈希。
+    图片字段直接指向 name；内容相同（sha256）的图片共用同一个 MediaAsset，感知哈希只用于发现疑似重复。
+    """
+
+    name = models.CharField(max_length=255, unique=True, verbose_name="原图存储路径")
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="内容哈希")
+    phash = models.BigIntegerField(verbose_name="感知哈希（dHash）")
+    width = models.PositiveIntegerField(verbose_name="宽")
+    height = models.PositiveIntegerField(verbose_name="高")
+    size = models.PositiveIntegerField(verbose_name="原图字节数")
+    thumbnails = models.JSONField(default=dict, blank=True, verbose_name="缩略图存储路径")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    class Meta:
+        verbose_name = "图片资源"
+        verbose_name_plural = "图片资源"
+        indexes = [
+            models.Index(fields=["phash", "width", "height"], name="media_asset_phash_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
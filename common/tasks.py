@@ -0,0 +1,45 @@
+from celery import shared_task
+
+from common.broadcast import run_broadcast_job, resume_unfinished_broadcasts, BROADCAST_LOCK_RETRY
+from common.file_refs import (
+    MEDIA_MAX_ATTEMPTS,
+    MEDIA_RETRY_DELAY,
+    enqueue_store_file,
+    pending_file_names,
+    store_pending_file,
+)
+
+
+@shared_task
+def run_broadcast(broadcast_id):
+    """执行广播任务；发送锁被占用或超出时间预算时自动续跑"""
+    result = run_broadcast_job(broadcast_id)
+    if result == "retry":
+        run_broadcast.apply_async((broadcast_id,), countdown=BROADCAST_LOCK_RETRY)
+    elif result == "continue":
+        run_broadcast.delay(broadcast_id)
+    return result
+
+
+@shared_task
+def resume_broadcasts():
+    """兜底：重新提交 pending/running 的广播，worker 崩溃后从 cursor 继续"""
+    return resume_unfinished_broadcasts()
+
+
+@shared_task(bind=True, max_retries=MEDIA_MAX_ATTEMPTS)
+def store_telegram_file(self, name):
+    """把用户发来的图片从 Telegram 下载写入存储；失败按次数指数退避重试"""
+    try:
+        return store_pending_file(name)
+    except Exception as e:
+        raise self.retry(exc=e, countdown=MEDIA_RETRY_DELAY * 2 ** self.request.retries)
+
+
+@shared_task
+def store_pending_files():
+    """兜底：入队失败或 worker 重启丢失的下载任务重新提交"""
+    names = pending_file_names()
+    for name in names:
+        enqueue_store_file(name)
+    return len(names)
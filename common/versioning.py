@@ -0,0 +1,69 @@
+# common/versioning.py
+
+"""
+跨进程版本号 + 进程内索引
+
+- 版本号放在共享缓存（settings.CACHES，Redis）里：任意进程（bot / 后台 / celery / 管理命令）
+  修改数据后 bump_version，其他进程最多 check_interval 秒后发现版本变化并重建
+- 每个索引最长 max_age 秒强制重建一次：版本号丢失（缓存被清空、缓存没有跨进程共享）时也能收敛
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+
+VERSION_CHECK_INTERVAL = 1.0    # 秒，两次读版本号之间直接使用本地副本
+INDEX_MAX_AGE = 60.0            # 秒，本地副本最长使用时间
+
+
+def current_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    cache.set(key, time.time_ns(), None)
+
+
+class ProcessLocalIndex:
+    """
+    进程内只读索引：build(version) 构建，版本号变化或超过 max_age 时重建。
+    """
+
+    def __init__(self, version_key, build, check_interval=VERSION_CHECK_INTERVAL, max_age=INDEX_MAX_AGE):
+        self.version_key = version_key
+        self.build = build
+        self.check_interval = check_interval
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+
+    def get(self):
+        value = self._value
+        now = time.monotonic()
+        if value is not None and now - self._checked_at < self.check_interval:
+            return value
+
+        version = current_version(self.version_key)
+        with self._lock:
+            if self._value is None or self._version != version or now - self._built_at > self.max_age:
+                self._value = self.build(version)
+                self._version = version
+                self._built_at = now
+            self._checked_at = now
+            return self._value
+
+    def invalidate(self):
+        """数据变更后调用：更新共享版本号并丢弃本进程的副本"""
+        bump_version(self.version_key)
+        with self._lock:
+            self._value = None
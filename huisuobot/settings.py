@@ -177,17 +177,28 @@ if env_config["DATABASE"]["ENGINE"] == 'django.db.backends.mysql':
 
 
 STORAGE_MODE = env_config["STORAGE_MODE"]
+# 共享缓存：bot / 后台 / celery / 管理命令之间的索引版本号、配置、查询快照都依赖它，
+# 不能用默认的进程内 LocMemCache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": env_config.get("CACHE_URL", "redis://127.0.0.1:6379/2"),
+        "KEY_PREFIX": "huisuobot",
+    }
+}
+
+# 远程模式（oss / cos / s3）由 get_default_storage 包一层本地磁盘缓存（CachedStorage）
 DEFAULT_FILE_STORAGE = "bot_core.storage_backends.get_default_storage"
+MEDIA_CACHE_DIR = BASE_DIR / "media_cache"
+MEDIA_CACHE_MAX_BYTES = env_config.get("MEDIA_CACHE_MAX_BYTES", 512 * 1024 * 1024)
 
 if STORAGE_MODE == "cos":
-    DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
     AWS_ACCESS_KEY_ID = env_config["COS"]["SECRET_ID"]
     AWS_SECRET_ACCESS_KEY = env_config["COS"]["SECRET_KEY"]
     AWS_STORAGE_BUCKET_NAME = env_config["COS"]["BUCKET"]
     AWS_S3_ENDPOINT_URL = env_config["COS"]["ENDPOINT"]
 
 elif STORAGE_MODE == "s3":
-    DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
     AWS_ACCESS_KEY_ID = env_config["AWS"]["ACCESS_KEY_ID"]
     AWS_SECRET_ACCESS_KEY = env_config["AWS"]["SECRET_ACCESS_KEY"]
     AWS_STORAGE_BUCKET_NAME = env_config["AWS"]["BUCKET"]
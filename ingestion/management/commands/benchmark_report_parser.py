@@ -0,0 +1,104 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ingestion.services.report_parser import extract_fields_v2, extract_fields_v3
+
+
+class Command(BaseCommand):
+    help = "对比 extract_fields_v2 与编译版 extract_fields_v3 的解析速度和结果差异"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            help="语料文件：JSON 数组（每项一条原始帖子文本）或 JSONL（每行一个字符串 / {\"text\": ...}）",
+        )
+        parser.add_argument(
+            "--channel",
+            type=int,
+            help="从该 IngestionSource（id）抓取最近的帖子作为语料（需要可用的 Telethon 账号）",
+        )
+        parser.add_argument("--limit", type=int, default=500, help="从频道抓取的帖子数")
+        parser.add_argument("--repeat", type=int, default=5, help="每个解析器重复跑几遍语料")
+        parser.add_argument("--show-diff", type=int, default=3, help="打印前 N 条结果不一致的样本")
+
+    def handle(self, *args, **options):
+        if options["file"]:
+            texts = self.load_file(options["file"])
+        elif options["channel"]:
+            texts = self.load_channel(options["channel"], options["limit"])
+        else:
+            raise CommandError("请指定 --file 或 --channel")
+
+        texts = [t for t in texts if t]
+        if not texts:
+            raise CommandError("语料为空")
+
+        self.stdout.write(f"语料：{len(texts)} 条，平均 {sum(map(len, texts)) // len(texts)} 字符，重复 {options['repeat']} 遍")
+
+        timings = {}
+        for name, func in (("v2", extract_fields_v2), ("v3", extract_fields_v3)):
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                for text in texts:
+                    func(text)
+            elapsed = time.perf_counter() - started
+            timings[name] = elapsed
+            total = len(texts) * options["repeat"]
+            self.stdout.write(
+                f"{name}: {elapsed:.3f}s，{total / elapsed:.0f} 条/秒，{elapsed / total * 1e6:.1f} µs/条"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"加速比：{timings['v2'] / timings['v3']:.2f}x"))
+
+        diffs = []
+        for text in texts:
+            old, new = extract_fields_v2(text), extract_fields_v3(text)
+            changed = [k for k in old if old[k] != new[k]]
+            if changed:
+                diffs.append((text, changed, old, new))
+
+        self.stdout.write(f"结果不一致：{len(diffs)}/{len(texts)} 条")
+        for text, changed, old, new in diffs[:options["show_diff"]]:
+            self.stdout.write("-" * 40)
+            self.stdout.write(text[:300])
+            for key in changed:
+                self.stdout.write(f"  {key}: v2={old[key]!r}")
+                self.stdout.write(f"  {key}: v3={new[key]!r}")
+
+    def load_file(self, path):
+        with open(path, encoding="utf-8") as f:
+            raw = f.read()
+
+        try:
+            data = json.loads(raw)
+            if isinstance(data, list):
+                return [self.item_text(item) for item in data]
+        except json.JSONDecodeError:
+            pass
+
+        return [self.item_text(json.loads(line)) for line in raw.splitlines() if line.strip()]
+
+    @staticmethod
+    def item_text(item):
+        if isinstance(item, dict):
+            return item.get("text") or item.get("message") or ""
+        return item or ""
+
+    def load_channel(self, source_id, limit):
+        import asyncio
+
+        from ingestion.models import IngestionSource
+        from ingestion.services.telegram_fetcher import fetch_channel_messages
+
+        try:
+            source = IngestionSource.objects.get(pk=source_id)
+        except IngestionSource.DoesNotExist:
+            raise CommandError(f"IngestionSource {source_id} 不存在")
+
+        # 只读抓取：从最新往前取，不修改来源的抓取进度
+        source.fetch_mode = "backward"
+        source.last_message_id = 0
+        messages = asyncio.run(fetch_channel_messages(source=source, limit=limit)) or []
+        return [msg.message or "" for msg in messages]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 11:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_report_source'),
+        ('ingestion', '0002_alter_ingestionsource_fetch_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('simhash', models.BigIntegerField(help_text='64 位 SimHash（有符号存储）')),
+                ('band_0', models.IntegerField(db_index=True)),
+                ('band_1', models.IntegerField(db_index=True)),
+                ('band_2', models.IntegerField(db_index=True)),
+                ('band_3', models.IntegerField(db_index=True)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('report', models.OneToOneField(help_text='对应的报告', on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint', to='reports.report')),
+            ],
+            options={
+                'verbose_name': '报告指纹',
+                'verbose_name_plural': '报告指纹',
+            },
+        ),
+    ]
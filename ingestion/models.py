@@ -67,3 +67,31 @@ class IngestionSource(models.Model):
 
     def __str__(self):
         return f"[{self.platform}] {self.channel_name or self.channel_username or self.channel_id}"
+
+
+class ReportFingerprint(models.Model):
+    """
+    抓取报告的 SimHash 指纹（近似去重用的 LSH 索引）。
+    64 位指纹拆成 4 段 16 位，汉明距离 ≤3 的两个指纹至少有一段完全相同，
+    按段建索引即可快速找到候选。
+    """
+
+    report = models.OneToOneField(
+        "reports.Report",
+        on_delete=models.CASCADE,
+        related_name="fingerprint",
+        help_text="对应的报告",
+    )
+    simhash = models.BigIntegerField(help_text="64 位 SimHash（有符号存储）")
+    band_0 = models.IntegerField(db_index=True)
+    band_1 = models.IntegerField(db_index=True)
+    band_2 = models.IntegerField(db_index=True)
+    band_3 = models.IntegerField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "报告指纹"
+        verbose_name_plural = "报告指纹"
+
+    def __str__(self):
+        return f"Report #{self.report_id} simhash={self.simhash}"
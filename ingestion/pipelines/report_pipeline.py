@@ -1,68 +1,301 @@
 # ingestion/pipeline.py
 
 import asyncio
+import html
+import logging
+import time
 from django.utils import timezone
 from django.conf import settings
+from django.db import transaction
+from telethon.errors import FloodWaitError
 from tgusers.models import TelegramUser
 from reports.models import Report
-from ingestion.services import fetch_channel_messages, parse_report
+from reports.utils import send_broadcast_to_admins
+from ingestion.services.report_parser import parse_reports_batch
+from ingestion.services.dedup import find_duplicates, save_fingerprints, prune_fingerprints
+from ingestion.services.telegram_fetcher import iter_channel_message_pages
 from ingestion.models import IngestionSource
+from telethon_account.telethon_manager import (
+    TelethonAccountManager, TelethonClientPool, get_client_pool
+)
 from asgiref.sync import sync_to_async
 
+logger = logging.getLogger(__name__)
+
+SOURCE_MAX_ATTEMPTS = 2  # 账号被限流时换号重试的次数
+
+_default_reporter_id = None
+
+
+async def ingest_source(source, pool: TelethonClientPool, semaphore: asyncio.Semaphore):
+    """
+    流式抓取并保存单个来源，返回 (抓取到的消息数, 新增报告数)。
+    每抓到一页就解析并批量落库，同时推进 last_message_id，
+    中途失败（或换号重试）时从最近的检查点继续，不会重抓已保存的页。
+    上一页的解析落库与下一页的网络抓取同时进行。
+    """
+    name = source.channel_name or source.channel_username
+    total = 0
+    created = 0
+
+    async with semaphore:
+        for attempt in range(SOURCE_MAX_ATTEMPTS):
+            entry = await pool.lease()
+            if entry is None:
+                logger.warning(f"⚠️ 没有可用账号，跳过来源：{name}")
+                return total, created
+
+            account = entry.account
+            pending = None
+            try:
+                print(f"📡 开始抓取频道：{name}（账号 {account.phone_number}）")
+                async for page in iter_channel_message_pages(
+                    client=entry.client, account=account, source=source
+                ):
+                    total += len(page)
+                    # 检查点必须按页顺序推进：先等上一页落库，再把这一页交给后台
+                    if pending is not None:
+                        task, pending = pending, None
+                        created += await task
+                    pending = asyncio.ensure_future(persist_page(source, page))
+
+                if pending is not None:
+                    task, pending = pending, None
+                    created += await task
+            except FloodWaitError as e:
+                # 已抓到的页先落库，换号后从新的检查点继续
+                created += await finish_pending(pending)
+                logger.warning(f"⏰ 账号 {account.phone_number} 被限制 {e.seconds} 秒，换号重试：{name}")
+                await TelethonAccountManager.update_account_status(
+                    account.id,
+                    status='limited',
+                    error_message=f"FloodWait: {e.seconds} seconds",
+                    limited_seconds=e.seconds
+                )
+                await pool.retire(entry)
+                continue
+            except Exception as e:
+                logger.error(f"❌ 抓取 {name} 失败: {e}", exc_info=True)
+                created += await finish_pending(pending)
+                await pool.release(entry)
+                return total, created
+
+            await pool.release(entry)
+            break
+
+    if not total:
+        print(f"⚠️ 无新消息：{name}")
+    else:
+        print(f"✅ 完成：{name}（{total} 条，新增报告 {created}，检查点 message_id={source.last_message_id}）")
+    return total, created
+
+
+async def finish_pending(pending):
+    """出错退出时等待还在进行的落库任务，返回新增报告数（落库失败记为 0）"""
+    if pending is None:
+        return 0
+    try:
+        return await pending
+    except Exception as e:
+        logger.error(f"❌ 报告落库失败: {e}", exc_info=True)
+        return 0
+
+
+async def persist_page(source, page):
+    """解析一页消息并落库，随后丢弃 Message 对象，返回新增报告数"""
+    # 解析在进程池里跑，不阻塞事件循环
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(
+        None, parse_reports_batch, [msg.message or "" for msg in page]
+    )
+
+    parsed_list = []
+    for msg, parsed in zip(page, results):
+        if parsed:
+            parsed["published_at"] = msg.date
+            parsed["message_id"] = msg.id
+            parsed_list.append(parsed)
+
+    # forward 页内升序，检查点取最大 id；backward 补档往旧方向推进，取最小 id
+    if source.fetch_mode == "forward":
+        checkpoint = max(msg.id for msg in page)
+    else:
+        checkpoint = min(msg.id for msg in page)
+
+    return await sync_to_async(save_reports_page)(source, parsed_list, checkpoint)
+
+
 async def run_ingestion_pipeline():
+    """
+    并发抓取所有启用的来源：
+    并发数 = 可用账号数，每个账号一个常驻 client 依次处理多个来源。
+    必须在 Telethon 常驻事件循环中运行（run_in_client_loop），client 在多次运行之间保持连接。
+    全部来源处理完后给管理员发一条汇总通知，返回本次运行的统计。
+    """
+    started = time.monotonic()
+
     sources = await sync_to_async(list)(
         IngestionSource.objects.filter(is_active=True)
     )
 
-    for source in sources:
-        print(f"📡 开始抓取频道：{source.channel_name or source.channel_username}")
+    summary = {
+        "sources": len(sources), "accounts": 0, "messages": 0, "reports": 0,
+        "seconds": 0.0, "messages_per_second": 0.0,
+    }
+
+    pool = get_client_pool()
+    try:
+        summary["accounts"] = await pool.refresh(force=True)
+        if not summary["accounts"]:
+            logger.warning("⚠️ 没有可用的 Telethon 账号，本次 ingestion 跳过")
+            return summary
 
-        messages = await fetch_channel_messages(source=source)
+        semaphore = asyncio.Semaphore(summary["accounts"])
+        counts = await asyncio.gather(
+            *(ingest_source(source, pool, semaphore) for source in sources),
+            return_exceptions=True,
+        )
+    finally:
+        # client 保持连接留给下一次运行，只写回使用计数
+        await pool.flush_usage()
 
-        if not messages:
-            print("⚠️ 无新消息")
+    digest = []
+    for source, result in zip(sources, counts):
+        if isinstance(result, Exception):
+            logger.error(f"❌ 来源 {source} 处理异常: {result}")
             continue
+        fetched, created = result
+        summary["messages"] += fetched
+        summary["reports"] += created
+        if created:
+            digest.append((source.channel_name or source.channel_username, created))
 
-        max_message_id = source.last_message_id or 0
+    if digest:
+        await sync_to_async(notify_admins_new_reports)(digest)
 
-        for msg in messages:
-            if msg.id > max_message_id:
-                max_message_id = msg.id
+    try:
+        await sync_to_async(prune_fingerprints)()
+    except Exception as e:
+        logger.error(f"❌ 清理报告指纹失败: {e}", exc_info=True)
 
-            parsed = parse_report(msg)
-            if not parsed:
-                continue
+    elapsed = time.monotonic() - started
+    summary["seconds"] = round(elapsed, 2)
+    summary["messages_per_second"] = round(summary["messages"] / elapsed, 2) if elapsed else 0.0
 
-            await sync_to_async(save_report_from_parsed)(parsed)
+    logger.info(f"📊 ingestion 完成: {summary}")
+    print(f"📊 ingestion 完成: {summary}")
+    return summary
 
-        source.last_message_id = max_message_id
-        source.last_fetched_at = timezone.now()
-        await sync_to_async(source.save)()
 
-        print(f"✅ 完成：{source.channel_name}（最新 message_id={max_message_id}）")
+def get_default_reporter_id():
+    """
+    抓取报告统一挂在系统默认用户名下。
+    Report.reporter 以 user_id 关联，只需校验一次用户存在，之后直接用 user_id。
+    """
+    global _default_reporter_id
+    if _default_reporter_id is None:
+        default_user_id = getattr(settings, "REPORT_DEFAULT_USER_ID", None)
+        if not default_user_id:
+            raise ValueError("请在 settings 中配置 REPORT_DEFAULT_USER_ID")
+        if not TelegramUser.objects.filter(user_id=default_user_id).exists():
+            raise TelegramUser.DoesNotExist(f"默认报告用户不存在: {default_user_id}")
+        _default_reporter_id = default_user_id
+    return _default_reporter_id
 
 
-def save_report_from_parsed(parsed):
+def save_reports_page(source, parsed_list, checkpoint):
     """
+    一页解析结果一次 bulk_create，并在同一事务内推进来源的 last_message_id，返回新增报告数。
+    以 (source, source_message_id) 去重：重跑同一段消息不会重复入库；
+    再按 SimHash 指纹跳过与近期报告近似的内容（跨频道转发、重发）。
+    bulk_create 不触发 post_save，管理员通知由流水线汇总后统一发送。
     parsed = {
         "content": "...",
-        "image_path": "...",   # 可选
+        "place_name": "...",     # 可选
+        "published_at": datetime,
+        "message_id": 123,
     }
     """
+    now = timezone.now()
+    new_reports = []
 
-    # 1. 使用系统默认用户作为 reporter
-    default_user_id = getattr(settings, "REPORT_DEFAULT_USER_ID", None)
-    if not default_user_id:
-        raise ValueError("请在 settings 中配置 REPORT_DEFAULT_USER_ID")
+    with transaction.atomic():
+        if parsed_list:
+            reporter_id = get_default_reporter_id()
 
-    reporter = TelegramUser.objects.get(user_id=default_user_id)
+            existing = set(Report.objects.filter(
+                source=source,
+                source_message_id__in=[parsed["message_id"] for parsed in parsed_list],
+            ).values_list("source_message_id", flat=True))
+            parsed_list = [p for p in parsed_list if p["message_id"] not in existing]
 
-    # 2. 创建 Report（只保存 content）
-    report = Report.objects.create(
-        reporter=reporter,
-        content=parsed["content"],
-        place_name=parsed.get("place_name"),
-        published_at=parsed.get("published_at"),
-    )
+            # 近似去重：其他频道转发 / 重发的同一份报告不再入库
+            duplicates = find_duplicates(p.get("fingerprint") for p in parsed_list)
+            skipped = [(p, dup) for p, dup in zip(parsed_list, duplicates) if dup is not None]
+            parsed_list = [p for p, dup in zip(parsed_list, duplicates) if dup is None]
+            for parsed, dup in skipped:
+                logger.info(
+                    f"♻️ 跳过重复报告：{source} message_id={parsed['message_id']}"
+                    f"（与 {'Report #' + str(dup) if dup else '同批报告'} 近似）"
+                )
+
+            new_reports = [
+                Report(
+                    reporter_id=reporter_id,
+                    source=source,
+                    source_message_id=parsed["message_id"],
+                    content=parsed["content"],
+                    place_name=parsed.get("place_name"),
+                    published_at=parsed.get("published_at"),
+                    created_at=now,
+                )
+                for parsed in parsed_list
+            ]
+            # 并发重跑时的竞争由唯一约束兜底
+            Report.objects.bulk_create(new_reports, ignore_conflicts=True)
+
+            # ignore_conflicts 不回填主键，按 message_id 查回来写指纹索引
+            if new_reports:
+                ids = dict(Report.objects.filter(
+                    source=source,
+                    source_message_id__in=[parsed["message_id"] for parsed in parsed_list],
+                ).values_list("source_message_id", "id"))
+                save_fingerprints(
+                    (ids[parsed["message_id"]], parsed.get("fingerprint"))
+                    for parsed in parsed_list
+                    if parsed["message_id"] in ids
+                )
+
+        IngestionSource.objects.filter(pk=source.pk).update(
+            last_message_id=checkpoint, last_fetched_at=now
+        )
+
+    source.last_message_id = checkpoint
+    source.last_fetched_at = now
 
-    print(f"📝 已保存 Report #{report.id}")
+    if new_reports:
+        print(f"📝 已保存 {len(new_reports)} 条 Report")
+    return len(new_reports)
+
+
+def notify_admins_new_reports(digest):
+    """
+    一次 ingestion 只发一条汇总通知。
+    digest = [(来源名, 新增报告数), ...]
+    """
+    total = sum(count for _, count in digest)
+    lines = "\n".join(f"• {html.escape(name or '')}：{count} 个" for name, count in digest)
+    try:
+        send_broadcast_to_admins(
+            text="❤️❤️❤️❤️❤️❤️❤️❤️\n"
+                 f"本次抓取到 {total} 个新报告\n"
+                 f"{lines}\n"
+                 "请尽快去报告中心审批\n"
+                 "审核通过后报告会自动发布到群里和报告中心\n",
+            buttons=[{"📝 审核报告": "review_reports"}],
+            disable_web_page_preview=True,
+            parse_mode='HTML'
+        )
+        logger.info(f"新报告汇总通知已提交（{total} 个）")
+    except Exception as e:
+        logger.error(f"新报告汇总通知发送失败：{e}", exc_info=True)
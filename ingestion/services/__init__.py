@@ -1,2 +1,2 @@
-from .report_parser import parse_report
-from .telegram_fetcher import fetch_channel_messages
\ No newline at end of file
+from .report_parser import parse_report, parse_reports_batch
+from .telegram_fetcher import fetch_channel_messages, iter_channel_message_pages
\ No newline at end of file
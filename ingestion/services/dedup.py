@@ -0,0 +1,176 @@
+"""
+抓取报告近似去重（SimHash + LSH 分段索引）
+
+- 指纹基于解析出的字段值（不含模板文字），在解析子进程里计算
+- 64 位指纹拆成 4 段，任一段相同即为候选，再比较汉明距离
+- 指纹持久化在 ReportFingerprint 中，只比对最近 DEDUP_WINDOW_DAYS 天的报告
+"""
+
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+DEDUP_MAX_DISTANCE = 3     # 汉明距离 ≤3 视为重复（4 段分桶保证不漏召回）
+DEDUP_WINDOW_DAYS = 90     # 只和最近 90 天的报告比对，更早的指纹定期清理
+DEDUP_MIN_LENGTH = 20      # 归一化后太短的文本不做去重，避免误判
+SHINGLE_SIZE = 3           # 中文按字切 3-gram
+
+BAND_BITS = 16
+BAND_COUNT = 64 // BAND_BITS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+NOISE_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+# ============================
+# 指纹计算（纯函数，可在子进程中运行）
+# ============================
+
+def normalize_text(text: str) -> str:
+    """全角转半角、统一大小写、去掉空白和标点"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return NOISE_PATTERN.sub("", text)
+
+
+def _shingle_hash(shingle: str) -> int:
+    # 不能用内置 hash()：每个进程的随机种子不同，指纹需要跨进程稳定
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> Optional[int]:
+    """返回 64 位无符号 SimHash；文本太短返回 None"""
+    text = normalize_text(text)
+    if len(text) < DEDUP_MIN_LENGTH:
+        return None
+
+    weights = [0] * 64
+    shingles = Counter(text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+    for shingle, count in shingles.items():
+        h = _shingle_hash(shingle)
+        for bit in range(64):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    value = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            value |= 1 << bit
+    return value
+
+
+def fingerprint_fields(fields: Dict[str, str]) -> Optional[int]:
+    """字段值拼接后计算指纹（模板文字对所有报告都一样，不能参与计算）"""
+    return simhash("".join(v for v in fields.values() if v))
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def split_bands(value: int) -> List[int]:
+    return [(value >> (i * BAND_BITS)) & BAND_MASK for i in range(BAND_COUNT)]
+
+
+def to_signed(value: int) -> int:
+    """BigIntegerField 是有符号 64 位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+# ============================
+# 持久化索引
+# ============================
+
+def find_duplicates(fingerprints: Iterable[Optional[int]]) -> List[Optional[int]]:
+    """
+    对一批指纹查重，返回与输入一一对应的「重复的报告 id」（不重复为 None）。
+    同一批内部互相重复时，后出现的指向前一个（id 为 0，表示与本批前面的报告重复）。
+    """
+    from ingestion.models import ReportFingerprint
+
+    fingerprints = list(fingerprints)
+    valid = [fp for fp in fingerprints if fp is not None]
+    if not valid:
+        return [None] * len(fingerprints)
+
+    # 一次查询取出所有候选：每一段做一个 IN 条件
+    bands = [set() for _ in range(BAND_COUNT)]
+    for fp in valid:
+        for i, band in enumerate(split_bands(fp)):
+            bands[i].add(band)
+
+    condition = Q()
+    for i, values in enumerate(bands):
+        condition |= Q(**{f"band_{i}__in": values})
+
+    since = timezone.now() - timedelta(days=DEDUP_WINDOW_DAYS)
+    candidates = [
+        (report_id, to_unsigned(value))
+        for report_id, value in ReportFingerprint.objects.filter(condition, created_at__gte=since)
+        .values_list("report_id", "simhash")
+    ]
+
+    results = []
+    accepted = []
+    for fp in fingerprints:
+        if fp is None:
+            results.append(None)
+            continue
+
+        duplicate_of = None
+        for report_id, value in candidates:
+            if hamming_distance(fp, value) <= DEDUP_MAX_DISTANCE:
+                duplicate_of = report_id
+                break
+
+        if duplicate_of is None and any(hamming_distance(fp, other) <= DEDUP_MAX_DISTANCE for other in accepted):
+            duplicate_of = 0
+
+        if duplicate_of is None:
+            accepted.append(fp)
+        results.append(duplicate_of)
+
+    return results
+
+
+def save_fingerprints(pairs: Iterable[Tuple[int, Optional[int]]]):
+    """pairs = [(report_id, fingerprint), ...]"""
+    from ingestion.models import ReportFingerprint
+
+    now = timezone.now()
+    objs = []
+    for report_id, fp in pairs:
+        if fp is None:
+            continue
+        b0, b1, b2, b3 = split_bands(fp)
+        objs.append(ReportFingerprint(
+            report_id=report_id, simhash=to_signed(fp),
+            band_0=b0, band_1=b1, band_2=b2, band_3=b3, created_at=now,
+        ))
+    ReportFingerprint.objects.bulk_create(objs, ignore_conflicts=True)
+
+
+def prune_fingerprints():
+    """清理比对窗口之外的指纹"""
+    from ingestion.models import ReportFingerprint
+
+    since = timezone.now() - timedelta(days=DEDUP_WINDOW_DAYS)
+    deleted, _ = ReportFingerprint.objects.filter(created_at__lt=since).delete()
+    if deleted:
+        logger.info(f"🧹 清理过期报告指纹 {deleted} 条")
+    return deleted
@@ -1,9 +1,19 @@
 
+import logging
+import os
 import re
+import threading
 from typing import Dict, Optional,List
+
+import django
+from billiard.pool import Pool
+from celery.signals import worker_process_shutdown
 from telethon.tl.custom import Message  # 视你的导入路径而定
 
 from ingestion.constants import REPORT_TEMPLATE
+from ingestion.services.dedup import fingerprint_fields
+
+logger = logging.getLogger(__name__)
 
 # ============================
 # 🔥 1. 字段别名映射（可扩展）
@@ -34,19 +44,26 @@ END_MARKERS = [
     "注：", "👉", "（提交报告", "更多详情"
 ]
 
+USERNAME_PATTERN = re.compile(r"(?<!\w)@[A-Za-z0-9_]{3,32}")
+SPACES_PATTERN = re.compile(r"\s{2,}")
+NEWLINES_PATTERN = re.compile(r"\n{2,}")
+LINK_PATTERN = re.compile(r"https?://\S+")
+EMOJI_PATTERN = re.compile(r"[\U00010000-\U0010ffff]")
+
+
 def remove_usernames(text: str) -> str:
     """
     删除 Telegram 用户名，例如 @abc123 @bot_name
     不删除邮箱地址。
     """
     # 删除 @username（字母数字下划线）
-    text = re.sub(r"(?<!\w)@[A-Za-z0-9_]{3,32}", "", text)
+    text = USERNAME_PATTERN.sub("", text)
 
     # 删除多余空格
-    text = re.sub(r"\s{2,}", " ", text)
+    text = SPACES_PATTERN.sub(" ", text)
 
     # 删除多余空行
-    text = re.sub(r"\n{2,}", "\n", text)
+    text = NEWLINES_PATTERN.sub("\n", text)
 
     return text.strip()
 
@@ -58,13 +75,13 @@ def clean_text(text: str) -> str:
     text = remove_usernames(text)
 
     # 删除链接
-    text = re.sub(r"https?://\S+", "", text)
+    text = LINK_PATTERN.sub("", text)
 
     # 删除 emoji（简单版）
-    text = re.sub(r"[\U00010000-\U0010ffff]", "", text)
+    text = EMOJI_PATTERN.sub("", text)
 
     # 删除多余空行
-    text = re.sub(r"\n{2,}", "\n", text)
+    text = NEWLINES_PATTERN.sub("\n", text)
 
     return text.strip()
 
@@ -124,30 +141,181 @@ def extract_fields_v2(text: str) -> Dict[str, str]:
     return result
 
 
-def parse_report(msg: Message) -> Optional[Dict[str, str]]:
+# ============================
+# 🔥 6. 编译版字段提取器（单次扫描）
+# ============================
+# 启动时把所有别名 + 结束标记编译成一个正则，一次 finditer 找出全部字段标签和结束标记的位置，
+# 每个字段的值 = 标签之后到下一个标签 / 结束标记之前的文本。
+# 字段优先级与 v2 相同：普通字段取别名列表中最靠前的命中，出击详情按别名顺序合并去重。
+
+ALIAS_TO_FIELD = {
+    alias: canonical
+    for canonical, aliases in FIELD_ALIASES.items()
+    for alias in aliases
+}
+
+
+def build_field_pattern():
+    # 长别名优先，避免被较短的前缀别名抢先匹配
+    aliases = "|".join(re.escape(a) for a in sorted(ALIAS_TO_FIELD, key=len, reverse=True))
+    markers = "|".join(re.escape(m) for m in END_MARKERS)
+    # 带【】的标签必须排在结束标记 "【" 之前。
+    # 不带括号的标签只认行首或后面跟冒号的，避免正文里出现的字段名（如「服务态度也好」）把值截断
+    return re.compile(
+        rf"【(?P<bracketed>{aliases})】[:：]?\s*"
+        rf"|^[ \t]*(?P<label>{aliases})[:：]?\s*"
+        rf"|(?P<inline>{aliases})[:：]\s*"
+        rf"|(?P<end>{markers})",
+        re.MULTILINE,
+    )
+
+
+FIELD_PATTERN = build_field_pattern()
+
+
+def extract_fields_v3(text: str) -> Dict[str, str]:
+    text = clean_text(text)
+
+    # 每个别名第一次出现的位置对应的值
+    values = {}
+    current = None
+    value_start = 0
+
+    for match in FIELD_PATTERN.finditer(text):
+        if current is not None:
+            values[current] = text[value_start:match.start()]
+            current = None
+
+        alias = match.group("bracketed") or match.group("label") or match.group("inline")
+        if alias and alias not in values:
+            current = alias
+            value_start = match.end()
+
+    if current is not None:
+        values[current] = text[value_start:]
+
+    result = {}
+    for canonical, aliases in FIELD_ALIASES.items():
+        found = []
+        for alias in aliases:
+            value = values.get(alias)
+            if value is None:
+                continue
+            value = NEWLINES_PATTERN.sub("\n", value.strip()).strip()
+            if value and value not in found:
+                found.append(value)
+
+        # 特殊处理：出击详情（多个字段合并）
+        if canonical == "出击详情":
+            result[canonical] = "\n".join(found).strip()
+        else:
+            result[canonical] = found[0] if found else ""
+
+    return result
+
+
+def parse_report_text(text: str) -> Optional[Dict[str, str]]:
     """
-    把抓取到的报告信息转化成模板信息。
+    把报告原文转化成模板信息（纯 CPU 计算，可在子进程中运行）。
     如果字段为空超过 3 个，则认为不是有效报告，返回 None。
     """
+    fields = extract_fields_v3(text or "")
 
-    # 1. 取出文本内容（Telethon 里通常是 .message 或 .text）
-    text = msg.message or ""   # 或者 msg.text，看你之前怎么用的
-
-    fields = extract_fields_v2(text)
-
-    # 2. 统计空字段数量
+    # 1. 统计空字段数量
     empty_count = sum(1 for v in fields.values() if not v)
 
     if empty_count > 3:
         return None
 
-    # 3. 格式化模板
+    # 2. 格式化模板
     report_text = REPORT_TEMPLATE.format(**fields)
 
-    # 4. 返回结构里顺便带上发布时间
     return {
         "content": report_text,
         "place_name": fields.get("会所名称")[:48],
-        "published_at": msg.date,  # 这里把 Telethon 的发布时间带出来
+        "fingerprint": fingerprint_fields(fields),  # 近似去重用的 SimHash
     }
 
+
+def parse_report(msg: Message) -> Optional[Dict[str, str]]:
+    """
+    把抓取到的报告信息转化成模板信息。
+    如果字段为空超过 3 个，则认为不是有效报告，返回 None。
+    """
+
+    # 1. 取出文本内容（Telethon 里通常是 .message 或 .text）
+    text = msg.message or ""   # 或者 msg.text，看你之前怎么用的
+
+    parsed = parse_report_text(text)
+    if not parsed:
+        return None
+
+    # 2. 返回结构里顺便带上发布时间
+    parsed["published_at"] = msg.date  # 这里把 Telethon 的发布时间带出来
+    return parsed
+
+
+# ============================
+# 🔥 7. 多进程批量解析
+# ============================
+# 解析是纯正则计算，放在 asyncio 循环里会卡住 Telethon 的收发和心跳。
+# parse_reports_batch 把文本分块交给进程池，按原顺序返回结果；
+# 它本身是阻塞调用，异步代码里用 run_in_executor 等待。
+# ingestion 跑在 Celery prefork 子进程里（daemon 进程），标准库 multiprocessing /
+# ProcessPoolExecutor 不允许 daemon 进程再派生子进程，这里用 Celery 自带的 billiard 进程池。
+
+PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+PARSE_CHUNK_SIZE = 25     # 每个子进程任务的文本数，太小 IPC 开销占比高
+PARSE_INLINE_MAX = 5      # 文本很少时直接在当前线程解析
+
+_parse_pool = None
+_parse_pool_pid = None
+_parse_pool_lock = threading.Lock()
+
+
+def _parse_chunk(texts: List[str]) -> List[Optional[Dict[str, str]]]:
+    return [parse_report_text(text) for text in texts]
+
+
+def get_parse_pool() -> Pool:
+    """本进程的解析进程池（第一次调用时创建；fork 出的子进程各自重新创建）"""
+    global _parse_pool, _parse_pool_pid
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_pid != os.getpid():
+            # 子进程先 django.setup()，之后才能导入 ingestion 下的模块
+            _parse_pool = Pool(processes=PARSE_WORKERS, initializer=django.setup)
+            _parse_pool_pid = os.getpid()
+        return _parse_pool
+
+
+def shutdown_parse_pool(**kwargs):
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None and _parse_pool_pid == os.getpid():
+        pool.terminate()
+
+
+# prefork 子进程用 os._exit 退出，不会清理它派生的解析进程
+worker_process_shutdown.connect(shutdown_parse_pool, weak=False)
+
+
+def parse_reports_batch(texts: List[str], chunk_size: int = PARSE_CHUNK_SIZE) -> List[Optional[Dict[str, str]]]:
+    """
+    批量解析报告原文，结果与 texts 一一对应（无效报告为 None）。
+    进程池出错时记录错误并重建，本批在当前线程解析。
+    """
+    texts = list(texts)
+    if len(texts) <= PARSE_INLINE_MAX:
+        return _parse_chunk(texts)
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    try:
+        results = []
+        for chunk_result in get_parse_pool().imap(_parse_chunk, chunks):
+            results.extend(chunk_result)
+        return results
+    except Exception:
+        logger.error("❌ 解析进程池出错，本批改为在当前线程解析，进程池将重建", exc_info=True)
+        shutdown_parse_pool()
+        return _parse_chunk(texts)
@@ -1,8 +1,9 @@
 import logging
 import asyncio
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
 from django.utils import timezone
+from telethon.errors import FloodWaitError
 from telethon.tl.types import Message
 
 from telethon_account.telethon_manager import default_manager
@@ -64,60 +65,108 @@ async def safe_get_channel(client, source):
 
     return entity
 
+class SourcePacer:
+    """
+    单个来源的请求节奏：两次翻页请求之间至少间隔 delay 秒。
+    处理消息花掉的时间计入间隔，不再每页固定 sleep。
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._last = None
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        if self._last is not None:
+            remaining = self.delay - (loop.time() - self._last)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        self._last = loop.time()
+
+
 # ============================
 # 🔥 1. 抓取频道消息（增量）
 # ============================
 
-@default_manager.with_account_switching()
-async def fetch_channel_messages(
+async def iter_channel_message_pages(
     *,
     client,
     account,
     source: IngestionSource,
     limit: int = 200,
     max_age_days: int = 180
-) -> List[Message]:
+) -> AsyncIterator[List[Message]]:
+    """
+    逐页产出频道消息（异步生成器，每页最多 100 条）。
+    调用方处理完一页再去抓下一页，内存不随抓取量增长。
+
+    - forward 模式：从 last_id 往新消息方向翻页，页内按 id 升序，
+      每页处理完即可把 last_message_id 推进到该页最大 id
+    - backward 模式：从 last_id 往旧消息方向补档，最多 limit 条，页内按 id 降序
+
+    FloodWaitError 向上抛出，由调用方切换账号（已产出的页不受影响）。
+    """
 
     channel_id = source.channel_id
     last_id = source.last_message_id or 0   # ⭐ 用 0 更安全
     fetch_mode = source.fetch_mode
-    delay = get_safe_delay(source)
+    pacer = SourcePacer(get_safe_delay(source))
     page_limit = min(100, limit)
     from datetime import datetime, timedelta, timezone
     cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
 
     logger.info(
         f"📡 开始抓取频道消息: {source.channel_name or source.channel_username} "
-        f"(ID={channel_id}) 使用账号 {account.phone_number}，延迟={delay}s"
+        f"(ID={channel_id}) 使用账号 {account.phone_number}，延迟={pacer.delay}s"
     )
 
-    messages = []
     count = 0
 
     # 获取频道实体
-    entity  = await safe_get_channel(client, source)
+    entity = await safe_get_channel(client, source)
     if not entity:
-        return  []
+        return
 
     try:
-        offset_id = 0  # ⭐ 从最新消息开始往前抓
-
-        while True:
-            # ⭐ forward 模式：抓 last_id 之后的新消息
-            if fetch_mode == "forward":
+        if fetch_mode == "forward":
+            # ⭐ forward 模式：add_offset=-page_limit 取 offset 之后（更新）的一页
+            # 首次抓取没有 last_id，从 cutoff 时间点开始往新翻
+            offset_id = last_id
+            offset_date = None if last_id else cutoff
+
+            while True:
+                await pacer.wait()
                 history = await client(GetHistoryRequest(
                     peer=entity,
                     offset_id=offset_id,
-                    offset_date=None,
-                    add_offset=0,
+                    offset_date=offset_date,
+                    add_offset=-page_limit,
                     limit=page_limit,
                     max_id=0,
                     min_id=last_id,  # ⭐ 关键：只抓 id > last_id 的消息
                     hash=0
                 ))
 
-            # ⭐ backward 模式：补档，从最旧往后抓
-            else:
+                msgs = [m for m in history.messages if m.id > offset_id]
+                if not msgs:
+                    break
+
+                msgs.sort(key=lambda m: m.id)
+                offset_id = msgs[-1].id
+                offset_date = None
+
+                page = [m for m in msgs if m.date >= cutoff]
+                count += len(page)
+                logger.info(f"📨 进度：{count}（msg_id≤{offset_id}）")
+                if page:
+                    yield page
+
+        else:
+            # ⭐ backward 模式：补档，从 last_id 往旧消息抓
+            offset_id = 0
+
+            while count < limit:
+                await pacer.wait()
                 history = await client(GetHistoryRequest(
                     peer=entity,
                     offset_id=offset_id,
@@ -129,32 +178,53 @@ async def fetch_channel_messages(
                     hash=0
                 ))
 
-            msgs = history.messages
-            if not msgs:
-                break
-
-            for msg in msgs:
-                # 时间过滤
-                if msg.date < cutoff:
-                    logger.info(f"⏹️ 停止：msg_id={msg.id} 超过 {max_age_days} 天")
-                    return messages
-
-                messages.append(msg)
-                count += 1
+                msgs = history.messages
+                if not msgs:
+                    break
 
-                logger.info(f"📨 进度：{count}/{limit}（msg_id={msg.id}）")
+                page = [m for m in msgs if m.date >= cutoff]
+                if page:
+                    count += len(page)
+                    logger.info(f"📨 进度：{count}/{limit}（msg_id={page[-1].id}）")
+                    yield page
 
-            # ⭐ 下一页：offset_id = 最后一条消息的 id
-            offset_id = msgs[-1].id
+                if len(page) < len(msgs):
+                    logger.info(f"⏹️ 停止：msg_id={msgs[-1].id} 超过 {max_age_days} 天")
+                    break
 
-            await asyncio.sleep(delay)
+                # ⭐ 下一页：offset_id = 最后一条消息的 id
+                offset_id = msgs[-1].id
 
-        logger.info(f"📥 抓取完成，共 {len(messages)} 条消息")
-        return messages
+        logger.info(f"📥 抓取完成，共 {count} 条消息")
 
+    except FloodWaitError:
+        raise
     except Exception as e:
         logger.error(f"❌ 抓取频道消息失败: {e}", exc_info=True)
-        return []
+
+
+async def fetch_channel_messages_with_client(
+    *,
+    client,
+    account,
+    source: IngestionSource,
+    limit: int = 200,
+    max_age_days: int = 180
+) -> List[Message]:
+    """
+    一次性收集全部页再返回（小批量 / 调试用）。
+    ingestion 流水线请直接用 iter_channel_message_pages 边抓边处理。
+    """
+    messages = []
+    async for page in iter_channel_message_pages(
+        client=client, account=account, source=source, limit=limit, max_age_days=max_age_days
+    ):
+        messages.extend(page)
+    return messages
+
+
+# 单次调用版本：自动选号、建连、断开
+fetch_channel_messages = default_manager.with_account_switching()(fetch_channel_messages_with_client)
 
 
 # ============================
@@ -9,12 +9,21 @@ from places.models import Staff
 from interactions.services import (
     handle_like, handle_dislike, handle_inactive_report
 )
-from interactions.utils import render_submission, get_submission_page
+from interactions.utils import render_submission
+from collect.services import get_staff_submissions, get_submission_by_page
 
 # ⭐ 引入你新的 keyboard + safe_edit
 from collect.handlers.query_staff import build_staff_submission_keyboard, safe_edit
 
 
+def submission_page(staff, submission_id):
+    """投稿在技师有效投稿列表中的页码（从 1 开始）"""
+    if staff is None:
+        return 1
+    ids = get_staff_submissions(staff.id)["ids"]
+    return ids.index(submission_id) + 1 if submission_id in ids else 1
+
+
 def handle_interaction_callback(update: Update, context: CallbackContext):
     query = update.callback_query
     query.answer()
@@ -32,8 +41,7 @@ def handle_interaction_callback(update: Update, context: CallbackContext):
             return
 
         staff = submission.staff
-        submissions = Submission.objects.filter(staff=staff, is_valid=True).order_by("-created_at")
-        page = submissions.filter(id__gte=submission_id).count()
+        page = submission_page(staff, submission_id)
 
     elif action == "dislike":
         submission_id = int(data[2])
@@ -45,8 +53,7 @@ def handle_interaction_callback(update: Update, context: CallbackContext):
             return
 
         staff = submission.staff
-        submissions = Submission.objects.filter(staff=staff, is_valid=True).order_by("-created_at")
-        page = submissions.filter(id__gte=submission_id).count()
+        page = submission_page(staff, submission_id)
 
     elif action == "inactive":
         staff_id = int(data[2])
@@ -57,14 +64,18 @@ def handle_interaction_callback(update: Update, context: CallbackContext):
             query.answer("你已经反馈过该技师离职情况了", show_alert=True)
             return
 
-        submissions = Submission.objects.filter(staff=staff, is_valid=True).order_by("-created_at")
         page = 1
 
     else:
         return
 
-    # ⭐ 渲染当前 submission
-    submission = get_submission_page(submissions, page)
+    # ⭐ 渲染当前 submission（投稿 id 列表走缓存，按主键取一条）
+    if staff is None:
+        return
+    submission, page, total = get_submission_by_page(staff.id, page)
+    if submission is None:
+        safe_edit(query, "该技师暂无有效投稿。")
+        return
     text = render_submission(submission)
 
     # ⭐ 使用带分页 + 查看照片的 keyboard
@@ -72,7 +83,7 @@ def handle_interaction_callback(update: Update, context: CallbackContext):
         submission,
         staff,
         page,
-        submissions.count(),
+        total,
         user_id=query.from_user.id
     )
 
@@ -39,7 +39,7 @@ class LotteryAdmin(admin.ModelAdmin):
             'fields': ('start_time', 'end_time')
         }),
         ('状态与结果', {
-            'fields': ('is_active', 'is_drawn', 'result_message'),
+            'fields': ('is_active', 'is_drawn', 'result_message', 'notify_summary'),
             'classes': ('collapse',)  # 默认折叠
         }),
         ('群组信息 (内部使用)', {
@@ -56,10 +56,10 @@ class LotteryAdmin(admin.ModelAdmin):
         """
         自定义列表字段：显示参与人数
         """
-        return obj.participants.count()
+        return obj.participation_count
 
     participant_count.short_description = '参与人数'  # 列标题
-    participant_count.admin_order_field = 'participants__count'  # 允许根据此字段排序
+    participant_count.admin_order_field = 'participation_count'  # 允许根据此字段排序
 
 
 
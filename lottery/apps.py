@@ -13,6 +13,8 @@ class LotteryConfig(AppConfig):
         """
         在 bot 运行时恢复抽奖任务
         """
+        import lottery.signals
+
         # 跳过数据库操作相关的命令
         skip_commands = {'migrate', 'makemigrations', 'test'}
         if len(sys.argv) > 1 and sys.argv[1] in skip_commands:
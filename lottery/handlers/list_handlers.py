@@ -203,7 +203,7 @@ def confirm_cancel_lottery(update: Update, context: CallbackContext):
 # ============================
 # 执行取消抽奖
 # ============================
-from lottery.tasks import remove_lottery_draw_job   # 你刚写的函数
+from lottery.tasks import remove_lottery_draw_job
 
 def do_cancel_lottery(update: Update, context: CallbackContext):
     query = update.callback_query
@@ -222,13 +222,13 @@ def do_cancel_lottery(update: Update, context: CallbackContext):
             end_time__gt=timezone.now()
         )
 
-        # 1. 删除 DjangoJobStore 中的任务
-        remove_lottery_draw_job(lottery.id)
-
-        # 2. 标记为取消（推荐）
-        lottery.is_active = True
+        # 1. 标记为取消（推荐）
+        lottery.is_active = False
         lottery.save(update_fields=["is_active"])
 
+        # 2. 撤销开奖延时任务
+        remove_lottery_draw_job(lottery.id)
+
         # 3. 或者你想直接删除记录也可以：
         # lottery.delete()
 
@@ -1,26 +1,98 @@
 # lottery/handlers/user_join.py
 
 from telegram.ext import CallbackQueryHandler
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
-from tgusers.services import update_or_create_user
+from tgusers.models import TelegramUser
+from tgusers.services import update_or_create_user, user_cache
 from lottery.models import Lottery, LotteryParticipant
 
+JOIN_THROTTLE_KEY = "lottery:join_throttle:{}:{}"
+JOIN_THROTTLE_SECONDS = 1  # 同一用户同一抽奖连续点击的最小间隔
+
+JOIN_COUNT_KEY = "lottery:join_count:{}:{}"
+JOIN_COUNT_TIMEOUT = 60 * 60 * 24 * 7
+
+JOIN_OK = "ok"
+JOIN_CLOSED = "closed"              # 已开奖 / 已取消 / 已截止
+JOIN_INSUFFICIENT = "insufficient"  # 积分不足
+
+
+def get_user_participation_count(lottery_id, user_pk):
+    """用户在该抽奖中的参与次数（缓存未命中时 COUNT 一次）"""
+    key = JOIN_COUNT_KEY.format(lottery_id, user_pk)
+    count = cache.get(key)
+    if count is None:
+        count = LotteryParticipant.objects.filter(lottery_id=lottery_id, user_id=user_pk).count()
+        cache.add(key, count, JOIN_COUNT_TIMEOUT)
+    return count
+
+
+def incr_user_participation_count(lottery_id, user_pk):
+    key = JOIN_COUNT_KEY.format(lottery_id, user_pk)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # 缓存已过期：此时参与记录已写入，COUNT 结果即为最新值
+        cache.delete(key)
+        return get_user_participation_count(lottery_id, user_pk)
+
+
+def join_lottery(lottery, user):
+    """
+    原子扣积分 + 写参与记录：
+    1. 先对抽奖行做条件 UPDATE（仍在进行中且未截止才 +1 参与人次），同时拿到行锁：
+       开奖任务（select_for_update 同一行）要么等本次参与提交后再抽，要么先开奖、本次 UPDATE 不命中
+    2. UPDATE ... SET points = points - X WHERE points >= X，积分不足时整个事务回滚
+    返回 (JOIN_OK / JOIN_CLOSED / JOIN_INSUFFICIENT, 剩余积分)
+    """
+    required = lottery.required_points
+
+    with transaction.atomic():
+        result = JOIN_OK
+        opened = Lottery.objects.filter(
+            id=lottery.id, is_active=True, is_drawn=False, end_time__gt=timezone.now()
+        ).update(participation_count=F("participation_count") + 1)
+        if not opened:
+            result = JOIN_CLOSED
+        elif TelegramUser.objects.filter(id=user.id, points__gte=required).update(
+            points=F("points") - required
+        ):
+            LotteryParticipant.objects.create(lottery=lottery, user=user)
+        else:
+            result = JOIN_INSUFFICIENT
+            transaction.set_rollback(True)
+
+    # 缓存中的 user 积分已过期
+    user_cache.evict(user.user_id)
+    user.points = TelegramUser.objects.filter(id=user.id).values_list("points", flat=True).first() or 0
+
+    return result, user.points
+
 
 def handle_join_lottery(update, context):
     query = update.callback_query
-    query.answer()
 
     # callback_data 格式： lottery:join:<id>
     parts = query.data.split(":")
     lottery_id = int(parts[-1])
 
+    # 防止连点：同一用户同一抽奖 1 秒内只处理一次
+    if not cache.add(JOIN_THROTTLE_KEY.format(lottery_id, query.from_user.id), 1, JOIN_THROTTLE_SECONDS):
+        query.answer("操作太频繁，请稍后再试")
+        return
+
+    query.answer()
+
     try:
         lottery = Lottery.objects.get(id=lottery_id)
     except Lottery.DoesNotExist:
         query.message.reply_text("❌ 抽奖不存在或已被删除")
         return
 
-    # 检查是否已结束
+    # 提前拦截已结束的抽奖（最终以 join_lottery 事务内的条件 UPDATE 为准）
     if lottery.is_drawn or not lottery.is_active:
         query.message.reply_text("🎬 该抽奖已结束，无法参与")
         return
@@ -36,26 +108,26 @@ def handle_join_lottery(update, context):
     # 计算折扣后的积分
     required = lottery.required_points
 
-    if user.points < required:
+    # 先保证计数缓存已初始化（在写入参与记录之前 COUNT）
+    get_user_participation_count(lottery.id, user.id)
+
+    result, remaining = join_lottery(lottery, user)
+    if result == JOIN_CLOSED:
+        query.message.reply_text("🎬 该抽奖已结束，无法参与")
+        return
+    if result == JOIN_INSUFFICIENT:
         query.message.reply_text(
-            f"❌ 积分不足，需要 {required} 积分，你当前 {user.points} 积分"
+            f"❌ 积分不足，需要 {required} 积分，你当前 {remaining} 积分"
         )
         return
 
-    # 扣积分
-    user.points -= required
-    user.save()
-
-    # 记录参与
-    LotteryParticipant.objects.create(lottery=lottery, user=user)
-
     # 统计参与次数
-    total_participations = LotteryParticipant.objects.filter(lottery=lottery, user=user).count()
+    total_participations = incr_user_participation_count(lottery.id, user.id)
 
     msg = (
         f"🎉 参与成功！\n"
         f"你已参与 {total_participations} 次\n"
-        f"已扣除 {required} 积分，剩余 {user.points} 积分"
+        f"已扣除 {required} 积分，剩余 {remaining} 积分"
     )
 
     query.message.reply_text(msg)
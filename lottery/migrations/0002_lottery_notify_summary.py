@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lottery',
+            name='notify_summary',
+            field=models.JSONField(blank=True, null=True, verbose_name='开奖通知结果'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_participation_count(apps, schema_editor):
+    Lottery = apps.get_model('lottery', 'Lottery')
+    for lottery in Lottery.objects.annotate(n=Count('participants')):
+        if lottery.n:
+            Lottery.objects.filter(id=lottery.id).update(participation_count=lottery.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0002_lottery_notify_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lottery',
+            name='participation_count',
+            field=models.IntegerField(default=0, verbose_name='参与人次'),
+        ),
+        migrations.RunPython(backfill_participation_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0003_lottery_participation_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lottery',
+            name='draw_task_id',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='开奖任务ID'),
+        ),
+    ]
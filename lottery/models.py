@@ -14,6 +14,9 @@ class Lottery(models.Model):
     is_drawn = models.BooleanField(default=False, verbose_name="是否已开奖")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     result_message = models.TextField(blank=True, null=True, verbose_name="开奖结果消息")  # 存储开奖结果
+    notify_summary = models.JSONField(blank=True, null=True, verbose_name="开奖通知结果")
+    participation_count = models.IntegerField(default=0, verbose_name="参与人次")
+    draw_task_id = models.CharField(max_length=64, blank=True, default="", verbose_name="开奖任务ID")
     # 新增字段：存储群消息ID和群ID
     group_message_id = models.BigIntegerField(
         null=True,
@@ -1,2 +1,2 @@
-from .notify_service import notify_user_prize, notify_user_prize_async, notify_admins, send_lottery_to_group
-from .draw_service import draw_lottery_and_notify
\ No newline at end of file
+from .notify_service import notify_user_prize, notify_admins, send_lottery_to_group
+from .draw_service import draw_lottery, draw_lottery_and_notify, notify_lottery_result
\ No newline at end of file
@@ -1,75 +1,149 @@
 # lottery/services/draw_service.py
 
 import random
+from django.conf import settings
 from django.utils import timezone
+from tgusers.models import TelegramUser
 from lottery.models import Lottery, Prize, LotteryParticipant, LotteryWinner
 from lottery.services.notify_service import (
-    notify_user_prize_async,
+    notify_winners,
     notify_admins,
+    save_notify_summary,
     update_group_after_draw
 )
 
 
-def draw_lottery_and_notify(lottery_id):
-    """执行开奖（不负责判断是否重复执行，由 safe_draw 控制）"""
+# 同一用户是否只能中一个奖（False 时每个奖项独立抽取，同一用户可中多个奖项）
+UNIQUE_WINNERS = getattr(settings, "LOTTERY_UNIQUE_WINNERS", True)
+
+
+def draw_user_ids(tickets, count, exclude):
+    """
+    按参与次数加权、不放回地抽取 count 个不同用户。
+    tickets：每次参与一条 user_id（参与越多权重越大）
+    exclude：已中奖的 user_id 集合，抽中的用户会加入其中
+    """
+    selected = []
+    if not tickets or count <= 0:
+        return selected
+
+    # 先用拒绝采样：中奖人数远小于参与人数时是 O(count)
+    attempts = count * 20 + 100
+    while len(selected) < count and attempts > 0:
+        attempts -= 1
+        user_id = random.choice(tickets)
+        if user_id not in exclude:
+            exclude.add(user_id)
+            selected.append(user_id)
+
+    if len(selected) < count:
+        # 剩余用户不多时退化为洗牌：按首次出现顺序取，同样是按权重不放回抽样
+        remaining = [uid for uid in tickets if uid not in exclude]
+        random.shuffle(remaining)
+        for user_id in remaining:
+            if len(selected) >= count:
+                break
+            if user_id not in exclude:
+                exclude.add(user_id)
+                selected.append(user_id)
+
+    return selected
+
+
+def format_display_name(u):
+    first = u.first_name or ""
+    last = u.last_name or ""
+    username = u.username
+
+    display_name = f"【{(first + ' ' + last).strip()}】"
+    if username:
+        display_name += f"@{username}"
+    else:
+        display_name += f"(id:{u.user_id})"
+    return display_name
+
+
+def draw_lottery(lottery_id, unique_winners=None):
+    """
+    抽取中奖者并写入开奖结果（只写库，不发通知；不负责判断是否重复执行，由调用方加锁控制）。
+    返回 (lottery, result_message, winners)，抽奖不存在时返回 None。
+    """
 
     try:
         lottery = Lottery.objects.get(id=lottery_id)
     except Lottery.DoesNotExist:
         print(f"❌ 抽奖 {lottery_id} 不存在")
-        return
+        return None
 
-    participants = list(LotteryParticipant.objects.filter(lottery=lottery))
-    prizes = Prize.objects.filter(lottery=lottery)
+    if unique_winners is None:
+        unique_winners = UNIQUE_WINNERS
+
+    # 每次参与一条 user_id（TelegramUser 主键），不加载模型实例
+    tickets = list(
+        LotteryParticipant.objects.filter(lottery=lottery).values_list("user_id", flat=True)
+    )
+    prizes = list(Prize.objects.filter(lottery=lottery))
 
     winners_text = []
+    winners = []
 
-    if not participants:
+    if not tickets:
         result_message = f"🎬 抽奖【{lottery.title}】无人参与。"
     else:
+        exclude = set()
+        draws = []
         for prize in prizes:
-            draw_count = min(prize.quantity, len(participants))
-            selected = random.sample(participants, draw_count)
-
-            for record in selected:
-                LotteryWinner.objects.create(
-                    lottery=lottery,
-                    prize=prize,
-                    user=record.user
-                )
-                notify_user_prize_async(record.user, prize, lottery)
+            if not unique_winners:
+                exclude = set()
+            draws.append((prize, draw_user_ids(tickets, prize.quantity, exclude)))
+
+        LotteryWinner.objects.bulk_create([
+            LotteryWinner(lottery=lottery, prize=prize, user_id=user_id)
+            for prize, user_ids in draws
+            for user_id in user_ids
+        ])
+
+        users = TelegramUser.objects.in_bulk(
+            {user_id for _, user_ids in draws for user_id in user_ids}
+        )
 
+        for prize, user_ids in draws:
             names = []
-            for record in selected:
-                u = record.user
-                first = u.first_name or ""
-                last = u.last_name or ""
-                username = u.username
-
-                display_name = f"【{(first + ' ' + last).strip()}】"
-                if username:
-                    display_name += f"@{username}"
-                else:
-                    display_name += f"(id:{u.user_id})"
-
-                names.append(display_name)
+            for user_id in user_ids:
+                u = users[user_id]
+                winners.append((u, prize))
+                names.append(format_display_name(u))
 
             winners_text.append(f"✅{prize.name}：{', '.join(names)}")
 
         result_message = (
             f"🎬 抽奖【{lottery.title}】开奖结果\n\n"
-            f"👥 参与人次：{len(participants)}\n\n"
+            f"👥 参与人次：{len(tickets)}\n\n"
             f"🎁 中奖名单：\n" + "\n".join(winners_text) + "\n\n"
             f"📝 兑奖说明：\n{lottery.description}"
         )
 
-    # 更新状态（由 safe_draw 保证不会重复执行）
+    # 更新状态（由调用方的行锁保证不会重复执行）
     lottery.is_drawn = True
     lottery.is_active = False
     lottery.result_message = result_message
-    lottery.save()
+    lottery.save(update_fields=["is_drawn", "is_active", "result_message"])
+
+    return lottery, result_message, winners
 
+
+def notify_lottery_result(lottery, result_message, winners):
+    """更新群消息、通知中奖者和管理员，并记录通知结果（应在开奖事务提交后调用）"""
     update_group_after_draw(lottery, result_message)
-    notify_admins(result_message)
+    winners_summary = notify_winners(lottery, winners)
+    admins_summary = notify_admins(result_message)
+    save_notify_summary(lottery, winners_summary, admins_summary)
 
     print(f"🎉 抽奖 {lottery.title} 已开奖")
+
+
+def draw_lottery_and_notify(lottery_id, unique_winners=None):
+    """开奖并立即发送通知（不在事务中调用时使用）"""
+    result = draw_lottery(lottery_id, unique_winners)
+    if result is not None:
+        notify_lottery_result(*result)
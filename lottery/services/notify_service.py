@@ -1,55 +1,81 @@
 # lottery/services/notify_service.py
 
+import logging
 import threading
+
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.error import TelegramError
 from django.conf import settings
+from django.utils import timezone
 from telegram.utils.request import Request
 
+from common.message_utils.tasks import queue_message, queue_messages
 from tgusers.models import TelegramUser
 
+logger = logging.getLogger(__name__)
 
-def get_bot():
-    request = Request(**(getattr(settings, 'PROXY_SETTINGS', {}) or {}))
-    return Bot(token=settings.TELEGRAM_BOT_TOKEN, request=request)
+# 中奖 / 管理员通知都写入出站消息队列，由发送引擎统一限速发送（与广播共用 Telegram 的全局额度），
+# 403 的用户由引擎的批次回调（common.broadcast.mark_blocked_recipients）标记为已屏蔽。
 
+_bot = None
+_bot_lock = threading.Lock()
 
-def notify_user_prize(user, prize, lottery):
-    """给中奖用户发私信"""
-    bot = get_bot()
 
-    text = (
+def get_bot():
+    """进程内复用同一个 Bot（只用于编辑 / 置顶群消息）"""
+    global _bot
+    if _bot is None:
+        with _bot_lock:
+            if _bot is None:
+                request = Request(**(getattr(settings, 'PROXY_SETTINGS', {}) or {}))
+                _bot = Bot(token=settings.TELEGRAM_BOT_TOKEN, request=request)
+    return _bot
+
+
+def build_prize_text(prize, lottery):
+    return (
         f"🎉 恭喜你中奖啦！\n\n"
         f"活动：{lottery.title}\n"
         f"奖品：{prize.name}\n\n"
         f"兑奖说明：\n{lottery.description}"
     )
 
-    try:
-        bot.send_message(chat_id=user.user_id, text=text, parse_mode="Markdown")
-    except TelegramError:
-        pass
 
+def notify_user_prize(user, prize, lottery):
+    """给中奖用户发私信（入队），返回消息 id"""
+    return queue_message(user.user_id, build_prize_text(prize, lottery), parse_mode="Markdown")
 
-def notify_user_prize_async(user, prize, lottery):
-    """异步发送"""
-    threading.Thread(
-        target=notify_user_prize,
-        args=(user, prize, lottery),
-        daemon=True
-    ).start()
+
+def notify_winners(lottery, winners):
+    """
+    通知全部中奖用户（一次批量入队）
+    winners: [(TelegramUser, Prize), ...]
+    返回入队统计
+    """
+    ids = queue_messages([
+        {"chat_id": user.user_id, "text": build_prize_text(prize, lottery), "parse_mode": "Markdown"}
+        for user, prize in winners
+    ])
+    return {"queued": len(ids)}
 
 
 def notify_admins(result_message):
-    """给所有管理员发开奖结果"""
-    bot = get_bot()
-    admins = TelegramUser.objects.filter(is_admin=True)
+    """给所有管理员发开奖结果（一次批量入队）"""
+    admin_ids = list(TelegramUser.objects.filter(is_admin=True).values_list("user_id", flat=True))
+    ids = queue_messages([
+        {"chat_id": uid, "text": result_message, "parse_mode": "Markdown"}
+        for uid in admin_ids
+    ])
+    return {"queued": len(ids)}
+
 
-    for admin in admins:
-        try:
-            bot.send_message(chat_id=admin.user_id, text=result_message, parse_mode="Markdown")
-        except:
-            pass
+def save_notify_summary(lottery, winners_summary, admins_summary):
+    """把通知结果写回 Lottery"""
+    lottery.notify_summary = {
+        "winners": winners_summary,
+        "admins": admins_summary,
+        "finished_at": timezone.now().isoformat(),
+    }
+    lottery.save(update_fields=["notify_summary"])
 
 
 def update_group_after_draw(lottery, result_message):
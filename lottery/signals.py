@@ -0,0 +1,27 @@
+# lottery/signals.py
+
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from lottery.models import Lottery
+
+
+@receiver(pre_save, sender=Lottery)
+def remember_end_time_change(sender, instance, update_fields=None, raw=False, **kwargs):
+    """记录本次保存是否修改了开奖时间（后台编辑 / 其他保存路径）"""
+    instance._end_time_changed = False
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and "end_time" not in update_fields:
+        return
+    old_end_time = Lottery.objects.filter(pk=instance.pk).values_list("end_time", flat=True).first()
+    instance._end_time_changed = old_end_time is not None and old_end_time != instance.end_time
+
+
+@receiver(post_save, sender=Lottery)
+def reschedule_draw_on_end_time_change(sender, instance, created=False, **kwargs):
+    """开奖时间改了：撤销旧的延时任务并按新时间重新投递"""
+    from lottery.tasks import reschedule_lottery_draw_job
+
+    if not created and getattr(instance, "_end_time_changed", False):
+        instance._end_time_changed = False
+        reschedule_lottery_draw_job(instance)
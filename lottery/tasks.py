@@ -1,22 +1,40 @@
 
 # tasks.py
 
-from django.db import transaction
+import uuid
+from datetime import timedelta
 
-from celery import shared_task
+from celery import shared_task, current_app
 from django.utils import timezone
 from django.db import transaction
 from .models import Lottery
-from .services import draw_lottery_and_notify
+from .services import draw_lottery, notify_lottery_result
+
+# Redis broker 的 ETA 任务超过 visibility_timeout（默认 1 小时）还没执行会被重复投递，
+# 因此只给即将开奖的抽奖投递延时任务；更远的由 scan_and_draw_lottery 在进入窗口后补投。
+# 窗口必须大于扫描间隔（10 分钟）并小于 visibility_timeout。
+DRAW_ETA_WINDOW = 30 * 60  # 秒
 
 
 @shared_task
 def scan_and_draw_lottery():
     """
-    每分钟扫描一次，找到到期但未开奖的 Lottery 并开奖
+    兜底扫描：找到到期但未开奖的 Lottery 并开奖
+    （正常情况下由 add_lottery_draw_job 投递的延时任务在 end_time 开奖），
+    并为进入 DRAW_ETA_WINDOW 但还没有延时任务的抽奖投递任务
     """
     now = timezone.now()
 
+    upcoming = Lottery.objects.filter(
+        end_time__gt=now,
+        end_time__lte=now + timedelta(seconds=DRAW_ETA_WINDOW),
+        is_drawn=False,
+        is_active=True,
+        draw_task_id="",
+    ).only("id", "end_time")
+    for lottery in upcoming:
+        schedule_lottery_draw(lottery)
+
     # 找到所有到期但未开奖、未取消的抽奖
     lotteries = Lottery.objects.filter(
         end_time__lte=now,
@@ -43,56 +61,83 @@ def process_single_lottery(lottery_id):
         if lottery.is_drawn or lottery.is_active is False:
             return
 
-        # 执行开奖
-        draw_lottery_and_notify(lottery.id)
+        # 执行开奖（draw_lottery 会写入 is_drawn / result_message）
+        result = draw_lottery(lottery.id)
+        if result is None:
+            return
 
-        # 标记已开奖
-        lottery.is_drawn = True
-        lottery.save()
+        # 通知较慢，放到事务提交、释放行锁之后再发
+        transaction.on_commit(lambda: notify_lottery_result(*result))
 
 
 
 
 
-def add_lottery_draw_job(lottery):
+@shared_task
+def draw_lottery_at(lottery_id, scheduled_end_time):
+    """
+    在 end_time 触发的延时开奖任务（Celery ETA）。
+    抽奖被取消、已开奖或开奖时间被修改过时直接跳过，由新的任务 / 兜底扫描处理。
     """
-    （当前方案：无操作）
+    lottery = Lottery.objects.filter(id=lottery_id).only("end_time", "is_active", "is_drawn").first()
+    if not lottery or not lottery.is_active or lottery.is_drawn:
+        return "skip"
 
-    说明：
-        当前系统使用“方案一：每分钟扫描数据库”的方式进行开奖，
-        因此不需要为每个 Lottery 动态创建调度任务。
+    if abs(lottery.end_time.timestamp() - scheduled_end_time) > 1:
+        return "rescheduled"
 
-        本函数被保留是为了保持业务层的统一接口。
-        未来如果切换到其他调度方式（如 APScheduler、Celery ETA、Redis 延时队列），
-        可以在此处实现真正的“添加定时任务”逻辑，而无需修改业务代码。
+    process_single_lottery(lottery_id)
+    return "drawn"
 
-    参数：
-        lottery: Lottery 实例，用于获取 id 和 end_time 等信息。
 
-    当前行为：
-        不执行任何操作，仅作为占位接口。
+def schedule_lottery_draw(lottery):
+    """
+    end_time 在 DRAW_ETA_WINDOW 内时投递 draw_lottery_at，返回任务 id；不在窗口内返回 None。
+    先用条件 UPDATE 占住 draw_task_id（只有为空时才写入），并发的扫描 / 保存不会重复投递。
     """
-    pass
+    if lottery.end_time > timezone.now() + timedelta(seconds=DRAW_ETA_WINDOW):
+        return None
+
+    task_id = uuid.uuid4().hex
+    if not Lottery.objects.filter(id=lottery.id, draw_task_id="").update(draw_task_id=task_id):
+        return None
+    draw_lottery_at.apply_async(
+        args=(lottery.id, lottery.end_time.timestamp()),
+        eta=lottery.end_time,
+        task_id=task_id,
+    )
+    return task_id
 
 
+def add_lottery_draw_job(lottery):
+    """
+    为抽奖创建开奖延时任务：在 end_time 投递 draw_lottery_at。
+    任务 id 记在 Lottery.draw_task_id 上，任意进程（bot / 后台 / worker）都能撤销。
+    开奖时间较远时先不投递，由 scan_and_draw_lottery 在进入 DRAW_ETA_WINDOW 后补投。
 
-def remove_lottery_draw_job(lottery_id):
+    参数：
+        lottery: Lottery 实例，用于获取 id 和 end_time 等信息。
     """
-    （当前方案：无操作）
+    # 等事务提交后再投递，避免任务先于数据落库执行
+    transaction.on_commit(lambda: schedule_lottery_draw(lottery))
 
-    说明：
-        当前系统使用“方案一：每分钟扫描数据库”的方式进行开奖，
-        Lottery 的取消逻辑只需要在数据库中标记 is_canceled=True，
-        不需要删除任何调度任务。
 
-        本函数被保留是为了保持业务层的统一接口。
-        未来如果切换到其他调度方式（如 APScheduler、Celery ETA、Redis 延时队列），
-        可以在此处实现真正的“删除定时任务”逻辑，而无需修改业务代码。
+def remove_lottery_draw_job(lottery_id):
+    """
+    撤销抽奖的开奖延时任务。
+    即使撤销消息没有送达 worker，draw_lottery_at 执行时也会因 is_active=False 跳过。
 
     参数：
         lottery_id: Lottery 主键 ID。
-
-    当前行为：
-        不执行任何操作，仅作为占位接口。
     """
-    pass
+    task_id = Lottery.objects.filter(id=lottery_id).values_list("draw_task_id", flat=True).first()
+    if task_id:
+        current_app.control.revoke(task_id)
+        Lottery.objects.filter(id=lottery_id, draw_task_id=task_id).update(draw_task_id="")
+
+
+def reschedule_lottery_draw_job(lottery):
+    """开奖时间被修改：撤销旧任务，按新的 end_time 重新投递（不在窗口内时交给扫描）"""
+    remove_lottery_draw_job(lottery.id)
+    if lottery.is_active and not lottery.is_drawn:
+        add_lottery_draw_job(lottery)
@@ -1,4 +1,6 @@
 import logging
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from telegram import (
     Update,
@@ -13,7 +15,8 @@ from telegram.ext import (
 from common.callbacks import make_cb
 from common.keyboards import append_back_button
 from mall.models import MallProduct, RedemptionRecord
-from tgusers.services import update_or_create_user
+from tgusers.models import TelegramUser
+from tgusers.services import update_or_create_user, user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -82,19 +85,33 @@ def user_confirm_redeem(update: Update, context: CallbackContext):
         q.edit_message_text("❌ 商品不存在或已下架。", reply_markup=append_back_button(None))
         return ConversationHandler.END
 
-    # 扣减余额
+    # 条件扣减：缓存里的 user 余额可能不是最新值，不能整行 save 覆盖其他地方的积分变动
     if product.points_needed > 0:
-        user.points -= product.points_needed
+        field, cost, unit = "points", product.points_needed, "积分"
     else:
-        user.coins -= product.coins_needed
-    user.save()
-
-    # 扣减库存
-    product.stock -= 1
-    product.save()
+        field, cost, unit = "coins", product.coins_needed, "金币"
+
+    redemption = None
+    with transaction.atomic():
+        paid = TelegramUser.objects.filter(id=user.id, **{f"{field}__gte": cost}).update(
+            **{field: F(field) - cost}
+        )
+        in_stock = paid and MallProduct.objects.filter(id=product.id, stock__gt=0).update(stock=F("stock") - 1)
+        if in_stock:
+            redemption = RedemptionRecord.objects.create(user=user, product=product)
+        else:
+            transaction.set_rollback(True)
+
+    user_cache.evict(user.user_id)
+
+    if not paid:
+        q.edit_message_text(f"❌ {unit}不足，需要 {cost} {unit}。", reply_markup=append_back_button(None))
+        return ConversationHandler.END
+    if redemption is None:
+        q.edit_message_text("❌ 商品已兑完。", reply_markup=append_back_button(None))
+        return ConversationHandler.END
 
-    # 创建兑换记录
-    redemption = RedemptionRecord.objects.create(user=user, product=product)
+    user.refresh_from_db(fields=["points", "coins"])
 
     q.edit_message_text(
         f"🎉 兑换成功！\n\n"
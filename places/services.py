@@ -1,55 +1,189 @@
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from common.versioning import ProcessLocalIndex
 from places.models import Place, PlaceFormerName
-from django.db.models import Q
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 可选依赖：未安装时只使用后台填写的 first_letter
+    lazy_pinyin = None
+
 # ============================
-# 1. 场所查找
+# 0. 场所名称索引（进程内）
 # ============================
+# 所有 Place / PlaceFormerName 的名称一次性载入内存：归一化名称 → place_id，
+# 每个场所预先算好全部别名。Place / PlaceFormerName 保存或删除时由 signals 更新共享缓存里的版本号，
+# 各进程每秒最多读一次版本号，版本变化才重建；另外最长 60 秒强制重建（见 common.versioning）。
+
+INDEX_VERSION_KEY = "places:name_index_version"
+
+FUZZY_MIN_SCORE = 0.35      # 低于该分数的候选不返回
+FUZZY_LIMIT = 5
+
+
+def normalize_name(name: str) -> str:
+    """全角转半角、大小写不敏感、去掉首尾空白"""
+    return unicodedata.normalize("NFKC", name or "").strip().casefold()
+
+
+def pinyin_initials(name: str) -> str:
+    """中文名称的拼音首字母（未安装 pypinyin 时返回空）"""
+    if lazy_pinyin is None or not name:
+        return ""
+    return "".join(lazy_pinyin(name, style=Style.FIRST_LETTER, errors="ignore")).casefold()
+
+
+def name_grams(name: str) -> FrozenSet[str]:
+    """单字 + 带首尾标记的二元组，短名称和错字都能命中"""
+    padded = f"^{name}$"
+    return frozenset(name) | frozenset(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+@dataclass(frozen=True)
+class PlaceNameIndex:
+    version: int
+    places: Dict[int, Place] = field(default_factory=dict)
+    name_to_place: Dict[str, int] = field(default_factory=dict)
+    aliases: Dict[int, FrozenSet[str]] = field(default_factory=dict)
+    # 模糊搜索用的 n-gram 倒排索引：entries[i] = (归一化名称, place_id, gram 数)
+    entries: List[Tuple[str, int, int]] = field(default_factory=list)
+    postings: Dict[str, List[int]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, version: int) -> "PlaceNameIndex":
+        places = {p.id: p for p in Place.objects.order_by("id")}
+        former_names = list(PlaceFormerName.objects.order_by("id"))
+
+        name_to_place = {}
+        aliases = {pid: set() for pid in places}
+
+        # 主表优先：先登记主表名称，曾用名只补充没有被占用的名称
+        for p in places.values():
+            for name in (p.name, p.short_name, p.first_letter):
+                if name:
+                    aliases[p.id].add(name)
+                    name_to_place.setdefault(normalize_name(name), p.id)
+
+        for fn in former_names:
+            if fn.place_id not in places:
+                continue
+            for name in (fn.name, fn.short_name, fn.first_letter):
+                if name:
+                    aliases[fn.place_id].add(name)
+                    name_to_place.setdefault(normalize_name(name), fn.place_id)
 
-def find_place_by_name(query_name: str):
-    query_name = query_name.strip()
+        name_to_place.pop("", None)
 
-    # 主表匹配（大小写不敏感）
-    place = Place.objects.filter(
-        Q(name__iexact=query_name) |
-        Q(short_name__iexact=query_name) |
-        Q(first_letter__iexact=query_name)
-    ).first()
+        entries = []
+        postings = defaultdict(list)
+        for pid, names in aliases.items():
+            searchable = {normalize_name(n) for n in names}
+            searchable |= {pinyin_initials(n) for n in names}
+            for name in sorted(n for n in searchable if n):
+                grams = name_grams(name)
+                for gram in grams:
+                    postings[gram].append(len(entries))
+                entries.append((name, pid, len(grams)))
 
-    if place:
-        return place
+        return cls(
+            version=version,
+            places=places,
+            name_to_place=name_to_place,
+            aliases={pid: frozenset(names) for pid, names in aliases.items()},
+            entries=entries,
+            postings=dict(postings),
+        )
 
-    # 曾用名匹配（大小写不敏感）
-    former = PlaceFormerName.objects.filter(
-        Q(name__iexact=query_name) |
-        Q(short_name__iexact=query_name) |
-        Q(first_letter__iexact=query_name)
-    ).first()
+    def search(self, query: str, limit: int = FUZZY_LIMIT, min_score: float = FUZZY_MIN_SCORE,
+               place_filter: Optional[Callable[[Place], bool]] = None) -> List[Tuple[Place, float]]:
+        """
+        模糊搜索：按 gram 重合度（Dice 系数）打分，名称包含查询词额外加分。
+        返回 [(place, score), ...]，按分数从高到低。
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
 
-    if former:
-        return former.place
+        query_grams = name_grams(query)
+        common = defaultdict(int)
+        for gram in query_grams:
+            for entry_id in self.postings.get(gram, ()):
+                common[entry_id] += 1
 
-    return None
+        best = {}
+        for entry_id, hits in common.items():
+            name, pid, gram_count = self.entries[entry_id]
+            score = 2 * hits / (len(query_grams) + gram_count)
+            if query in name:
+                score = max(score, 0.6 + 0.4 * len(query) / len(name))
+            if score > best.get(pid, 0):
+                best[pid] = score
 
+        ranked = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+        results = []
+        for pid, score in ranked:
+            if score < min_score:
+                break
+            place = self.places[pid]
+            if place_filter and not place_filter(place):
+                continue
+            results.append((place, round(score, 3)))
+            if len(results) >= limit:
+                break
+        return results
 
 
-def get_all_place_names(place: Place):
+_place_index = ProcessLocalIndex(INDEX_VERSION_KEY, PlaceNameIndex.build)
+
+
+def get_place_index() -> PlaceNameIndex:
+    return _place_index.get()
+
+
+def invalidate_place_index():
+    """场所或曾用名变更后调用（signals 自动调用）"""
+    _place_index.invalidate()
+
+
+# ============================
+# 1. 场所查找
+# ============================
+
+def find_place_by_name(query_name: str) -> Optional[Place]:
+    index = get_place_index()
+    place_id = index.name_to_place.get(normalize_name(query_name))
+    if place_id is None:
+        return None
+    return index.places.get(place_id)
+
+
+def get_place(place_id: int) -> Optional[Place]:
+    """按 id 取场所（走索引，不查库）"""
+    return get_place_index().places.get(place_id)
+
+
+def get_all_place_names(place: Place) -> List[str]:
     """获取场所所有可匹配名称（含曾用名）"""
+    names = get_place_index().aliases.get(place.id)
+    if names is not None:
+        return list(names)
+
+    # 索引还没包含这个场所（刚创建，版本号尚未刷新），直接查库
     names = set()
+    for obj in [place, *place.former_names.all()]:
+        for name in (obj.name, obj.short_name, obj.first_letter):
+            if name:
+                names.add(name)
+    return list(names)
 
-    # 主名称
-    if place.name:
-        names.add(place.name)
-    if place.short_name:
-        names.add(place.short_name)
-    if place.first_letter:
-        names.add(place.first_letter)
-
-    # 曾用名
-    for fn in place.former_names.all():
-        if fn.name:
-            names.add(fn.name)
-        if fn.short_name:
-            names.add(fn.short_name)
-        if fn.first_letter:
-            names.add(fn.first_letter)
 
-    return list(names)
+def search_places(query: str, limit: int = FUZZY_LIMIT, min_score: float = FUZZY_MIN_SCORE,
+                  place_filter: Optional[Callable[[Place], bool]] = None) -> List[Tuple[Place, float]]:
+    """
+    模糊查找场所（错别字、部分名称、拼音首字母），返回按相关度排序的 [(place, score), ...]。
+    place_filter 可进一步筛选，例如只要可兑换的场所。
+    """
+    return get_place_index().search(query, limit=limit, min_score=min_score, place_filter=place_filter)
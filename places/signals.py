@@ -0,0 +1,15 @@
+# places/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from places.models import Place, PlaceFormerName
+from places.services import invalidate_place_index
+
+
+@receiver(post_save, sender=Place)
+@receiver(post_delete, sender=Place)
+@receiver(post_save, sender=PlaceFormerName)
+@receiver(post_delete, sender=PlaceFormerName)
+def invalidate_place_index_on_change(sender, instance, **kwargs):
+    """场所 / 曾用名变化后重建名称索引"""
+    invalidate_place_index()
@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from .models import Report
+from common.images import thumbnail_url
 from tgusers.models import  TelegramUser
 from django.utils import timezone
 
@@ -83,12 +84,12 @@ class ReportAdmin(admin.ModelAdmin):
 
     # 自定义字段：显示图片缩略图
     def image_thumbnail(self, obj):
-        """在列表页显示图片缩略图（点击可查看原图）"""
+        """在列表页显示图片缩略图（点击可查看原图）；处理过的图片用 WebP 缩略图，不加载原图"""
         if obj.image and hasattr(obj.image, 'url'):
             return format_html(
-                '<img src="{}" style="width: 60px; height: auto;" title="点击查看原图" '
+                '<img src="{}" style="width: 60px; height: auto;" loading="lazy" title="点击查看原图" '
                 'onclick="window.open(\'{}\', \'_blank\')">',
-                obj.image.url,
+                thumbnail_url(obj.image),
                 obj.image.url
             )
         return '无图片'
@@ -1,6 +1,7 @@
 # reports/handlers/admin_review.py
 
 import logging
+from functools import partial
 
 from django.db import transaction
 from django.utils import timezone
@@ -18,6 +19,7 @@ from telegram.ext import (
 from tgusers.models import TelegramUser
 from reports.models import Report
 from common.callbacks import make_cb
+from common.file_refs import prefetch_photos
 from common.keyboards import single_button, append_back_button
 from reports import services
 
@@ -137,11 +139,6 @@ def send_paginated_reports(update: Update, context: CallbackContext, page_number
 
     keyboard = _report_page_keyboard(report.id, page.number, paginator.num_pages)
 
-    # ============================
-    # 2. 获取图片（如果有）
-    # ============================
-    photo_file = services.get_report_photo(report)  # 有可能为 None
-
     # ============================
     # 3. 发送消息（兼容 query / 普通消息）
     # ============================
@@ -155,37 +152,29 @@ def send_paginated_reports(update: Update, context: CallbackContext, page_number
             pass
 
     # ============================
-    # ⭐ 情况 A：有图片 → 发图片 + 发文本
+    # 2. 先发图片（短 caption，无图时为占位图；优先复用 file_id）
     # ============================
-    if photo_file:
-        # 先发图片（短 caption）
-        short_caption = f"📋 报告ID: {report.id}\n提交者: @{report.reporter.username or report.reporter.user_id}"
+    short_caption = f"📋 报告ID: {report.id}\n提交者: @{report.reporter.username or report.reporter.user_id}"
 
-        try:
-            context.bot.send_photo(
-                chat_id=chat_id,
-                photo=photo_file,
-                caption=short_caption
-            )
-        except Exception:
-            context.bot.send_message(chat_id, "（图片加载失败）")
-
-        # 再发正文（长文本 + 按钮）
-        context.bot.send_message(
-            chat_id=chat_id,
-            text=full_text,
-            reply_markup=keyboard
+    try:
+        services.send_report_photo(
+            partial(context.bot.send_photo, chat_id=chat_id),
+            report,
+            caption=short_caption
         )
+    except Exception:
+        context.bot.send_message(chat_id, "（图片加载失败）")
 
-    # ============================
-    # ⭐ 情况 B：无图片 → 直接发文本（已截断）
-    # ============================
-    else:
-        context.bot.send_message(
-            chat_id=chat_id,
-            text=full_text,
-            reply_markup=keyboard
-        )
+    # 再发正文（长文本 + 按钮）
+    context.bot.send_message(
+        chat_id=chat_id,
+        text=full_text,
+        reply_markup=keyboard
+    )
+
+    # 下一份待审核报告的图片提前拉到本地缓存
+    if page.has_next():
+        prefetch_photos(reports_qs.values_list("image", flat=True)[page.end_index():page.end_index() + 1])
 
     context.user_data['current_report_page'] = page.number
     return REVIEWING_REPORT
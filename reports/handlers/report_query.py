@@ -1,13 +1,24 @@
 # bot_core/handlers/report_query.py
 
+import secrets
+
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import CallbackContext, MessageHandler, Filters, CallbackQueryHandler
+from telegram.ext import CallbackContext, CallbackQueryHandler
 
-from django.db.models import Q
-from django.core.paginator import Paginator
+from django.core.cache import cache
 
 from reports.models import Report
+from common.callbacks import parse_cb
+from common.file_refs import prefetch_photos, send_field_photo
+from common.keyboards import place_suggestion_keyboard
+
+SUGGEST_PREFIX = "reportq"
 
+# 一次查询的结果 id 列表快照：翻页只按主键取一条，不再 COUNT + OFFSET
+SNAPSHOT_CACHE_KEY = "report:browse:{}"
+SNAPSHOT_TTL = 60 * 60          # 秒，过期后按钮提示重新查询
+SNAPSHOT_MAX_IDS = 1000         # 单次查询最多可翻的报告数（超出时提示总数）
+EXPIRED_TEXT = "查询已过期，请重新搜索"
 
 
 # ============================
@@ -18,31 +29,60 @@ def query_reports_by_place_names(name_list):
     return Report.objects.filter(
         place_name__in=name_list,
         status="approved"
-    ).order_by("-published_at", "-created_at")
+    ).order_by("-published_at", "-created_at", "-id")
 
 
 def fallback_query_reports(query_name):
     return Report.objects.filter(
         place_name=query_name,
         status="approved"
-    ).order_by("-published_at", "-created_at")
+    ).order_by("-published_at", "-created_at", "-id")
+
+
+def create_report_snapshot(reports, place=None, query_name=None):
+    """
+    把查询结果的有序 id 列表存入缓存，返回 token（放在按钮 callback_data 里）。
+    最多保存 SNAPSHOT_MAX_IDS 条，超出时另记总数（total）用于提示。
+    没有结果返回 None。
+    """
+    ids = list(reports.values_list("id", flat=True)[:SNAPSHOT_MAX_IDS + 1])
+    if not ids:
+        return None
+
+    total = len(ids)
+    if total > SNAPSHOT_MAX_IDS:
+        ids = ids[:SNAPSHOT_MAX_IDS]
+        total = reports.count()
+
+    token = secrets.token_urlsafe(6)
+    cache.set(SNAPSHOT_CACHE_KEY.format(token), {
+        "ids": ids,
+        "total": total,
+        "place_id": place.id if place else None,
+        "query": query_name,
+    }, SNAPSHOT_TTL)
+    return token
+
+
+def get_report_snapshot(token):
+    return cache.get(SNAPSHOT_CACHE_KEY.format(token))
 
 
 # ============================
 # 3. 分页按钮
 # ============================
 
-def build_pagination_keyboard(place_key, page, total_pages):
+def build_pagination_keyboard(token, page, total_pages):
     buttons = []
 
     if page > 1:
         buttons.append(
-            InlineKeyboardButton("⬅ 上一条", callback_data=f"report:{place_key}:{page-1}")
+            InlineKeyboardButton("⬅ 上一条", callback_data=f"report:{token}:{page-1}")
         )
 
     if page < total_pages:
         buttons.append(
-            InlineKeyboardButton("下一条 ➡", callback_data=f"report:{place_key}:{page+1}")
+            InlineKeyboardButton("下一条 ➡", callback_data=f"report:{token}:{page+1}")
         )
 
     return InlineKeyboardMarkup([buttons]) if buttons else None
@@ -52,7 +92,7 @@ def build_pagination_keyboard(place_key, page, total_pages):
 # 4. 发送报告内容
 # ============================
 
-def format_report_text(report, place=None):
+def format_report_text(report, place=None, notice=None):
     text = f"📄 报告 #{report.id}\n"
 
     if place:
@@ -61,21 +101,53 @@ def format_report_text(report, place=None):
     text += f"📝 内容：{report.content}\n"
     text += f"📅 时间：{report.published_at or report.created_at}\n"
 
+    if notice:
+        text += f"\n{notice}\n"
+
     return text
 
 
-def send_report_page(update, context, reports, page, place, place_key):
-    paginator = Paginator(reports, 1)
-    page_obj = paginator.get_page(page)
-    report = page_obj.object_list[0]
+def truncation_notice(snapshot):
+    """结果超过 SNAPSHOT_MAX_IDS 条时的提示"""
+    total = snapshot.get("total", len(snapshot["ids"]))
+    if total > len(snapshot["ids"]):
+        return f"ℹ️ 共 {total} 条，仅可翻前 {len(snapshot['ids'])} 条"
+    return None
+
 
-    text = format_report_text(report, place)
+def render_report_page(token, snapshot, page):
+    """
+    按快照取第 page 条（主键查询），返回 (report, text, keyboard)；
+    报告已被删除时 report 为 None。
+    """
+    from places.services import get_place
 
-    keyboard = build_pagination_keyboard(place_key, page, paginator.num_pages)
+    ids = snapshot["ids"]
+    page = max(1, min(page, len(ids)))
+    place = get_place(snapshot["place_id"]) if snapshot.get("place_id") else None
+    keyboard = build_pagination_keyboard(token, page, len(ids))
 
-    if report.image:
-        update.message.reply_photo(
-            photo=report.image.url,
+    report = Report.objects.filter(pk=ids[page - 1]).first()
+    if report is None:
+        return None, f"报告 {page}/{len(ids)} 已被删除", keyboard
+
+    return report, format_report_text(report, place, truncation_notice(snapshot)), keyboard
+
+
+def send_report_page(update, context, token, snapshot, page=1):
+    report, text, keyboard = render_report_page(token, snapshot, page)
+
+    # 预取下一条的图片，翻页时不用等远程存储
+    ids = snapshot["ids"]
+    page = max(1, min(page, len(ids)))
+    if page < len(ids):
+        prefetch_photos(Report.objects.filter(pk=ids[page]).values_list("image", flat=True))
+
+    if report and report.image:
+        # 优先复用 Telegram file_id，第一次才上传文件
+        send_field_photo(
+            update.message.reply_photo,
+            report.image,
             caption=text,
             reply_markup=keyboard
         )
@@ -88,7 +160,7 @@ def send_report_page(update, context, reports, page, place, place_key):
 # ============================
 
 def report_query_handler(update: Update, context: CallbackContext):
-    from places.services import get_all_place_names, find_place_by_name
+    from places.services import get_all_place_names, find_place_by_name, search_places
     print(">>> REPORT HANDLER TRIGGERED <<<")
     text = update.message.text.strip()
 
@@ -110,61 +182,86 @@ def report_query_handler(update: Update, context: CallbackContext):
     if place:
         name_list = get_all_place_names(place)
         reports = query_reports_by_place_names(name_list)
-        place_key = place.name
     else:
         reports = fallback_query_reports(query_name)
-        place_key = query_name
 
-    if not reports.exists():
-        update.message.reply_text(f"未找到与 {query_name} 相关的报告")
+    token = create_report_snapshot(reports, place=place, query_name=query_name)
+    if token is None:
+        # 名称可能打错了：给出模糊匹配的场所让用户点选
+        suggestions = [] if place else search_places(query_name)
+        if suggestions:
+            update.message.reply_text(
+                f"未找到与 {query_name} 相关的报告，你是不是要找：",
+                reply_markup=place_suggestion_keyboard(suggestions, SUGGEST_PREFIX, "pick")
+            )
+        else:
+            update.message.reply_text(f"未找到与 {query_name} 相关的报告")
         return
 
-    send_report_page(update, context, reports, page=1, place=place, place_key=place_key)
+    send_report_page(update, context, token, get_report_snapshot(token), page=1)
 
 # ============================
 # 6. 分页 Callback Handler
 # ============================
 
 def report_pagination_callback(update: Update, context: CallbackContext):
-    from places.services import get_all_place_names, find_place_by_name
-
     query = update.callback_query
     query.answer()
 
-    _, place_key, page = query.data.split(":")
+    _, token, page = query.data.rsplit(":", 2)
     page = int(page)
 
-    # 查找场所
-    place = find_place_by_name(place_key)
-    if place:
-        name_list = get_all_place_names(place)
-        reports = query_reports_by_place_names(name_list)
-    else:
-        reports = fallback_query_reports(place_key)
+    snapshot = get_report_snapshot(token)
+    if snapshot is None:
+        # 快照过期 / 旧版按钮：不再把 token 当作场所名重新查询
+        query.edit_message_text(EXPIRED_TEXT)
+        return
+
+    _, text, keyboard = render_report_page(token, snapshot, page)
+    query.edit_message_text(text, reply_markup=keyboard)
+
 
-    paginator = Paginator(reports, 1)
-    page_obj = paginator.get_page(page)
-    report = page_obj.object_list[0]
+# ============================
+# 7. 「你是不是要找」Callback Handler
+# ============================
+
+def report_suggestion_callback(update: Update, context: CallbackContext):
+    from places.services import get_all_place_names, get_place
 
-    text = format_report_text(report, place)
-    keyboard = build_pagination_keyboard(place_key, page, paginator.num_pages)
+    query = update.callback_query
+    query.answer()
+
+    _, _, args = parse_cb(query.data)
+    place = get_place(int(args[0]))
+    if not place:
+        query.edit_message_text("该场所已不存在")
+        return
+
+    reports = query_reports_by_place_names(get_all_place_names(place))
+    token = create_report_snapshot(reports, place=place, query_name=place.name)
+    if token is None:
+        query.edit_message_text(f"未找到与 {place.name} 相关的报告")
+        return
+
+    _, text, keyboard = render_report_page(token, get_report_snapshot(token), 1)
     query.edit_message_text(text, reply_markup=keyboard)
 
 
 # ============================
-# 7. 注册 Handlers
+# 8. 注册 Handlers
 # ============================
 
 def register_report_query_handlers(dp):
-    # 只匹配以“报告#”开头的消息
-    # 报告：只匹配 #报告 开头，支持空格 + #
-    dp.add_handler(MessageHandler(
-        Filters.regex(r"^#?\s*报告\s*#\s*\S+") & Filters.chat_type.groups,
-        report_query_handler
-    ))
+    # 群内 “#报告#名称” 消息由 bot_core.handlers.group_router 统一分发到 report_query_handler
 
     # 分页按钮
     dp.add_handler(CallbackQueryHandler(
         report_pagination_callback,
         pattern=r"^report:"
     ))
+
+    # 模糊匹配的场所按钮
+    dp.add_handler(CallbackQueryHandler(
+        report_suggestion_callback,
+        pattern=rf"^{SUGGEST_PREFIX}:pick:\d+$"
+    ))
@@ -1,9 +1,7 @@
 # reports/handlers/user_report.py
 from common.keyboards import append_back_button
-import os
 import logging
 from datetime import datetime
-from django.conf import settings
 from django.db import transaction
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -27,18 +25,11 @@ from .status_code import (
 
 from reports.keyboards import confirm_cancel_buttons  # 使用按钮工厂
 from common.callbacks import make_cb
+from common.file_refs import accept_telegram_file
 
 logger = logging.getLogger(__name__)
 
 
-def _ensure_media_path(date_obj: datetime):
-    date_str = date_obj.strftime("%Y/%m/%d")
-    rel_dir = os.path.join('report_images', date_str)
-    abs_dir = os.path.join(settings.MEDIA_ROOT, rel_dir)
-    os.makedirs(abs_dir, exist_ok=True)
-    return rel_dir, abs_dir
-
-
 def start_report(update: Update, context: CallbackContext) -> int:
     tg_user = update.effective_user
     if tg_user:
@@ -88,8 +79,8 @@ def handle_image(update: Update, context: CallbackContext) -> int:
         )
         return REPORT_WAITING_FOR_IMAGE
 
-    file_obj = update.message.photo[-1].get_file()
-    context.user_data['report_image_file'] = file_obj
+    # 只保存 PhotoSize（file_id），不在对话中调用 get_file / 下载
+    context.user_data['report_image_file'] = update.message.photo[-1]
 
     cancel_cb = make_cb("reports", "cancel_report")
     update.message.reply_text(
@@ -162,14 +153,13 @@ def confirm_report(update: Update, context: CallbackContext) -> int:
                 point=0
             )
 
-            now = datetime.now()
-            rel_dir, abs_dir = _ensure_media_path(now)
-            image_filename = f"report_{report.id}_image.jpg"
-            abs_path = os.path.join(abs_dir, image_filename)
-            image_file.download(custom_path=abs_path)
-
-            relative_image_path = os.path.join(rel_dir, image_filename)
-            report.image = relative_image_path
+            # 只登记 file_id，图片在事务提交后由后台任务下载写入存储
+            date_str = datetime.now().strftime("%Y/%m/%d")
+            report.image = accept_telegram_file(
+                f"report_images/{date_str}/report_{report.id}_image.jpg",
+                image_file.file_id,
+                image_file.file_unique_id,
+            )
             report.save(update_fields=["image"])
 
         # 构造包含返回主菜单的键盘（如果你还想保留其他按钮，可先构造 base_markup 再 append）
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingestion', '0002_alter_ingestionsource_fetch_mode'),
+        ('reports', '0003_report_published_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='ingestion.ingestionsource', verbose_name='抓取来源'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='source_message_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='来源消息 ID'),
+        ),
+        migrations.AddConstraint(
+            model_name='report',
+            constraint=models.UniqueConstraint(fields=('source', 'source_message_id'), name='uniq_report_source_message'),
+        ),
+    ]
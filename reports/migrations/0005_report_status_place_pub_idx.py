@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_report_source'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', 'place_name', 'published_at'], name='report_status_place_pub_idx'),
+        ),
+    ]
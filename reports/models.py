@@ -66,10 +66,31 @@ class Report(models.Model):
 
     point = models.IntegerField(default=0, verbose_name='报告积分')
 
+    # 抓取来源（用户提交的报告为空）；(source, source_message_id) 唯一，重复抓取不会重复入库
+    source = models.ForeignKey(
+        'ingestion.IngestionSource',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reports',
+        verbose_name='抓取来源'
+    )
+    source_message_id = models.BigIntegerField(null=True, blank=True, verbose_name='来源消息 ID')
+
     class Meta:
         verbose_name = '用户报告'
         verbose_name_plural = '用户报告'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'source_message_id'],
+                name='uniq_report_source_message',
+            ),
+        ]
+        indexes = [
+            # 报告浏览：status + place_name 过滤，按 published_at 排序
+            models.Index(fields=['status', 'place_name', 'published_at'], name='report_status_place_pub_idx'),
+        ]
 
     def __str__(self):
         return f"报告 #{self.id} - {self.reporter.user_id}"
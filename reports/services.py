@@ -1,17 +1,15 @@
 # reports/services.py
 
 import logging
-import os
 from typing import Tuple, Optional
 
-from django.conf import settings
-from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 from django.utils import timezone
 from telegram import InlineKeyboardMarkup
 from telegram import InputFile
 
+from common.file_refs import send_field_photo, send_placeholder_photo
 from common.keyboards import single_button, append_back_button
 from reports.keyboards import report_detail_buttons  # 如果你已实现该工厂
 
@@ -21,22 +19,18 @@ from tgusers.models import TelegramUser
 
 logger = logging.getLogger(__name__)
 
-def get_report_photo(report: Report):
+def send_report_photo(send, report: Report, **kwargs):
     """
-    返回一个可用于 bot.send_photo 的文件对象（rb）。
-    优先返回 report.image.path，否则返回项目占位图。
-    调用者负责关闭文件句柄。
+    发送报告图片：优先复用 Telegram file_id，没有图片或文件丢失时发送占位图。
+    send 为以 photo= 传图的发送函数，例如 functools.partial(bot.send_photo, chat_id)。
     """
-    try:
-        if report.image and hasattr(report.image, "path"):
-            path = report.image.path
-            if os.path.exists(path) and os.path.getsize(path) > 0:
-                return open(path, "rb")
-    except Exception:
-        pass
+    if report.image:
+        try:
+            return send_field_photo(send, report.image, **kwargs)
+        except (OSError, ValueError) as e:
+            logger.warning(f"报告 {report.id} 图片读取失败，改用占位图: {e}")
 
-    fallback = os.path.join(settings.BASE_DIR, "static", "no_image.png")
-    return open(fallback, "rb")
+    return send_placeholder_photo(send, **kwargs)
 
 
 def approve_report(report: Report, admin_user: TelegramUser, reward_points: int):
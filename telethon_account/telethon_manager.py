@@ -1,9 +1,13 @@
+import atexit
 import logging
 import asyncio
+import os
+import threading
 from datetime import datetime, timedelta
 from django.utils import timezone
 from functools import wraps
 from django.db import transaction
+from django.db.models import F
 from telethon import TelegramClient
 from telethon.sessions import StringSession
 
@@ -20,6 +24,7 @@ from telethon.errors import (
 )
 
 from asgiref.sync import sync_to_async
+from celery.signals import worker_process_shutdown
 
 from .models import TelethonAccount
 
@@ -173,43 +178,48 @@ class TelethonAccountManager:
     def with_account_switching(max_retries: int = 3):
         """
         一个装饰器，用于包装需要 Telethon 客户端的异步任务函数。
-        它会自动处理账号选择、切换和重试逻辑。
+        从常驻连接池租用 client（不再每次新建连接），并处理账号切换和重试逻辑。
         """
 
         def decorator(task_func):
             @wraps(task_func)
             async def wrapper(*args, **kwargs):
+                # client 只能在常驻事件循环中使用：从其他事件循环（如管理命令里的 asyncio.run）调用时转交过去
+                return await on_client_loop(_run_with_retries(args, kwargs))
+
+            async def _run_with_retries(args, kwargs):
+                pool = get_client_pool()
                 retries = 0
 
                 while retries < max_retries:
-                    # 1. 每次重试都重新从数据库获取一个可用账号
-                    account = await TelethonAccountManager.get_available_account()
-                    if not account:
+                    # 1. 从连接池轮询租用一个可用账号的 client
+                    entry = await pool.lease(timeout=30)
+                    if not entry:
                         logger.warning(f"⚠️  重试 {retries + 1}/{max_retries}：当前没有可用账号。等待 5 秒后重试...")
                         retries += 1
                         await asyncio.sleep(5)
+                        await pool.refresh(force=True)
                         continue
 
-                    client = None
+                    account = entry.account
+                    retire = False
                     try:
-                        # 2. 创建并启动客户端
-                        client = await TelethonAccountManager._create_client(account)
-                        async with client:
-                            # 3. 将客户端和账号信息作为参数传递给被装饰的任务函数
-                            kwargs['client'] = client
-                            kwargs['account'] = account
-
-                            # 4. 执行核心任务
-                            logger.info(f"🚀 使用账号 {account.phone_number} 执行任务...")
-                            result = await task_func(*args, **kwargs)
-
-                        # 5. 任务成功执行，返回结果
+                        # 2. 将客户端和账号信息作为参数传递给被装饰的任务函数
+                        kwargs['client'] = entry.client
+                        kwargs['account'] = account
+
+                        # 3. 执行核心任务
+                        logger.info(f"🚀 使用账号 {account.phone_number} 执行任务...")
+                        result = await task_func(*args, **kwargs)
+
+                        # 4. 任务成功执行，返回结果
                         logger.info(f"✅ 账号 {account.phone_number} 任务执行成功。")
                         return result
 
                     except FloodWaitError as e:
-                        # 6. 处理账号限流错误 - 必须切换账号
+                        # 5. 处理账号限流错误 - 必须切换账号
                         retries += 1
+                        retire = True
                         logger.warning(
                             f"⏰ 账号 {account.phone_number} (ID: {account.id}) 被临时限制 {e.seconds} 秒。"
                             f"将其标记为受限，并切换账号重试 (重试 {retries}/{max_retries})..."
@@ -225,8 +235,9 @@ class TelethonAccountManager:
                         await asyncio.sleep(1)
 
                     except (UserBannedInChannelError, SessionRevokedError, AuthKeyError) as e:
-                        # 7. 处理致命错误 - 账号永久/长期不可用
+                        # 6. 处理致命错误 - 账号永久/长期不可用
                         retries += 1
+                        retire = True
                         error_msg = str(e)
                         logger.error(
                             f"🔴 账号 {account.phone_number} (ID: {account.id}) 发生致命错误: {error_msg}。将其标记为不可用。"
@@ -240,23 +251,18 @@ class TelethonAccountManager:
                         await asyncio.sleep(1)
 
                     except (PeerFloodError, ChannelPrivateError) as e:
-                        # 8. 处理临时性或非账号本身的错误 - 不标记账号为error
+                        # 7. 处理临时性或非账号本身的错误 - 不标记账号状态，client 归还连接池
                         retries += 1
                         error_msg = str(e)
-                        await TelethonAccountManager.update_account_status(
-                            account.id,
-                            status=status,
-                            error_message=error_msg
-                        )
                         logger.warning(
                             f"⚠️  账号 {account.phone_number} (ID: {account.id}) 执行任务失败: {error_msg}。这可能是一个临时问题，将直接切换账号重试 (重试 {retries}/{max_retries})..."
                         )
-                        # 不更新账号状态为 'error'，仅日志记录
                         await asyncio.sleep(1)
 
                     except Exception as e:
-                        # 9. 处理其他未知错误 - 保守处理
+                        # 8. 处理其他未知错误 - 保守处理
                         retries += 1
+                        retire = True
                         logger.error(
                             f"❓ 账号 {account.phone_number} (ID: {account.id}) 执行任务时发生未知错误: {e}",
                             exc_info=True
@@ -270,15 +276,13 @@ class TelethonAccountManager:
                         await asyncio.sleep(2)
 
                     finally:
-                        # 确保客户端被正确断开
-                        if client and client.is_connected():
-                            try:
-                                await client.disconnect()
-                                logger.debug(f"📡 账号 {account.phone_number} 的客户端已断开连接。")
-                            except Exception as e:
-                                logger.warning(f"⚠️  断开账号 {account.phone_number} 客户端连接时发生错误: {e}")
-
-                # 10. 所有重试都失败
+                        # 归还或退役 client（连接保持，供下一次调用复用）
+                        if retire:
+                            await pool.retire(entry)
+                        else:
+                            await pool.release(entry)
+
+                # 9. 所有重试都失败
                 logger.error(f"❌ 所有 {max_retries} 次尝试均失败，任务最终失败。")
                 return None
 
@@ -307,5 +311,284 @@ def _update_status_sync(account_id: int, status: str, error_message: str = '', l
         logger.info(f"📊 账号 {account.phone_number} (ID: {account.id}) 状态已更新为: {status}")
 
 
+# ==========================================================
+# 常驻 client 池
+# ==========================================================
+# 每个可用账号一个已连接的 TelegramClient，按 租用 / 归还 使用，内存中轮询选号。
+# 使用次数先记在内存，定期批量写回 TelethonAccount（不再每次选号都加锁 + save）。
+# Telethon client 绑定事件循环：池放在进程内常驻的事件循环上（见下方 get_client_loop），
+# client 在多次任务之间保持连接，进程退出时才关闭。
+
+POOL_HEALTH_CHECK_INTERVAL = 60    # 秒，租用时距上次检查超过该值则检查连接
+POOL_USAGE_FLUSH_INTERVAL = 30     # 秒，使用计数写回数据库的间隔
+POOL_RELOAD_INTERVAL = 300         # 秒，重新加载账号列表（新增 / 解除限制的账号）的间隔
+
+
+class PooledClient:
+    def __init__(self, account: TelethonAccount, client: TelegramClient):
+        self.account = account
+        self.client = client
+        self.in_use = False
+        self.last_checked = 0.0
+        self.pending_uses = 0
+        self.last_used = None
+
+
+def _load_usable_accounts():
+    now = datetime.now(timezone.utc)
+    return list(
+        TelethonAccount.objects.filter(status='authorized', limited_until__isnull=True, is_active=True)
+        | TelethonAccount.objects.filter(status='limited', limited_until__lte=now, is_active=True)
+    )
+
+
+def _flush_usage_sync(usages):
+    for account_id, (uses, last_used) in usages.items():
+        TelethonAccount.objects.filter(pk=account_id).update(
+            request_count=F('request_count') + uses,
+            last_used=last_used,
+        )
+
+
+class TelethonClientPool:
+
+    def __init__(self):
+        self._entries = {}          # account_id -> PooledClient
+        self._order = []            # 轮询顺序
+        self._cursor = 0
+        self._cond = asyncio.Condition()
+        self._loaded_at = None
+        self._flushed_at = None
+
+    # ---------- 账号加载 / 连接 ----------
+
+    async def _connect(self, account):
+        client = await TelethonAccountManager._create_client(account)
+        try:
+            await client.connect()
+            if not await client.is_user_authorized():
+                raise RuntimeError("session 未授权")
+        except Exception as e:
+            logger.warning(f"⚠️ 账号 {account.phone_number} 连接失败，暂不加入连接池: {e}")
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+            return None
+        return PooledClient(account, client)
+
+    async def refresh(self, force=False):
+        """加载新可用的账号并建立连接（已在池中的账号保持不变）"""
+        loop = asyncio.get_running_loop()
+        if not force and self._loaded_at is not None and loop.time() - self._loaded_at < POOL_RELOAD_INTERVAL:
+            return len(self._entries)
+        self._loaded_at = loop.time()
+
+        accounts = await sync_to_async(_load_usable_accounts)()
+        new_accounts = [a for a in accounts if a.id not in self._entries]
+        entries = await asyncio.gather(*(self._connect(a) for a in new_accounts))
+
+        async with self._cond:
+            for entry in entries:
+                if entry:
+                    entry.last_checked = loop.time()
+                    self._entries[entry.account.id] = entry
+                    self._order.append(entry.account.id)
+            self._cond.notify_all()
+
+        if entries:
+            logger.info(f"🔌 连接池账号数: {len(self._entries)}")
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return len(self._entries)
+
+    # ---------- 健康检查 ----------
+
+    async def _ensure_healthy(self, entry: PooledClient) -> bool:
+        loop = asyncio.get_running_loop()
+        if entry.client.is_connected() and loop.time() - entry.last_checked < POOL_HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            if not entry.client.is_connected():
+                await entry.client.connect()
+            if not await entry.client.is_user_authorized():
+                return False
+        except Exception as e:
+            logger.warning(f"⚠️ 账号 {entry.account.phone_number} 健康检查失败: {e}")
+            return False
+        entry.last_checked = loop.time()
+        return True
+
+    # ---------- 租用 / 归还 ----------
+
+    def _pick_idle(self):
+        for _ in range(len(self._order)):
+            account_id = self._order[self._cursor % len(self._order)]
+            self._cursor += 1
+            entry = self._entries.get(account_id)
+            if entry and not entry.in_use:
+                return entry
+        return None
+
+    async def lease(self, timeout=None):
+        """轮询租用一个空闲、健康的 client；池为空或等待超时返回 None"""
+        await self.refresh()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+
+        while True:
+            async with self._cond:
+                while True:
+                    if not self._entries:
+                        return None
+                    entry = self._pick_idle()
+                    if entry:
+                        entry.in_use = True
+                        break
+                    remaining = None if deadline is None else deadline - loop.time()
+                    if remaining is not None and remaining <= 0:
+                        return None
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        return None
+
+            if await self._ensure_healthy(entry):
+                entry.pending_uses += 1
+                entry.last_used = datetime.now(timezone.utc)
+                return entry
+
+            await self.retire(entry)
+
+    async def release(self, entry: PooledClient):
+        async with self._cond:
+            entry.in_use = False
+            self._cond.notify()
+        await self.maybe_flush_usage()
+
+    async def retire(self, entry: PooledClient):
+        """账号受限 / 出错：移出连接池并断开"""
+        async with self._cond:
+            if self._entries.pop(entry.account.id, None) is not None:
+                self._order.remove(entry.account.id)
+            self._cond.notify_all()
+        try:
+            await entry.client.disconnect()
+        except Exception:
+            pass
+        await self.flush_usage(entries=[entry])
+
+    # ---------- 使用计数写回 ----------
+
+    async def flush_usage(self, entries=None):
+        usages = {}
+        for entry in entries if entries is not None else list(self._entries.values()):
+            if entry.pending_uses:
+                usages[entry.account.id] = (entry.pending_uses, entry.last_used)
+                entry.pending_uses = 0
+        if usages:
+            await sync_to_async(_flush_usage_sync)(usages)
+        self._flushed_at = asyncio.get_running_loop().time()
+
+    async def maybe_flush_usage(self):
+        now = asyncio.get_running_loop().time()
+        if self._flushed_at is None:
+            self._flushed_at = now
+        elif now - self._flushed_at >= POOL_USAGE_FLUSH_INTERVAL:
+            await self.flush_usage()
+
+    async def close(self):
+        await self.flush_usage()
+        async with self._cond:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._order.clear()
+        for entry in entries:
+            try:
+                await entry.client.disconnect()
+            except Exception:
+                pass
+
+
+# ==========================================================
+# 常驻事件循环
+# ==========================================================
+# 每个进程一个后台线程运行事件循环，连接池只在这个循环里使用。
+# 同步调用方（Celery 任务）用 run_in_client_loop，异步调用方用 on_client_loop 把协程交给它执行；
+# Celery 子进程退出（worker_process_shutdown）或进程正常退出（atexit）时写回计数并断开。
+
+_loop = None
+_loop_pid = None
+_loop_lock = threading.Lock()
+_pool = None
+
+
+def get_client_loop() -> asyncio.AbstractEventLoop:
+    """本进程的常驻事件循环（第一次调用时启动；fork 出的子进程各自重新启动）"""
+    global _loop, _loop_pid, _pool
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid() or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="telethon-loop", daemon=True).start()
+            _loop, _loop_pid, _pool = loop, os.getpid(), None
+        return _loop
+
+
+def run_in_client_loop(coro, timeout=None):
+    """同步调用：在常驻事件循环中执行协程并等待结果（调用方超时 / 被中断时取消协程）"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_client_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+async def on_client_loop(coro):
+    """异步调用：已在常驻事件循环中时直接 await，否则转交常驻事件循环执行"""
+    loop = get_client_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+def get_client_pool() -> TelethonClientPool:
+    """常驻事件循环上的连接池（Telethon client 不能跨事件循环使用）"""
+    global _pool
+    if asyncio.get_running_loop() is not _loop:
+        raise RuntimeError("Telethon 连接池只能在常驻事件循环中使用（run_in_client_loop / on_client_loop）")
+    if _pool is None:
+        _pool = TelethonClientPool()
+    return _pool
+
+
+async def close_client_pool():
+    global _pool
+    pool, _pool = _pool, None
+    if pool:
+        await pool.close()
+
+
+def shutdown_client_loop(timeout=30, **kwargs):
+    """进程退出时调用：关闭连接池（写回使用计数、断开连接）并停止常驻事件循环"""
+    global _loop
+    with _loop_lock:
+        loop, _loop = _loop, None
+    if loop is None or _loop_pid != os.getpid() or loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(close_client_pool(), loop).result(timeout)
+    except Exception:
+        logger.exception("关闭 Telethon 连接池失败")
+    loop.call_soon_threadsafe(loop.stop)
+
+
+# prefork 子进程用 os._exit 退出，不会执行 atexit
+worker_process_shutdown.connect(shutdown_client_loop, weak=False)
+atexit.register(shutdown_client_loop)
+
+
 # 为了方便，创建一个默认的管理器实例
 default_manager = TelethonAccountManager()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TgusersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tgusers'
+
+    def ready(self):
+        import tgusers.signals
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tgusers', '0002_telegramuser_experiences_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='telegramuser',
+            name='is_blocked',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='是否已屏蔽机器人'),
+        ),
+    ]
@@ -23,6 +23,7 @@ class TelegramUser(models.Model):
     is_merchant = models.BooleanField(default=False, verbose_name="是否为商家")
     is_super_admin = models.BooleanField(default=False, verbose_name="是否为超级管理员")
     has_interacted = models.BooleanField(default=False, verbose_name="是否有过交互")
+    is_blocked = models.BooleanField(default=False, db_index=True, verbose_name="是否已屏蔽机器人")
     inheritance_code = models.UUIDField(
         default=None,
         null=True,
@@ -1,46 +1,162 @@
+import atexit
 import datetime
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
 from datetime import date
 from django.utils import timezone
 
-from django.db import models
+from django.db import models, transaction, close_old_connections
 
 
-from botconfig.services import get_bot_config
+from botconfig.services import get_config_snapshot
 from tgusers.models import TelegramUser, UserGroupStats
 
+logger = logging.getLogger(__name__)
 
-def update_or_create_user(tg_user):
-    obj, created = TelegramUser.objects.update_or_create(
-        user_id=tg_user.id,
-        defaults={
-            "username": tg_user.username,
-            "first_name": tg_user.first_name,
-            "last_name": tg_user.last_name,
-            "is_bot": tg_user.is_bot,
-            "language_code": getattr(tg_user, "language_code", None),
-            "has_interacted": True,  # 只要使用机器人就标记
-        }
+
+# ==========================================================
+# 用户 upsert 缓存
+# ==========================================================
+# 几乎每个 update 都会调用 update_or_create_user。进程内按 Telegram id 缓存
+# TelegramUser 行和资料指纹（username/first/last/language），只有指纹变化或
+# has_interacted 需要置位时才真正写库；积分/金币变动时由 services/信号主动失效。
+
+USER_CACHE_SIZE = 5000
+USER_CACHE_TTL = 30  # 秒；过期后重新 SELECT 一次，兜底其他进程的改动
+LAST_ACTIVE_INTERVAL = 60  # 秒；命中缓存时 last_active_at 最多每分钟写一次
+
+# 注意：缓存里的行只适合读资料 / 展示余额，改积分、金币必须用 F() 条件更新，不能整行 save
+
+PROFILE_FIELDS = ("username", "first_name", "last_name", "is_bot", "language_code")
+
+
+def _profile_fingerprint(tg_user):
+    return (
+        tg_user.username,
+        tg_user.first_name,
+        tg_user.last_name,
+        tg_user.is_bot,
+        getattr(tg_user, "language_code", None),
     )
-    return obj
+
+
+class UserCache:
+    """TelegramUser 的 LRU + TTL 缓存（按 Telegram user_id）"""
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # user_id -> (user, fingerprint, expires_at)
+        self._data = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return entry
+
+    def put(self, user_id, user, fingerprint):
+        with self._lock:
+            self._data[user_id] = (user, fingerprint, time.monotonic() + self.ttl)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def peek_user(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+            return entry[0] if entry else None
+
+    def evict(self, *user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._data.pop(user_id, None)
+
+    def evict_pks(self, pks):
+        """按数据库主键失效（F() 批量更新后使用）"""
+        pks = set(pks)
+        with self._lock:
+            for user_id in [k for k, v in self._data.items() if v[0].id in pks]:
+                del self._data[user_id]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = UserCache()
+
+
+def update_or_create_user(tg_user):
+    fingerprint = _profile_fingerprint(tg_user)
+
+    entry = user_cache.get(tg_user.id)
+    if entry is not None:
+        user, cached_fingerprint, _ = entry
+        if cached_fingerprint == fingerprint and user.has_interacted:
+            touch_last_active(user)
+            return user
+
+    values = dict(zip(PROFILE_FIELDS, fingerprint))
+    values["has_interacted"] = True  # 只要使用机器人就标记
+
+    user = TelegramUser.objects.filter(user_id=tg_user.id).first()
+    if user is None:
+        user, created = TelegramUser.objects.get_or_create(user_id=tg_user.id, defaults=values)
+    else:
+        changed = [field for field, value in values.items() if getattr(user, field) != value]
+        if changed:
+            for field in changed:
+                setattr(user, field, values[field])
+            user.save(update_fields=changed + ["last_active_at"])
+        else:
+            touch_last_active(user)
+
+    user_cache.put(tg_user.id, user, fingerprint)
+    return user
+
+
+def touch_last_active(user):
+    """节流更新 last_active_at：只写这一列，不覆盖其他字段"""
+    now = timezone.now()
+    if user.last_active_at and (now - user.last_active_at).total_seconds() < LAST_ACTIVE_INTERVAL:
+        return
+    TelegramUser.objects.filter(pk=user.pk).update(last_active_at=now)
+    user.last_active_at = now
 
 
 def add_points(user_id, amount):
     TelegramUser.objects.filter(user_id=user_id).update(
         points=models.F("points") + amount
     )
+    user_cache.evict(user_id)
 
 
 def process_sign_in(user: TelegramUser):
 
-    config = get_bot_config()
+    config = get_config_snapshot()
     today = timezone.localdate()
     print("用户最后签到日期", user.last_sign_in_date, today)
     if user.last_sign_in_date == today:
         return False, "今天已经签到过了"
 
-    user.last_sign_in_date = today
-    user.points += config.sign_in_points
-    user.save()  # 不要用 update_fields
+    # 条件更新：缓存里的 user 对象积分可能不是最新值，不能整行 save 覆盖
+    updated = TelegramUser.objects.filter(id=user.id).exclude(last_sign_in_date=today).update(
+        last_sign_in_date=today,
+        points=models.F("points") + config.sign_in_points,
+    )
+    user.refresh_from_db(fields=["points", "last_sign_in_date"])
+    if not updated:
+        return False, "今天已经签到过了"
 
     return True, f"签到成功，获得 {config.sign_in_points} 积分"
 
@@ -48,59 +164,230 @@ def process_sign_in(user: TelegramUser):
 
 def add_coins(user_id, amount=1):
     TelegramUser.objects.filter(user_id=user_id).update(coins=models.F("coins") + amount)
+    user_cache.evict(user_id)
 
 
 def mark_user_interacted(user):
+    changed = []
     if not user.has_interacted:
         user.has_interacted = True
-        user.save(update_fields=["has_interacted"])
+        changed.append("has_interacted")
+    # 用户主动私聊机器人，说明已解除屏蔽
+    if user.is_blocked:
+        user.is_blocked = False
+        changed.append("is_blocked")
+    if changed:
+        user.save(update_fields=changed)
 
 
-def get_or_create_group_stats(user: TelegramUser, chat_id: int):
-    stats, created = UserGroupStats.objects.get_or_create(
-        user=user,
-        chat_id=chat_id
-    )
+def mark_users_blocked(user_ids):
+    """发送返回 403 的用户标记为已屏蔽，之后的广播自动跳过"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    updated = TelegramUser.objects.filter(user_id__in=user_ids, is_blocked=False).update(is_blocked=True)
+    user_cache.evict(*user_ids)
+    return updated
 
-    # 每日重置
-    today = timezone.localdate()
-    if stats.last_message_date != today:
-        stats.daily_message_count = 0
-        stats.daily_points_earned = 0
-        stats.last_message_date = today
-        stats.save(update_fields=["daily_message_count", "daily_points_earned", "last_message_date"])
 
-    return stats
+# ==========================================================
+# 发言积分 write-behind 账本
+# ==========================================================
+# 群聊发言积分的判定只依赖进程内计数器，积分增量与 UserGroupStats 的累加
+# 先记在内存里，每 LEDGER_FLUSH_EVERY 条消息或 LEDGER_FLUSH_INTERVAL 秒
+# 批量写回数据库（一条 UPDATE ... CASE + 一次 bulk_update），进程退出时再兜底刷一次。
 
+LEDGER_FLUSH_EVERY = 200          # 累计多少条积分消息触发一次刷盘
+LEDGER_FLUSH_INTERVAL = 10        # 最长多少秒刷盘一次
 
-def process_message_points(user: TelegramUser, chat_id: int, text: str):
-    """处理发言积分逻辑（按群独立计算）"""
 
-    config = get_bot_config()
-    stats = get_or_create_group_stats(user, chat_id)
+class PointLedger:
+    """进程内的发言积分账本（按 用户 + 群 + 日期 计数）"""
 
-    # 不够长度不给积分
-    if len(text.strip()) < config.message_min_length:
-        return 0
+    def __init__(self, flush_every=LEDGER_FLUSH_EVERY, flush_interval=LEDGER_FLUSH_INTERVAL):
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
 
-    # 达到每日上限
-    if stats.daily_points_earned >= config.message_daily_limit:
-        return 0
+        self._lock = threading.Lock()
+        # (user_pk, chat_id) -> UserGroupStats（内存中的最新值）
+        self._stats = {}
+        # 有未落库变更的 (user_pk, chat_id)
+        self._dirty_stats = set()
+        # user_pk -> 未落库的积分增量
+        self._pending_points = defaultdict(int)
+        self._pending_count = 0
 
-    # 基础积分
-    points = config.message_base_points
+        self._timer = None
+        self._stopped = False
 
-    # 暴击
-    import random
-    if random.random() < config.crit_rate:
-        points *= config.crit_multiplier
+    # ---------------- 计数 ----------------
 
-    # 更新统计
-    stats.daily_message_count += 1
-    stats.daily_points_earned += points
-    stats.save(update_fields=["daily_message_count", "daily_points_earned"])
+    def _prefetch_stats(self, user: TelegramUser, chat_id: int):
+        """
+        在锁外取统计行：内存中没有时查库（不存在则创建），一次慢查询不会卡住所有群的计数。
+        返回 (key, stats)，交给 _load_stats 在锁内放入内存。
+        """
+        key = (user.id, chat_id)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats, created = UserGroupStats.objects.get_or_create(user=user, chat_id=chat_id)
+        return key, stats
 
-    # 更新用户总积分
-    TelegramUser.objects.filter(id=user.id).update(points=models.F("points") + points)
+    def _load_stats(self, key, loaded):
+        """（持有锁）取内存中的统计行；还没有时放入锁外加载的那一行，并发加载时以先放入的为准"""
+        stats = self._stats.setdefault(key, loaded)
+
+        # 每日重置（只改内存，随下一次刷盘写回）
+        today = timezone.localdate()
+        if stats.last_message_date != today:
+            stats.daily_message_count = 0
+            stats.daily_points_earned = 0
+            stats.last_message_date = today
+            self._dirty_stats.add(key)
+
+        return stats
+
+    def get_stats(self, user: TelegramUser, chat_id: int):
+        key, loaded = self._prefetch_stats(user, chat_id)
+        with self._lock:
+            return self._load_stats(key, loaded)
+
+    def record(self, user: TelegramUser, chat_id: int, text: str, config):
+        """判定并记录一条消息的积分，返回本次获得的积分"""
+        key, loaded = self._prefetch_stats(user, chat_id)
+        with self._lock:
+            stats = self._load_stats(key, loaded)
+
+            # 不够长度不给积分
+            if len(text.strip()) < config.message_min_length:
+                return 0
+
+            # 达到每日上限
+            if stats.daily_points_earned >= config.message_daily_limit:
+                return 0
+
+            # 基础积分
+            points = config.message_base_points
+
+            # 暴击
+            if random.random() < config.crit_rate:
+                points *= config.crit_multiplier
+
+            stats.daily_message_count += 1
+            stats.daily_points_earned += points
+            self._dirty_stats.add(key)
+            self._pending_points[user.id] += points
+            self._pending_count += 1
+
+            should_flush = self._pending_count >= self.flush_every
+
+        if should_flush:
+            self.flush()
+        else:
+            self._ensure_timer()
+
+        return points
+
+    def pending_points(self, user_pk: int) -> int:
+        """尚未落库的积分（展示余额时可叠加）"""
+        with self._lock:
+            return self._pending_points.get(user_pk, 0)
+
+    # ---------------- 刷盘 ----------------
+
+    def _ensure_timer(self):
+        with self._lock:
+            if self._timer is not None or self._stopped:
+                return
+            self._timer = threading.Timer(self.flush_interval, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """把积分增量与统计行批量写回数据库"""
+        with self._lock:
+            points = dict(self._pending_points)
+            stats_rows = [self._stats[key] for key in self._dirty_stats if key in self._stats]
+            self._pending_points.clear()
+            self._dirty_stats.clear()
+            self._pending_count = 0
+
+        if not points and not stats_rows:
+            return
+
+        try:
+            with transaction.atomic():
+                if points:
+                    TelegramUser.objects.filter(id__in=list(points)).update(
+                        points=models.F("points") + models.Case(
+                            *[models.When(id=pk, then=models.Value(delta)) for pk, delta in points.items()],
+                            default=models.Value(0),
+                            output_field=models.IntegerField(),
+                        )
+                    )
+                if stats_rows:
+                    UserGroupStats.objects.bulk_update(
+                        stats_rows,
+                        ["daily_message_count", "daily_points_earned", "last_message_date"],
+                    )
+        except Exception:
+            logger.exception("[PointLedger] 刷盘失败，增量放回账本等待下次重试")
+            with self._lock:
+                for pk, delta in points.items():
+                    self._pending_points[pk] += delta
+                for row in stats_rows:
+                    self._dirty_stats.add((row.user_id, row.chat_id))
+            return
+
+        # 缓存里的用户积分已过期
+        user_cache.evict_pks(points)
+
+        logger.debug(f"[PointLedger] 刷盘完成: users={len(points)} stats={len(stats_rows)}")
+
+        # 跨天后丢弃不再活跃的统计行，避免内存无限增长
+        today = timezone.localdate()
+        with self._lock:
+            for key in [k for k, s in self._stats.items()
+                        if s.last_message_date != today and k not in self._dirty_stats]:
+                del self._stats[key]
+
+    def shutdown(self):
+        """停止定时器并做最后一次刷盘（进程退出时调用）"""
+        with self._lock:
+            self._stopped = True
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+
+point_ledger = PointLedger()
+atexit.register(point_ledger.shutdown)
+
+
+def flush_point_ledger():
+    point_ledger.flush()
+
+
+def shutdown_point_ledger():
+    point_ledger.shutdown()
+
+
+def get_or_create_group_stats(user: TelegramUser, chat_id: int):
+    """返回账本中的群统计（已做每日重置，最新计数可能尚未落库）"""
+    return point_ledger.get_stats(user, chat_id)
+
+
+def process_message_points(user: TelegramUser, chat_id: int, text: str):
+    """处理发言积分逻辑（按群独立计算，写入 write-behind 账本）"""
 
-    return points
+    config = get_config_snapshot()
+    return point_ledger.record(user, chat_id, text, config)
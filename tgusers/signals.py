@@ -0,0 +1,20 @@
+# tgusers/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from tgusers.models import TelegramUser
+from tgusers.services import user_cache
+
+
+@receiver(post_save, sender=TelegramUser)
+def evict_user_cache_on_save(sender, instance, **kwargs):
+    """
+    其他对象（后台、其他 handler 重新查询出的实例）保存后，缓存中的行已过期
+    """
+    if user_cache.peek_user(instance.user_id) is not instance:
+        user_cache.evict(instance.user_id)
+
+
+@receiver(post_delete, sender=TelegramUser)
+def evict_user_cache_on_delete(sender, instance, **kwargs):
+    user_cache.evict(instance.user_id)
@@ -13,11 +13,30 @@ BEAT_SCHEDULE = {
     },
 
     # ===========================
-    # 2. 每分钟扫描开奖任务（方案一）
+    # 2. 开奖兜底扫描（正常由 end_time 的延时任务开奖）
     # ===========================
+    # 名称沿用旧 key，sync_celery_beat 会原地更新已有的 PeriodicTask
     "scan-lottery-every-minute": {
         "task": "lottery.tasks.scan_and_draw_lottery",
-        "schedule": 60.0,  # 每 60 秒执行一次
+        "schedule": 10 * 60,  # 每 10 分钟执行一次
+    },
+
+    # 出站消息队列兜底消费（正常由入队时触发）
+    "drain-outbound-messages-every-minute": {
+        "task": "common.message_utils.tasks.drain_outbound_queue",
+        "schedule": 60.0,
+    },
+
+    # 中断的广播任务从 cursor 续跑
+    "resume-broadcasts-every-10-minutes": {
+        "task": "common.tasks.resume_broadcasts",
+        "schedule": 10 * 60,
+    },
+
+    # 用户图片延迟下载的兜底（正常由接收时入队）
+    "store-pending-media-every-5-minutes": {
+        "task": "common.tasks.store_pending_files",
+        "schedule": 5 * 60,
     },
 
     "broadcast-campaigns-every-hour": {
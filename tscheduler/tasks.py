@@ -1,7 +1,7 @@
 from ingestion.pipelines import run_ingestion_pipeline
 
 from celery import shared_task
-import asyncio
+from telethon_account.telethon_manager import run_in_client_loop
 
 
 # Celery 任务包装器（同步调用异步函数）
@@ -11,6 +11,6 @@ def celery_run_ingestion_pipeline():
     每20分钟执行的 Celery 任务
     包装并运行你的 async 函数
     """
-    # 运行 async 函数（Celery 是同步框架，必须这样调用）
-    asyncio.run(run_ingestion_pipeline())
-    return "✅ Ingestion pipeline 执行完成"
+    # 在 Telethon 常驻事件循环中运行，复用上一次运行留下的 client 连接
+    summary = run_in_client_loop(run_ingestion_pipeline())
+    return summary